@@ -0,0 +1,141 @@
+"""Lista de orígenes permitidos (APISIX y Prometheus) con resolución DNS en segundo plano.
+
+Los nombres de host se resuelven de forma asíncrona al iniciar y luego cada
+`ALLOWLIST_REFRESH_SECONDS`; si una resolución falla se conservan las últimas IPs
+conocidas. Cada entrada puede ser un nombre de host, una IP o un rango CIDR, y
+la verificación por petición es una búsqueda en un `set` (los rangos CIDR solo
+se recorren si la IP no está en el conjunto).
+"""
+import asyncio
+import ipaddress
+import socket
+
+from app.core.settings import settings
+
+ALLOWLIST_REFRESH_SECONDS = settings.allowlist_refresh_seconds
+# Solo para pruebas y benchmarks locales: ENVIRONMENT=test acepta peticiones de cualquier origen
+GATEWAY_CHECK_DISABLED = settings.environment == "test"
+# Decisiones CIDR memorizadas por IP (los clientes reales son pocos: gateway y scraper)
+CIDR_CACHE_SIZE = 4096
+
+
+def _split_sources(value):
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+class SourceAllowlist:
+    """Allowed client addresses built from hostnames, IPs and CIDR ranges."""
+
+    def __init__(self, name: str, sources: list):
+        self.name = name
+        self.hostnames = []
+        self.static_ips = set()
+        self.networks = []
+        for source in sources:
+            try:
+                network = ipaddress.ip_network(source, strict=False)
+            except ValueError:
+                self.hostnames.append(source)
+                continue
+            if network.num_addresses == 1:
+                self.static_ips.add(str(network.network_address))
+            else:
+                self.networks.append(network)
+        self.allowed_ips = frozenset(self.static_ips)
+        self._resolved = {}
+        self._cidr_decisions = {}
+        self._first_refresh = None
+
+    async def _resolve(self, hostname: str) -> set:
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+        return {info[4][0] for info in infos}
+
+    async def refresh(self):
+        """Re-resolves every hostname, keeping the last known IPs on failure."""
+        for hostname in self.hostnames:
+            try:
+                self._resolved[hostname] = await self._resolve(hostname)
+            except OSError as e:
+                print(f"Error resolviendo {hostname} ({self.name}): {e}")
+        # Se reemplaza el conjunto completo: las lecturas nunca ven un estado intermedio
+        self.allowed_ips = frozenset(self.static_ips.union(*self._resolved.values()))
+
+    def refresh_in_background(self):
+        """Starts the first resolution without waiting for it (lazy startup)."""
+        self._first_refresh = asyncio.create_task(self.refresh())
+
+    def stop(self):
+        if self._first_refresh is not None:
+            self._first_refresh.cancel()
+            self._first_refresh = None
+
+    async def ready(self):
+        """Waits for a first resolution started in the background (no-op once done)."""
+        if self._first_refresh is not None and not self._first_refresh.done():
+            await asyncio.shield(self._first_refresh)
+
+    def is_allowed(self, client_ip) -> bool:
+        if not client_ip:
+            return False
+        if client_ip in self.allowed_ips:
+            return True
+        if not self.networks:
+            return False
+        decision = self._cidr_decisions.get(client_ip)
+        if decision is None:
+            try:
+                address = ipaddress.ip_address(client_ip)
+                decision = any(address in network for network in self.networks)
+            except ValueError:
+                decision = False
+            if len(self._cidr_decisions) >= CIDR_CACHE_SIZE:
+                self._cidr_decisions.clear()
+            self._cidr_decisions[client_ip] = decision
+        return decision
+
+
+def _gateway_sources():
+    if settings.environment == "production":
+        return _split_sources(settings.apisix_prod)
+    # En local, el contenedor 'apisix'
+    return _split_sources(settings.apisix_sources)
+
+
+gateway_allowlist = SourceAllowlist("gateway", _gateway_sources())
+scraper_allowlist = SourceAllowlist("scraper", _split_sources(settings.prometheus_sources))
+
+_refresh_task = None
+
+
+async def _refresh_forever():
+    while True:
+        await asyncio.sleep(ALLOWLIST_REFRESH_SECONDS)
+        await gateway_allowlist.refresh()
+        await scraper_allowlist.refresh()
+
+
+async def start_allowlists(lazy: bool = False):
+    """Resolves the allowlists once and keeps them fresh in the background.
+
+    With `lazy`, the first resolution also runs in the background; each check
+    waits for its allowlist with `ready()`.
+    """
+    global _refresh_task
+    if GATEWAY_CHECK_DISABLED:
+        print("ENVIRONMENT=test: verificación de origen desactivada")
+    for allowlist in (gateway_allowlist, scraper_allowlist):
+        if lazy:
+            allowlist.refresh_in_background()
+        else:
+            await allowlist.refresh()
+    _refresh_task = asyncio.create_task(_refresh_forever())
+
+
+async def stop_allowlists():
+    global _refresh_task
+    if _refresh_task:
+        _refresh_task.cancel()
+        _refresh_task = None
+    for allowlist in (gateway_allowlist, scraper_allowlist):
+        allowlist.stop()
@@ -1,21 +1,182 @@
 from fastapi import Depends, HTTPException, Request
-import jwt  
+import asyncio
+import hashlib
+import json
+import time
+import urllib.request
+from collections import OrderedDict
+import jwt
+
+from app.core.settings import settings
+
+# Por defecto se confía en APISIX (que ya validó el token); con AUTH_VERIFY_SIGNATURE=true
+# el servicio verifica la firma localmente con las llaves públicas (JWKS) de Auth0
+AUTH_VERIFY_SIGNATURE = settings.auth_verify_signature
+AUTH0_DOMAIN = settings.auth0_domain
+AUTH0_AUDIENCE = settings.auth0_audience
+AUTH0_ISSUER = settings.auth0_issuer
+AUTH_JWKS_URL = settings.auth_jwks_url
+# Archivo JWKS local para entornos sin salida a internet
+AUTH_JWKS_FILE = settings.auth_jwks_file
+AUTH_JWKS_REFRESH_SECONDS = settings.auth_jwks_refresh_seconds
+# Intervalo mínimo entre recargas forzadas por un `kid` desconocido
+AUTH_JWKS_MIN_REFRESH_SECONDS = settings.auth_jwks_min_refresh_seconds
+AUTH_TOKEN_CACHE_SIZE = settings.auth_token_cache_size
+AUTH_ALGORITHMS = ["RS256"]
+
+
+class JWKSCache:
+    """Auth0 signing keys indexed by `kid`, loaded from a URL or a local file."""
+
+    def __init__(self, url=None, path=None):
+        self.url = url
+        self.path = path
+        self.keys = {}
+        self._last_attempt = 0.0
+        self._refresh_task = None
+        self._lock = asyncio.Lock()
+
+    def _fetch(self) -> dict:
+        if self.path:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        if not self.url:
+            raise ValueError("No JWKS source configured (AUTH0_DOMAIN, AUTH_JWKS_URL or AUTH_JWKS_FILE)")
+        with urllib.request.urlopen(self.url, timeout=5) as response:
+            return json.load(response)
+
+    async def load(self):
+        """Fetches the key set (in a thread, the fetch is blocking) and replaces the cached keys."""
+        jwks = await asyncio.to_thread(self._fetch)
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk).key
+            except (KeyError, jwt.PyJWKError):
+                continue
+        self.keys = keys
+
+    async def get_key(self, kid: str):
+        """Returns the key for `kid`, reloading the set once if it is unknown (key rotation)."""
+        key = self.keys.get(kid)
+        if key is not None:
+            return key
+        async with self._lock:
+            if kid not in self.keys and time.monotonic() - self._last_attempt >= AUTH_JWKS_MIN_REFRESH_SECONDS:
+                self._last_attempt = time.monotonic()
+                try:
+                    await self.load()
+                except (OSError, ValueError) as e:
+                    print(f"Error recargando JWKS: {e}")
+        return self.keys.get(kid)
+
+    async def _refresh_forever(self):
+        while True:
+            await asyncio.sleep(AUTH_JWKS_REFRESH_SECONDS)
+            try:
+                await self.load()
+            except (OSError, ValueError) as e:
+                print(f"Error recargando JWKS: {e}")
+
+    async def start(self, load: bool = True):
+        """Loads the keys now, or with `load=False` on the first token that needs them."""
+        if load:
+            self._last_attempt = time.monotonic()
+            await self.load()
+        self._refresh_task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of already-verified tokens (by SHA-256) holding `sub` until `exp`."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, key: bytes):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return user_id
+
+    def put(self, key: bytes, user_id: str, expires_at: float):
+        self._entries[key] = (user_id, expires_at)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+jwks_cache = JWKSCache(AUTH_JWKS_URL, AUTH_JWKS_FILE)
+verified_tokens = VerifiedTokenCache(AUTH_TOKEN_CACHE_SIZE)
+
+
+async def start_auth(lazy: bool = False):
+    """Loads the JWKS (unless `lazy`) and starts its background refresh when verification is enabled."""
+    if AUTH_VERIFY_SIGNATURE:
+        await jwks_cache.start(load=not lazy)
+
+
+async def stop_auth():
+    await jwks_cache.stop()
+
+
+async def verify_token(token: str) -> str:
+    """Verifies signature, expiry, audience and issuer; returns `sub`. Cached until `exp`."""
+    cache_key = verified_tokens.key(token)
+    user_id = verified_tokens.get(cache_key)
+    if user_id is not None:
+        return user_id
+
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = await jwks_cache.get_key(kid)
+    if key is None:
+        raise HTTPException(status_code=401, detail="Unknown signing key")
+
+    payload = jwt.decode(
+        token,
+        key,
+        algorithms=AUTH_ALGORITHMS,
+        audience=AUTH0_AUDIENCE,
+        issuer=AUTH0_ISSUER,
+        options={"require": ["exp", "sub"], "verify_aud": AUTH0_AUDIENCE is not None},
+    )
+    user_id = payload["sub"]
+    verified_tokens.put(cache_key, user_id, payload["exp"])
+    return user_id
+
 
 async def get_current_user(request: Request):
     """Extracts user ID from JWT token passed by APISIX."""
     auth_header = request.headers.get("Authorization")
-    
+
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid token")
-    
+
     token = auth_header.split(" ")[1]  # Get token after "Bearer "
-    
+
     try:
+        if AUTH_VERIFY_SIGNATURE:
+            return await verify_token(token)
+
         # Extract `sub` (user ID) without validating the token
         payload = jwt.decode(token, options={"verify_signature": False})
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token structure")
         return user_id
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token format")
@@ -0,0 +1,190 @@
+"""Caché en proceso (TTL + LRU) de los perfiles de usuario, sin transcripciones.
+
+Las rutas de escritura invalidan la entrada del usuario y publican la
+invalidación en un backend compartido para que los demás workers de uvicorn
+también la descarten. El backend por defecto es `LocalInvalidationBackend`,
+un sustituto en memoria que solo alcanza al proceso actual; con
+`PROFILE_CACHE_REDIS_URL` se usa Redis pub/sub (requiere el paquete `redis`).
+Con `PROFILE_CACHE_ENABLED=false` no se guarda ningún perfil (cada lectura va a
+MongoDB); gunicorn.conf.py la apaga así cuando hay varios workers sin Redis, porque
+una escritura en un worker no invalidaría la copia de los demás.
+
+Los fallos de caché simultáneos del mismo usuario comparten una sola consulta
+(single-flight): las rutas de un solo campo que la app pide en paralelo al abrir
+cuestan un único `find_one` con el perfil completo.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge
+
+from app.core.database import users_collection
+from app.core.settings import settings
+
+PROFILE_CACHE_ENABLED = settings.profile_cache_enabled
+PROFILE_CACHE_TTL = settings.profile_cache_ttl
+PROFILE_CACHE_MAX_ENTRIES = settings.profile_cache_max_entries
+PROFILE_CACHE_REDIS_URL = settings.profile_cache_redis_url
+INVALIDATION_CHANNEL = "mymind-users:profile-invalidations"
+
+# Las transcripciones viven en su propia colección; los perfiles legados se excluyen igual
+PROFILE_PROJECTION = {"transcriptions": 0}
+
+CACHE_HITS = Counter("profile_cache_hits_total", "Profile cache hits", ["app_name"])
+CACHE_MISSES = Counter("profile_cache_misses_total", "Profile cache misses", ["app_name"])
+CACHE_COALESCED = Counter(
+    "profile_cache_coalesced_total", "Profile reads that joined an in-flight MongoDB query", ["app_name"]
+)
+CACHE_EVICTIONS = Counter("profile_cache_evictions_total", "Profile cache evictions", ["reason", "app_name"])
+CACHE_SIZE = Gauge("profile_cache_entries", "Profiles currently cached", ["app_name"], multiprocess_mode="livesum")
+
+APP_NAME = "mymind-users"
+
+
+class LocalInvalidationBackend:
+    """In-memory stand-in for a shared invalidation channel (single process only)."""
+
+    def __init__(self):
+        self._subscribers = []
+
+    async def start(self, on_invalidate):
+        self._subscribers.append(on_invalidate)
+
+    async def stop(self):
+        self._subscribers.clear()
+
+    async def publish(self, user_id: str):
+        for callback in self._subscribers:
+            callback(user_id)
+
+
+class RedisInvalidationBackend:
+    """Shares invalidations between workers through Redis pub/sub."""
+
+    def __init__(self, url: str, channel: str = INVALIDATION_CHANNEL):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._channel = channel
+        self._listener = None
+
+    async def start(self, on_invalidate):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self._channel)
+
+        async def listen():
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    on_invalidate(message["data"].decode("utf-8"))
+
+        self._listener = asyncio.create_task(listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+        await self._redis.aclose()
+
+    async def publish(self, user_id: str):
+        await self._redis.publish(self._channel, user_id)
+
+
+class ProfileCache:
+    """Bounded TTL + LRU cache of user profile documents keyed by user id."""
+
+    def __init__(self, ttl: float, max_entries: int, backend=None, enabled: bool = True):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend or LocalInvalidationBackend()
+        self._entries = OrderedDict()
+        # Lecturas en curso (una tarea por usuario, compartida por las peticiones concurrentes).
+        # Una invalidación las descarta: no repueblan la caché y las peticiones nuevas consultan de nuevo
+        self._pending = {}
+
+    async def start(self):
+        await self.backend.start(self.discard)
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def discard(self, user_id: str):
+        """Drops the local entry (called for local and remote invalidations)."""
+        self._pending.pop(user_id, None)
+        if self._entries.pop(user_id, None) is not None:
+            CACHE_EVICTIONS.labels(reason="invalidated", app_name=APP_NAME).inc()
+            CACHE_SIZE.labels(app_name=APP_NAME).set(len(self._entries))
+
+    async def invalidate(self, user_id: str):
+        """Invalidates the user's profile in this worker and broadcasts it to the others."""
+        self.discard(user_id)
+        if not isinstance(self.backend, LocalInvalidationBackend):
+            await self.backend.publish(user_id)
+
+    def _lookup(self, user_id: str):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, profile = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            CACHE_EVICTIONS.labels(reason="expired", app_name=APP_NAME).inc()
+            return None
+        self._entries.move_to_end(user_id)
+        return profile
+
+    def _store(self, user_id: str, profile: dict):
+        if not self.enabled:
+            # Sin caché solo queda el single-flight de las lecturas simultáneas
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            CACHE_EVICTIONS.labels(reason="capacity", app_name=APP_NAME).inc()
+        CACHE_SIZE.labels(app_name=APP_NAME).set(len(self._entries))
+
+    def _start_load(self, user_id: str):
+        load = asyncio.ensure_future(users_collection.find_one({"_id": user_id}, PROFILE_PROJECTION))
+        self._pending[user_id] = load
+        load.add_done_callback(lambda done: self._finish_load(user_id, done))
+        return load
+
+    def _finish_load(self, user_id: str, load):
+        # Si se invalidó mientras volaba, el resultado se entrega a quienes esperaban pero no se cachea
+        if self._pending.get(user_id) is not load:
+            return
+        del self._pending[user_id]
+        if not load.cancelled() and load.exception() is None and load.result() is not None:
+            self._store(user_id, load.result())
+
+    async def get_profile(self, user_id: str):
+        """Returns the cached profile (do not mutate it) or loads it from MongoDB.
+
+        Concurrent misses for the same user share a single in-flight query
+        (single-flight), so parallel reads on app launch cost one round trip.
+        """
+        profile = self._lookup(user_id)
+        if profile is not None:
+            CACHE_HITS.labels(app_name=APP_NAME).inc()
+            return profile
+
+        load = self._pending.get(user_id)
+        if load is None:
+            CACHE_MISSES.labels(app_name=APP_NAME).inc()
+            load = self._start_load(user_id)
+        else:
+            CACHE_COALESCED.labels(app_name=APP_NAME).inc()
+        # shield: si una petición se cancela (cliente desconectado), la consulta sigue para las demás
+        return await asyncio.shield(load)
+
+
+def _build_backend():
+    if PROFILE_CACHE_REDIS_URL:
+        return RedisInvalidationBackend(PROFILE_CACHE_REDIS_URL)
+    return LocalInvalidationBackend()
+
+
+profile_cache = ProfileCache(
+    PROFILE_CACHE_TTL, PROFILE_CACHE_MAX_ENTRIES, _build_backend(), enabled=PROFILE_CACHE_ENABLED
+)
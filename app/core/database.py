@@ -1,14 +1,204 @@
-import os
+import asyncio
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
+from pymongo import ASCENDING, IndexModel, ReadPreference, monitoring
+from prometheus_client import Gauge, Histogram
+from app.core.instrumentation import command_listeners
+from app.core.settings import settings
 
-# Cargar variables de entorno
-load_dotenv()
+# URI de MongoDB (del entorno o del archivo .env)
+MONGO_URI = settings.mongo_uri
+MONGO_DB_NAME = settings.mongo_db_name
 
-# Leer la URI de MongoDB desde el archivo .env
-MONGO_URI = os.getenv("MONGO_URI")
+# Ajustes del pool de conexiones (un único cliente por worker)
+MONGO_MAX_POOL_SIZE = settings.mongo_max_pool_size
+MONGO_MIN_POOL_SIZE = settings.mongo_min_pool_size
+MONGO_MAX_IDLE_TIME_MS = settings.mongo_max_idle_time_ms
+MONGO_WAIT_QUEUE_TIMEOUT_MS = settings.mongo_wait_queue_timeout_ms
+MONGO_CONNECT_TIMEOUT_MS = settings.mongo_connect_timeout_ms
+MONGO_SOCKET_TIMEOUT_MS = settings.mongo_socket_timeout_ms
+MONGO_SERVER_SELECTION_TIMEOUT_MS = settings.mongo_server_selection_timeout_ms
+# zstd y snappy requieren los extras de pymongo; los compresores no disponibles se ignoran
+MONGO_COMPRESSORS = settings.mongo_compressors
+# Preferencia de lectura para las rutas de solo lectura de transcripciones
+MONGO_READ_PREFERENCE = settings.mongo_read_preference
+MONGO_WARMUP_CONNECTIONS = settings.mongo_warmup_connections
 
-# Conectar con la base de datos en la nube
-client = AsyncIOMotorClient(MONGO_URI)
-db = client["myMindDB-Users"]  
+APP_NAME = "mymind-users"
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time spent waiting to check out a MongoDB connection",
+    ["app_name"],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+POOL_IN_USE = Gauge("mongo_pool_connections_in_use", "MongoDB connections checked out", ["app_name"], multiprocess_mode="livesum")
+POOL_OPEN = Gauge("mongo_pool_connections_open", "MongoDB connections open", ["app_name"], multiprocess_mode="livesum")
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Exports connection pool checkout wait and usage to Prometheus."""
+
+    def __init__(self):
+        self._wait = POOL_CHECKOUT_WAIT.labels(app_name=APP_NAME)
+        self._in_use = POOL_IN_USE.labels(app_name=APP_NAME)
+        self._open = POOL_OPEN.labels(app_name=APP_NAME)
+
+    def connection_checked_out(self, event):
+        self._in_use.inc()
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            self._wait.observe(duration)
+
+    def connection_checked_in(self, event):
+        self._in_use.dec()
+
+    def connection_check_out_failed(self, event):
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            self._wait.observe(duration)
+
+    def connection_created(self, event):
+        self._open.inc()
+
+    def connection_closed(self, event):
+        self._open.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+# Cliente único del servicio. Con connect=False no resuelve el SRV ni arranca los hilos de
+# monitoreo al importar: eso ocurre en `connect()` (lifespan) o en la primera operación
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    compressors=MONGO_COMPRESSORS,
+    appname="mymind-users",
+    connect=False,
+    event_listeners=[PoolMetricsListener(), *command_listeners()],
+)
+db = client[MONGO_DB_NAME]
 users_collection = db["users"]
+
+# Transcripciones en su propia colección (una por documento, con user_id)
+transcriptions_collection = db["transcriptions"]
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+# Lecturas de transcripciones que toleran réplicas (listados, analíticas, exportación)
+transcriptions_read_collection = transcriptions_collection.with_options(
+    read_preference=READ_PREFERENCES[MONGO_READ_PREFERENCE]
+)
+
+# Agregados por usuario y bucket (día, semana, mes) para las analíticas
+rollups_collection = db["transcription_rollups"]
+rollups_read_collection = rollups_collection.with_options(read_preference=transcriptions_read_collection.read_preference)
+
+# Trabajos de borrado en segundo plano (cuentas e historiales)
+deletion_jobs_collection = db["deletion_jobs"]
+
+# Estadísticas de términos por usuario para la búsqueda de texto (BM25)
+search_terms_collection = db["transcription_terms"]
+search_terms_read_collection = search_terms_collection.with_options(read_preference=transcriptions_read_collection.read_preference)
+
+TRANSCRIPTION_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("time", ASCENDING), ("_id", ASCENDING)], name="user_date_time_id"),
+    IndexModel([("user_id", ASCENDING), ("emotion", ASCENDING), ("date", ASCENDING), ("time", ASCENDING), ("_id", ASCENDING)], name="user_emotion_date_time_id"),
+    IndexModel([("user_id", ASCENDING), ("sentiment", ASCENDING), ("date", ASCENDING), ("time", ASCENDING), ("_id", ASCENDING)], name="user_sentiment_date_time_id"),
+    IndexModel([("user_id", ASCENDING), ("topic", ASCENDING), ("date", ASCENDING), ("time", ASCENDING), ("_id", ASCENDING)], name="user_topic_date_time_id"),
+    # Campos de tiempo normalizados: rangos de fechas, horas (incluso pasando medianoche) y día de la semana
+    IndexModel([("user_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)], name="user_timestamp_id"),
+    IndexModel([("user_id", ASCENDING), ("hour", ASCENDING), ("date", ASCENDING), ("time", ASCENDING), ("_id", ASCENDING)], name="user_hour_date_time_id"),
+    IndexModel([("user_id", ASCENDING), ("weekday", ASCENDING), ("date", ASCENDING), ("time", ASCENDING), ("_id", ASCENDING)], name="user_weekday_date_time_id"),
+    # Índice invertido: una entrada por raíz de cada transcripción
+    IndexModel([("user_id", ASCENDING), ("search.terms", ASCENDING)], name="user_search_terms"),
+]
+
+ROLLUP_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)], name="user_granularity_bucket", unique=True),
+]
+
+# Los trabajos terminados se conservan DELETION_JOB_RETENTION_SECONDS para consultar su estado
+DELETION_JOB_RETENTION_SECONDS = settings.deletion_job_retention_seconds
+
+DELETION_JOB_INDEXES = [
+    # A lo sumo un trabajo activo por usuario
+    IndexModel([("user_id", ASCENDING)], name="user_active", unique=True, partialFilterExpression={"active": True}),
+    IndexModel([("active", ASCENDING), ("created_at", ASCENDING)], name="active_created_at"),
+    IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=DELETION_JOB_RETENTION_SECONDS),
+]
+
+SEARCH_TERM_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("term", ASCENDING)], name="user_term", unique=True),
+]
+
+
+async def create_indexes():
+    """Creates the transcriptions, rollups, search and deletion job indexes. Safe to call on every startup."""
+    await transcriptions_collection.create_indexes(TRANSCRIPTION_INDEXES)
+    await rollups_collection.create_indexes(ROLLUP_INDEXES)
+    await search_terms_collection.create_indexes(SEARCH_TERM_INDEXES)
+    await deletion_jobs_collection.create_indexes(DELETION_JOB_INDEXES)
+
+
+async def connect():
+    """Checks connectivity and opens the warm-up connections before serving traffic."""
+    start = time.perf_counter()
+    await client.admin.command("ping")
+    # Pings concurrentes para abrir varias conexiones del pool de una vez
+    if MONGO_WARMUP_CONNECTIONS > 1:
+        await asyncio.gather(*(client.admin.command("ping") for _ in range(MONGO_WARMUP_CONNECTIONS)))
+    print(f"MongoDB listo en {time.perf_counter() - start:.3f}s ({MONGO_WARMUP_CONNECTIONS} conexiones de calentamiento)")
+
+
+_warm_up_task = None
+
+
+async def _warm_up():
+    try:
+        await connect()
+        await create_indexes()
+    except Exception as e:
+        # La primera petición vuelve a intentar la conexión; los índices, en el próximo arranque
+        print(f"Error preparando MongoDB en segundo plano: {e}")
+
+
+def start_warm_up():
+    """Lazy startup: runs `connect()` and `create_indexes()` in the background instead of before serving."""
+    global _warm_up_task
+    _warm_up_task = asyncio.create_task(_warm_up())
+
+
+def close():
+    """Closes the client and its connection pool."""
+    if _warm_up_task:
+        _warm_up_task.cancel()
+    client.close()
@@ -0,0 +1,284 @@
+"""Borrado de cuentas y de historiales como trabajos en segundo plano.
+
+Las rutas de borrado solo encolan un documento en `deletion_jobs` y responden
+202; un worker de asyncio por proceso toma los trabajos pendientes y borra las
+transcripciones en lotes de DELETION_BATCH_SIZE con una pausa entre lotes, para
+no acaparar MongoDB.
+
+Cada trabajo se toma con una concesión (`locked_until`) que el worker renueva en
+cada lote. Si el proceso muere, la concesión vence y otro worker (o el mismo al
+reiniciar) retoma el trabajo; borrar "lo que quede" es idempotente, así que
+repetir un lote no tiene efectos extra. Mientras un usuario tenga un borrado
+activo se rechazan sus escrituras (registro e ingesta) para que el trabajo no
+borre datos nuevos, y las lecturas no migran sus transcripciones embebidas.
+
+Aun así, otros procesos pueden escribir después de la primera pasada: los `$inc`
+con upsert que su buffer de escritura diferida tenía pendientes recrearían
+agregados y estadísticas de búsqueda, y una migración al leer que empezó antes
+del trabajo puede copiar transcripciones embebidas. Por eso la primera pasada no
+termina el trabajo: lo deja activo con la concesión hasta dentro de
+DELETION_SWEEP_DELAY_SECONDS (más que la ventana de escritura diferida de
+cualquier proceso) y entonces un worker lo retoma para una pasada final
+(`phase: "sweep"`) que borra lo que haya aparecido y lo marca `done`.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.database import deletion_jobs_collection, transcriptions_collection, users_collection
+from app.core.rollups import delete_rollups
+from app.core.search import delete_search_stats
+from app.core.settings import settings
+from app.core.versioning import bump_version
+from app.core.write_behind import write_behind
+
+DELETION_BATCH_SIZE = settings.deletion_batch_size
+DELETION_BATCH_DELAY_SECONDS = settings.deletion_batch_delay_seconds
+DELETION_POLL_SECONDS = settings.deletion_poll_seconds
+DELETION_LEASE_SECONDS = settings.deletion_lease_seconds
+DELETION_MAX_ATTEMPTS = settings.deletion_max_attempts
+DELETION_SWEEP_DELAY_SECONDS = settings.deletion_sweep_delay_seconds
+
+ACCOUNT = "account"
+TRANSCRIPTIONS = "transcriptions"
+
+APP_NAME = "mymind-users"
+
+QUEUE_DEPTH = Gauge(
+    "deletion_jobs_queue_depth", "Deletion jobs pending or running", ["app_name"], multiprocess_mode="max"
+)
+DELETED_DOCUMENTS = Counter(
+    "deletion_jobs_deleted_documents_total", "Transcriptions deleted by background jobs", ["app_name"]
+)
+JOBS_FINISHED = Counter("deletion_jobs_finished_total", "Deletion jobs finished", ["status", "app_name"])
+BATCH_DURATION = Histogram(
+    "deletion_jobs_batch_duration_seconds", "Time to delete one batch of transcriptions", ["app_name"],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+
+
+def _now() -> datetime:
+    # UTC sin zona, como lo devuelve pymongo
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def job_status(job: dict) -> dict:
+    """Public view of a job document."""
+    return {
+        "job_id": job["_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "deleted": job.get("deleted", 0),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "error": job.get("error"),
+    }
+
+
+async def active_job(user_id: str):
+    """The user's pending or running deletion job, if any (at most one, by a unique partial index)."""
+    return await deletion_jobs_collection.find_one({"user_id": user_id, "active": True})
+
+
+async def deletion_in_progress(user_id: str) -> bool:
+    """Whether the user has a pending or running deletion job."""
+    return await active_job(user_id) is not None
+
+
+async def ensure_no_active_deletion(user_id: str):
+    """Raises 409 while the user's data is being deleted."""
+    if await active_job(user_id):
+        raise HTTPException(status_code=409, detail="A deletion is in progress for this user")
+
+
+async def enqueue_deletion(user_id: str, kind: str) -> dict:
+    """Enqueues a deletion job, or returns the active one (an account job covers a transcriptions job)."""
+    job = await active_job(user_id)
+    if job and (job["kind"] == kind or job["kind"] == ACCOUNT):
+        return job
+    if job:
+        # Un borrado de cuenta reemplaza al de transcripciones: el trabajo existente se amplía
+        return await deletion_jobs_collection.find_one_and_update(
+            {"_id": job["_id"]}, {"$set": {"kind": ACCOUNT}}, return_document=ReturnDocument.AFTER
+        )
+
+    job = {
+        "_id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "kind": kind,
+        "status": "pending",
+        "active": True,
+        "deleted": 0,
+        "attempts": 0,
+        "created_at": _now(),
+        "locked_until": None,
+    }
+    try:
+        await deletion_jobs_collection.insert_one(job)
+    except DuplicateKeyError:
+        # Otra petición encoló un borrado para el mismo usuario al mismo tiempo: se usa ese trabajo
+        if not await active_job(user_id):
+            raise HTTPException(status_code=409, detail="A deletion is in progress for this user")
+        return await enqueue_deletion(user_id, kind)
+    deletion_worker.wake()
+    return job
+
+
+async def get_job(user_id: str, job_id: str):
+    return await deletion_jobs_collection.find_one({"_id": job_id, "user_id": user_id})
+
+
+class DeletionWorker:
+    """Claims deletion jobs from MongoDB and runs them in throttled batches."""
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._task = None
+        self._wake = asyncio.Event()
+        self._current_job = None
+
+    def wake(self):
+        self._wake.set()
+
+    async def claim(self):
+        """Atomically takes the oldest pending job, or a running one whose lease expired."""
+        now = _now()
+        return await deletion_jobs_collection.find_one_and_update(
+            {"active": True, "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}]},
+            {
+                "$set": {"status": "running", "locked_by": self.worker_id, "locked_until": now + timedelta(seconds=DELETION_LEASE_SECONDS)},
+                "$min": {"started_at": now},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _delete_batch(self, job: dict) -> int:
+        """Deletes one batch of the user's transcriptions and renews the lease. Returns the count."""
+        with BATCH_DURATION.labels(app_name=APP_NAME).time():
+            cursor = transcriptions_collection.find({"user_id": job["user_id"]}, {"_id": 1}).limit(DELETION_BATCH_SIZE)
+            ids = [doc["_id"] async for doc in cursor]
+            if not ids:
+                return 0
+            result = await transcriptions_collection.delete_many({"_id": {"$in": ids}, "user_id": job["user_id"]})
+
+        DELETED_DOCUMENTS.labels(app_name=APP_NAME).inc(result.deleted_count)
+        await bump_version(job["user_id"])
+        await deletion_jobs_collection.update_one(
+            {"_id": job["_id"], "locked_by": self.worker_id},
+            {
+                "$inc": {"deleted": result.deleted_count},
+                "$set": {"locked_until": _now() + timedelta(seconds=DELETION_LEASE_SECONDS)},
+            },
+        )
+        return len(ids)
+
+    async def run_job(self, job: dict):
+        """Deletes the transcriptions batch by batch, then the derived data (and the account).
+
+        The first pass leaves the job active for a final sweep after
+        DELETION_SWEEP_DELAY_SECONDS; the sweep repeats the pass and finishes the job.
+        """
+        user_id = job["user_id"]
+        while await self._delete_batch(job):
+            await asyncio.sleep(DELETION_BATCH_DELAY_SECONDS)
+
+        # Los cambios diferidos de este proceso se escriben antes de borrar lo que recalculan
+        await write_behind.flush()
+        await delete_rollups(user_id)
+        await delete_search_stats(user_id)
+        # El tipo se relee: un borrado de cuenta puede haber ampliado el trabajo mientras corría
+        current = await deletion_jobs_collection.find_one({"_id": job["_id"]}, {"kind": 1})
+        if current and current["kind"] == ACCOUNT:
+            await users_collection.delete_one({"_id": user_id})
+        else:
+            # Transcripciones embebidas que aún no se hayan migrado
+            await users_collection.update_one(
+                {"_id": user_id, "transcriptions.0": {"$exists": True}}, {"$set": {"transcriptions": []}}
+            )
+            await bump_version(user_id)
+
+        if job.get("phase") != "sweep":
+            # La concesión difiere la pasada final; cualquier worker la retoma al vencer
+            await deletion_jobs_collection.update_one(
+                {"_id": job["_id"], "locked_by": self.worker_id},
+                {"$set": {"phase": "sweep", "locked_until": _now() + timedelta(seconds=DELETION_SWEEP_DELAY_SECONDS)}},
+            )
+            return
+
+        await deletion_jobs_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "done", "finished_at": _now(), "locked_until": None, "error": None}, "$unset": {"active": ""}},
+        )
+        JOBS_FINISHED.labels(status="done", app_name=APP_NAME).inc()
+
+    async def _fail(self, job: dict, error: Exception):
+        attempts = job.get("attempts", 0) + 1
+        failed = attempts >= DELETION_MAX_ATTEMPTS
+        update = {"$set": {"attempts": attempts, "error": str(error), "status": "failed" if failed else "pending"}}
+        if failed:
+            update["$set"].update(finished_at=_now(), locked_until=None)
+            update["$unset"] = {"active": ""}
+            JOBS_FINISHED.labels(status="failed", app_name=APP_NAME).inc()
+        else:
+            # Reintento con espera creciente: la concesión bloquea el trabajo hasta entonces
+            update["$set"]["locked_until"] = _now() + timedelta(seconds=min(2 ** attempts, 300))
+        await deletion_jobs_collection.update_one({"_id": job["_id"]}, update)
+
+    async def _update_queue_depth(self):
+        depth = await deletion_jobs_collection.count_documents({"active": True})
+        QUEUE_DEPTH.labels(app_name=APP_NAME).set(depth)
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await self._update_queue_depth()
+                job = await self.claim()
+                if job is None:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=DELETION_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self._current_job = job
+                try:
+                    await self.run_job(job)
+                except Exception as e:
+                    print(f"Error en el borrado {job['_id']} (usuario {job['user_id']}): {e}")
+                    await self._fail(job, e)
+                finally:
+                    self._current_job = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error en el worker de borrados: {e}")
+                await asyncio.sleep(DELETION_POLL_SECONDS)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Liberar la concesión para que el trabajo se retome sin esperar a que venza
+        if self._current_job:
+            await deletion_jobs_collection.update_one(
+                {"_id": self._current_job["_id"], "locked_by": self.worker_id, "status": "running"},
+                {"$set": {"status": "pending", "locked_until": None}},
+            )
+            self._current_job = None
+
+
+deletion_worker = DeletionWorker()
@@ -0,0 +1,50 @@
+"""Exportación en streaming (NDJSON, opcionalmente gzip) del historial de un usuario.
+
+La primera línea es el perfil y cada línea siguiente una transcripción leída de
+un cursor de Motor por lotes, así que la memoria usada no depende del tamaño del
+historial. El generador solo avanza cuando el servidor ASGI acepta el bloque
+anterior, lo que da contrapresión hacia MongoDB.
+"""
+import zlib
+
+from app.core.database import transcriptions_read_collection
+from app.core.query_builder import TRANSCRIPTION_PROJECTION
+from app.core.responses import dumps
+
+EXPORT_BATCH_SIZE = 500
+# Tamaño aproximado de cada bloque enviado al cliente
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _line(kind: str, data: dict) -> bytes:
+    # Mismo serializador que las respuestas JSON: fechas en ISO 8601 como en /users/profile
+    return dumps({"type": kind, "data": data}) + b"\n"
+
+
+async def _ndjson_chunks(profile: dict):
+    buffer = bytearray(_line("profile", profile))
+    cursor = transcriptions_read_collection.find(
+        {"user_id": profile["_id"]}, TRANSCRIPTION_PROJECTION, batch_size=EXPORT_BATCH_SIZE
+    ).sort([("date", 1), ("time", 1), ("_id", 1)])
+    async for transcription in cursor:
+        buffer += _line("transcription", transcription)
+        if len(buffer) >= EXPORT_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def export_stream(profile: dict, compress: bool = False):
+    """Yields the export as NDJSON chunks, gzip-compressed when `compress` is set."""
+    if not compress:
+        async for chunk in _ndjson_chunks(profile):
+            yield chunk
+        return
+
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in _ndjson_chunks(profile):
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
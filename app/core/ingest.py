@@ -0,0 +1,314 @@
+"""Lectura incremental de lotes de transcripciones (NDJSON o arreglo JSON).
+
+Los parsers consumen el cuerpo de la petición a medida que llega y producen
+`(index, item, error)` por elemento, sin cargar el payload completo en memoria.
+Cada bloque se valida con una sola llamada a `validate_transcriptions`; solo si el
+bloque tiene elementos inválidos se valida cada uno por separado, para reportar
+cuáles fallan y por qué.
+"""
+import codecs
+import json
+
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import ValidationError
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from app.core.database import transcriptions_collection
+from app.core.instrumentation import phase
+from app.core.search import search_document
+from app.core.settings import settings
+from app.core.time_fields import time_fields
+from app.core.write_behind import apply_transcription_changes
+from app.schemas.transcription_schema import Transcription, validate_transcriptions
+
+MAX_ITEM_BYTES = 1024 * 1024
+INGEST_CHUNK_SIZE = settings.ingest_chunk_size
+MAX_INGEST_CHUNK_SIZE = 5000
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+class IngestFormatError(ValueError):
+    """The body is not valid NDJSON / JSON array framing (not just one bad item)."""
+
+
+async def _text_chunks(stream):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in stream:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_ndjson(stream):
+    """Yields one parsed item per non-empty line."""
+    index = 0
+    buffer = ""
+    async for text in _text_chunks(stream):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        if len(buffer) > MAX_ITEM_BYTES:
+            raise IngestFormatError(f"Item {index} exceeds {MAX_ITEM_BYTES} bytes")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(index, line)
+                index += 1
+    if buffer.strip():
+        yield _parse_line(index, buffer)
+
+
+def _parse_line(index, line):
+    try:
+        return index, json.loads(line), None
+    except ValueError as e:
+        return index, None, f"Invalid JSON: {e}"
+
+
+async def iter_json_array(stream):
+    """Yields the elements of a top-level JSON array as they are completed."""
+    index = 0
+    buffer = ""
+    pos = 0
+    started = finished = False
+    # Tras un elemento solo puede venir `,` o `]`; tras `,`, otro elemento
+    after_item = after_comma = False
+    async for text in _text_chunks(stream):
+        buffer = buffer[pos:] + text
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer) or finished:
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise IngestFormatError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]" and not after_comma:
+                finished = True
+                pos += 1
+                continue
+            if after_item:
+                if buffer[pos] != ",":
+                    raise IngestFormatError(f"Expected ',' or ']' after item {index - 1}")
+                after_item, after_comma = False, True
+                pos += 1
+                continue
+            if buffer[pos] in ",]":
+                raise IngestFormatError(f"Expected item {index}, found '{buffer[pos]}'")
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # Elemento incompleto: esperar más datos
+                if len(buffer) - pos > MAX_ITEM_BYTES:
+                    raise IngestFormatError(f"Item {index} exceeds {MAX_ITEM_BYTES} bytes")
+                break
+            if end == len(buffer) and buffer[pos] not in '{["':
+                # Un número o literal al final del bloque puede seguir en el siguiente ("12" llega como "1" + "2")
+                break
+            yield index, item, None
+            index += 1
+            pos = end
+            after_item, after_comma = True, False
+    if not started or not finished:
+        raise IngestFormatError("Truncated JSON array")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streams the response while the body iterator is still reading the request body.
+
+    `StreamingResponse` may listen for the client disconnect on `receive`, which
+    would compete with `request.stream()` for the request body messages. Here the
+    disconnect is seen by `request.stream()` itself (`ClientDisconnect`) or, once
+    the body is read, by `send` (`OSError`); either one ends the stream quietly,
+    as in `StreamingResponse`.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except (ClientDisconnect, OSError):
+            # Los bloques ya escritos quedan; lo leído y aún sin escribir se descarta
+            print("Ingesta interrumpida: el cliente se desconectó")
+            await self.body_iterator.aclose()
+            return
+        if self.background is not None:
+            await self.background()
+
+
+def _document(user_id: str, transcription_id: str, transcription: Transcription) -> dict:
+    doc = transcription.model_dump()
+    doc["_id"] = transcription_id
+    doc["user_id"] = user_id
+    doc["search"] = search_document(doc["text"])
+    doc.update(time_fields(doc))
+    return doc
+
+
+def _pop_id(item: dict):
+    """Copy of the item without `_id`, and that `_id` (a new one if missing; None if it is not a string)."""
+    item = dict(item)
+    transcription_id = item.pop("_id", None)
+    if transcription_id is None or transcription_id == "":
+        return str(ObjectId()), item
+    # Un objeto, número o lista no se convierte en texto: `{"$gt": ""}` no es un id
+    if not isinstance(transcription_id, str):
+        return None, item
+    return transcription_id, item
+
+
+def build_document(user_id: str, item):
+    """Validates one item against `Transcription`. Returns (document, error)."""
+    if not isinstance(item, dict):
+        return None, "Expected a JSON object"
+    transcription_id, item = _pop_id(item)
+    if transcription_id is None:
+        return None, [{"loc": ["_id"], "msg": "Input should be a valid string"}]
+    try:
+        with phase("validation"):
+            transcription = Transcription.model_validate(item)
+    except ValidationError as e:
+        return None, [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+    return _document(user_id, transcription_id, transcription), None
+
+
+def build_documents(user_id: str, items: list) -> list:
+    """Validates a chunk of items with one `TypeAdapter` call. Returns [(document, error)] in order.
+
+    If any item is invalid the chunk is validated again item by item, only to
+    report which ones failed and why.
+    """
+    if not all(isinstance(item, dict) for item in items):
+        return [build_document(user_id, item) for item in items]
+    ids, fields = [], []
+    for item in items:
+        transcription_id, item = _pop_id(item)
+        ids.append(transcription_id)
+        fields.append(item)
+    if None in ids:
+        return [build_document(user_id, item) for item in items]
+    try:
+        with phase("validation"):
+            transcriptions = validate_transcriptions(fields)
+    except ValidationError:
+        return [build_document(user_id, item) for item in items]
+    return [
+        (_document(user_id, transcription_id, transcription), None)
+        for transcription_id, transcription in zip(ids, transcriptions)
+    ]
+
+
+async def write_chunk(user_id: str, batch: list, ordered: bool):
+    """Writes one chunk with `bulk_write` and returns the per-item results."""
+    errors = {}
+    try:
+        await transcriptions_collection.bulk_write([InsertOne(doc) for _, doc in batch], ordered=ordered)
+    except BulkWriteError as e:
+        errors = {err["index"]: err.get("errmsg", "Write error") for err in e.details.get("writeErrors", [])}
+
+    # En modo ordenado MongoDB se detiene en el primer error y no intenta el resto
+    first_error = min(errors) if errors else None
+    results, inserted = [], []
+    for position, (index, doc) in enumerate(batch):
+        if position in errors:
+            results.append({"index": index, "status": "error", "detail": errors[position]})
+        elif ordered and first_error is not None and position > first_error:
+            results.append({"index": index, "status": "skipped"})
+        else:
+            inserted.append(doc)
+            results.append({"index": index, "status": "inserted", "_id": doc["_id"]})
+
+    await apply_transcription_changes(user_id, inserted)
+    return results, len(inserted), bool(errors)
+
+
+def _line(payload: dict) -> bytes:
+    return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def process_chunk(user_id: str, pending: list, ordered: bool):
+    """Validates a chunk of (index, item) and writes its valid items.
+
+    Returns (NDJSON lines, inserted, failed, stop); `stop` means an ordered ingest must end here.
+    """
+    lines, batch = [], []
+    failed = 0
+    stop = False
+    for (index, _), (doc, error) in zip(pending, build_documents(user_id, [item for _, item in pending])):
+        if error is not None:
+            failed += 1
+            lines.append(_line({"index": index, "status": "invalid", "detail": error}))
+            if ordered:
+                stop = True
+                break
+            continue
+        batch.append((index, doc))
+
+    # Lo validado antes de un error se escribe igual, como en un bulk_write ordenado
+    inserted = 0
+    if batch:
+        results, inserted, had_errors = await write_chunk(user_id, batch, ordered)
+        failed += len(results) - inserted
+        lines += [_line(result) for result in results]
+        stop = stop or (ordered and had_errors)
+    return lines, inserted, failed, stop
+
+
+async def ingest_stream(user_id: str, items, ordered: bool, chunk_size: int):
+    """Validates and writes streamed items chunk by chunk, yielding NDJSON results as it goes."""
+    pending = []
+    inserted = failed = 0
+    aborted = False
+    try:
+        async for index, item, error in items:
+            if error is not None:
+                if ordered and pending:
+                    # Los elementos anteriores van primero: uno inválido entre ellos detiene la ingesta antes
+                    lines, count, chunk_failed, aborted = await process_chunk(user_id, pending, ordered)
+                    pending = []
+                    inserted += count
+                    failed += chunk_failed
+                    for line in lines:
+                        yield line
+                    if aborted:
+                        break
+                failed += 1
+                yield _line({"index": index, "status": "invalid", "detail": error})
+                if ordered:
+                    aborted = True
+                    break
+                continue
+
+            pending.append((index, item))
+            if len(pending) >= chunk_size:
+                lines, count, chunk_failed, aborted = await process_chunk(user_id, pending, ordered)
+                pending = []
+                inserted += count
+                failed += chunk_failed
+                for line in lines:
+                    yield line
+                if aborted:
+                    break
+    except IngestFormatError as e:
+        aborted = True
+        yield _line({"status": "aborted", "detail": str(e)})
+
+    # Lo leído antes de un error de formato (o del fin del cuerpo) se valida y escribe igual
+    if pending:
+        lines, count, chunk_failed, stopped = await process_chunk(user_id, pending, ordered)
+        inserted += count
+        failed += chunk_failed
+        aborted = aborted or stopped
+        for line in lines:
+            yield line
+
+    yield _line({"summary": {"inserted": inserted, "failed": failed, "aborted": aborted}})
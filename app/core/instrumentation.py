@@ -0,0 +1,293 @@
+"""Instrumentación por petición (opcional): tiempos por fase, consultas lentas y perfilado.
+
+Con INSTRUMENTATION_ENABLED=true cada petición lleva un `RequestSpan` en un
+contextvar que suma el tiempo de:
+
+- `db`: comandos de MongoDB, medidos por un `CommandListener` de PyMongo (Motor
+  copia el contexto al hilo donde corre cada operación);
+- `validation`: validación con pydantic en el código del servicio (`phase()`);
+- `serialization`: render de las respuestas JSON.
+
+Al terminar, las fases (y `other`, el resto) se observan en
+`request_phase_duration_seconds` por ruta. Las peticiones de más de
+SLOW_REQUEST_MS y los comandos de más de SLOW_COMMAND_MS se registran en el log,
+los comandos con la forma de su filtro (los valores se reemplazan por `?`).
+
+Con PROFILING_TOKEN definido, una petición con `X-Profile: <token>` se ejecuta
+bajo pyinstrument y responde el reporte (HTML, o speedscope con
+`X-Profile-Format: speedscope`) en lugar de su cuerpo, con `Server-Timing` por
+fase. La ruta se ejecuta completa, con sus efectos. Requiere el paquete
+`pyinstrument`.
+"""
+import contextvars
+import hmac
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+from prometheus_client import Histogram
+from pymongo import monitoring
+
+from app.core.metrics import METRICS_PATH, RouteTemplates
+from app.core.settings import settings
+
+APP_NAME = "mymind-users"
+
+INSTRUMENTATION_ENABLED = settings.instrumentation_enabled
+SLOW_REQUEST_MS = settings.slow_request_ms
+SLOW_COMMAND_MS = settings.slow_command_ms
+PROFILING_TOKEN = settings.profiling_token
+PROFILING_INTERVAL = settings.profiling_interval
+PROFILE_HEADER = b"x-profile"
+PROFILE_FORMAT_HEADER = b"x-profile-format"
+
+PHASES = ("db", "validation", "serialization")
+
+PHASE_DURATION = Histogram(
+    "request_phase_duration_seconds",
+    "Time spent per request in each phase (db, validation, serialization, other)",
+    ["method", "endpoint", "phase", "app_name"],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5],
+)
+COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency as seen by the driver",
+    ["command", "collection", "app_name"],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+
+# Comandos cuyo tiempo se mide; los de handshake y monitoreo se ignoran
+MEASURED_COMMANDS = frozenset({
+    "find", "aggregate", "getMore", "count", "distinct", "insert", "update", "delete", "findAndModify",
+    "createIndexes",
+})
+
+_current_span = contextvars.ContextVar("request_span", default=None)
+
+
+class RequestSpan:
+    """Time accumulated by one request in each phase. Safe to update from Motor's threads."""
+
+    __slots__ = ("start", "phases", "db_commands", "_lock")
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.db_commands = 0
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] += seconds
+
+    def add_command(self, seconds: float):
+        with self._lock:
+            self.phases["db"] += seconds
+            self.db_commands += 1
+
+    def summary(self, total: float) -> dict:
+        phases = dict(self.phases)
+        phases["other"] = max(0.0, total - sum(phases.values()))
+        return phases
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Adds the block's duration to the current request's `name` phase (no-op without a span)."""
+    span = _current_span.get()
+    if span is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        span.add(name, perf_counter() - start)
+
+
+def query_shape(value):
+    """Replaces literal values with "?", keeping operators and field names."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        # Listas de valores ($in, etc.) se resumen en uno solo
+        return shapes[:1] if all(not isinstance(item, (dict, list)) for item in value) else shapes
+    return "?"
+
+
+def command_shape(name: str, command: dict) -> dict:
+    """Filter shape of a driver command, for slow-command logs."""
+    if name == "find" or name == "count" or name == "distinct":
+        return {"filter": query_shape(command.get("filter", command.get("query", {})))}
+    if name == "aggregate":
+        return {"pipeline": query_shape(command.get("pipeline", []))}
+    if name == "findAndModify":
+        return {"filter": query_shape(command.get("query", {}))}
+    if name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or []
+        return {"filter": query_shape(statements[0].get("q", {})) if statements else {}, "statements": len(statements)}
+    return {}
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """Adds MongoDB command time to the request span and logs slow commands with their shape."""
+
+    def __init__(self):
+        self._started = {}
+        self._histograms = {}
+
+    def _histogram(self, command: str, collection: str):
+        key = (command, collection)
+        child = self._histograms.get(key)
+        if child is None:
+            child = self._histograms[key] = COMMAND_DURATION.labels(
+                command=command, collection=collection, app_name=APP_NAME
+            )
+        return child
+
+    def started(self, event):
+        if event.command_name in MEASURED_COMMANDS:
+            # Solo se guarda una referencia; la forma se calcula si el comando resulta lento
+            self._started[(event.connection_id, event.request_id)] = event.command
+
+    def _finished(self, event):
+        command = self._started.pop((event.connection_id, event.request_id), None)
+        if command is None:
+            return
+        seconds = event.duration_micros / 1_000_000
+        name = event.command_name
+        # En getMore el valor del comando es el id del cursor; la colección va aparte
+        collection = command.get("collection") if name == "getMore" else command.get(name)
+        if not isinstance(collection, str):
+            collection = "<none>"
+        self._histogram(name, collection).observe(seconds)
+        span = _current_span.get()
+        if span is not None:
+            span.add_command(seconds)
+        if seconds * 1000 >= SLOW_COMMAND_MS:
+            print(f"Comando lento de MongoDB: {name} {collection} {seconds * 1000:.1f} ms {command_shape(name, command)}")
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+
+def command_listeners() -> list:
+    """Listeners to register on the Mongo client (empty unless instrumentation is enabled)."""
+    return [CommandTimingListener()] if INSTRUMENTATION_ENABLED else []
+
+
+def server_timing(phases: dict, total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class InstrumentationMiddleware:
+    """Per-request phase spans, slow-request logs and on-demand profiling (pure ASGI)."""
+
+    def __init__(self, app, app_name: str = APP_NAME):
+        self.app = app
+        self.app_name = app_name
+        self._templates = None
+        self._children = {}
+
+    def _phase_histograms(self, method: str, endpoint: str):
+        key = (method, endpoint)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = {
+                name: PHASE_DURATION.labels(method=method, endpoint=endpoint, phase=name, app_name=self.app_name)
+                for name in PHASES + ("other",)
+            }
+        return children
+
+    def _profile_requested(self, scope) -> bool:
+        if not PROFILING_TOKEN:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, PROFILING_TOKEN.encode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+        profile = self._profile_requested(scope)
+        if not INSTRUMENTATION_ENABLED and not profile:
+            await self.app(scope, receive, send)
+            return
+
+        span = RequestSpan()
+        token = _current_span.set(span)
+        try:
+            if profile:
+                await self._profile(scope, receive, send, span)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            _current_span.reset(token)
+            self._record(scope, span, perf_counter() - span.start)
+
+    def _record(self, scope, span: RequestSpan, total: float):
+        if self._templates is None:
+            self._templates = RouteTemplates(scope["app"])
+        method = scope["method"]
+        endpoint = self._templates.resolve(scope["path"])
+        phases = span.summary(total)
+        for name, histogram in self._phase_histograms(method, endpoint).items():
+            histogram.observe(phases[name])
+        if total * 1000 >= SLOW_REQUEST_MS:
+            detail = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in phases.items())
+            print(f"Petición lenta: {method} {endpoint} {total * 1000:.1f} ms ({detail}; {span.db_commands} comandos)")
+
+    async def _profile(self, scope, receive, send, span: RequestSpan):
+        """Runs the request under pyinstrument and answers with the report instead of the body."""
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("X-Profile ignorado: pyinstrument no está instalado")
+            await self.app(scope, receive, send)
+            return
+
+        status = None
+
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = Profiler(interval=PROFILING_INTERVAL, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profiler.stop()
+
+        total = perf_counter() - span.start
+        formats = dict(scope["headers"]).get(PROFILE_FORMAT_HEADER, b"html")
+        if formats == b"speedscope":
+            from pyinstrument.renderers import SpeedscopeRenderer
+
+            body, content_type = profiler.output(SpeedscopeRenderer()).encode("utf-8"), b"application/json"
+        else:
+            body, content_type = profiler.output_html().encode("utf-8"), b"text/html; charset=utf-8"
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"server-timing", server_timing(span.summary(total), total).encode("latin-1")),
+                (b"x-profiled-status", str(status).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
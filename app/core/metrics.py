@@ -0,0 +1,184 @@
+"""Métricas HTTP de Prometheus con un middleware ASGI puro.
+
+Las etiquetas `endpoint` usan la plantilla de la ruta (p. ej.
+`/users/transcriptions/by-emotion/{emotion}`) y no la ruta cruda, así que la
+cardinalidad queda acotada por el número de rutas; las peticiones que no
+coinciden con ninguna ruta comparten la etiqueta `<unmatched>`. Los hijos
+`.labels(...)` se crean una vez por combinación y se reutilizan.
+
+Con varios workers (gunicorn) se define PROMETHEUS_MULTIPROC_DIR: cada proceso
+escribe sus valores en ese directorio y `/metrics` los agrega.
+"""
+from time import perf_counter
+
+from fastapi import Request
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from starlette.routing import compile_path
+
+from app.core.settings import settings
+
+APP_NAME = "mymind-users"
+METRICS_PATH = "/metrics"
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Contadores personalizados
+REQUEST_COUNT = Counter(
+    'fastapi_requests_total',
+    'Total number of requests',
+    ['method', 'endpoint', 'app_name']
+)
+
+RESPONSE_COUNT = Counter(
+    'fastapi_responses_total',
+    'Total number of responses',
+    ['method', 'endpoint', 'status_code', 'app_name']
+)
+RESPONSE_COUNT.labels(method="GET", endpoint="/", status_code="500", app_name=APP_NAME).inc(0)
+
+EXCEPTION_COUNT = Counter(
+    'fastapi_exceptions_total',
+    'Total number of exceptions',
+    ['method', 'endpoint', 'exception', 'app_name']
+)
+EXCEPTION_COUNT.labels(method="GET", endpoint="/", exception="None", app_name=APP_NAME).inc(0)
+
+IN_PROGRESS = Gauge(
+    'fastapi_requests_in_progress',
+    'Number of requests in progress',
+    ['method', 'endpoint', 'app_name'],
+    multiprocess_mode='livesum'
+)
+
+REQUEST_LATENCY = Histogram(
+    'fastapi_request_duration_seconds',
+    'Request latency',
+    ['method', 'endpoint', 'app_name'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+)
+
+
+class RouteTemplates:
+    """Maps request paths to route templates using the app's OpenAPI path table.
+
+    Static paths are resolved with a dict lookup and the parameterised ones with
+    their compiled regexes, in registration order (like the router). It does not
+    depend on how the FastAPI version nests included routers.
+    """
+
+    def __init__(self, app):
+        self.static = {}
+        self.dynamic = []
+        for template in app.openapi().get("paths", {}):
+            if "{" in template:
+                regex, _, _ = compile_path(template)
+                self.dynamic.append((regex, template))
+            else:
+                self.static[template] = template
+
+    def resolve(self, path: str) -> str:
+        template = self.static.get(path)
+        if template is not None:
+            return template
+        for regex, template in self.dynamic:
+            if regex.match(path):
+                return template
+        return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Counts each HTTP request once, labelled by method and route template."""
+
+    def __init__(self, app, app_name: str = APP_NAME):
+        self.app = app
+        self.app_name = app_name
+        self._route_children = {}
+        self._response_children = {}
+        self._exception_children = {}
+        self._templates = None
+
+    def _children(self, method: str, endpoint: str):
+        children = self._route_children.get((method, endpoint))
+        if children is None:
+            labels = {"method": method, "endpoint": endpoint, "app_name": self.app_name}
+            children = (
+                REQUEST_COUNT.labels(**labels),
+                IN_PROGRESS.labels(**labels),
+                REQUEST_LATENCY.labels(**labels),
+            )
+            self._route_children[(method, endpoint)] = children
+        return children
+
+    def _response_counter(self, method: str, endpoint: str, status_code: int):
+        key = (method, endpoint, status_code)
+        child = self._response_children.get(key)
+        if child is None:
+            child = RESPONSE_COUNT.labels(
+                method=method, endpoint=endpoint, status_code=str(status_code), app_name=self.app_name
+            )
+            self._response_children[key] = child
+        return child
+
+    def _exception_counter(self, method: str, endpoint: str, exception: str):
+        key = (method, endpoint, exception)
+        child = self._exception_children.get(key)
+        if child is None:
+            child = EXCEPTION_COUNT.labels(
+                method=method, endpoint=endpoint, exception=exception, app_name=self.app_name
+            )
+            self._exception_children[key] = child
+        return child
+
+    async def __call__(self, scope, receive, send):
+        # Ignorar las métricas de monitoreo
+        if scope["type"] != "http" or scope["path"] == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        if self._templates is None:
+            # Las rutas se registran después del middleware; la tabla se arma en la primera petición
+            self._templates = RouteTemplates(scope["app"])
+        method = scope["method"]
+        endpoint = self._templates.resolve(scope["path"])
+        requests, in_progress, latency = self._children(method, endpoint)
+        requests.inc()
+        in_progress.inc()
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            # Error no controlado: se registra como 500 y se relanza para FastAPI
+            status_code = 500
+            self._exception_counter(method, endpoint, type(e).__name__).inc()
+            raise
+        else:
+            # Si el código de estado es un 5xx, también lo registramos en excepciones
+            if status_code >= 500:
+                self._exception_counter(method, endpoint, "HTTPException").inc()
+        finally:
+            latency.observe(perf_counter() - start)
+            self._response_counter(method, endpoint, status_code).inc()
+            in_progress.dec()
+
+
+def metrics_registry():
+    """Default registry, or one that aggregates every worker in multiprocess mode."""
+    if not settings.prometheus_multiproc_dir:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+async def metrics_endpoint(request: Request):
+    """Exposes the Prometheus metrics of this process or of all workers."""
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
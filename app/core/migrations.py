@@ -0,0 +1,229 @@
+"""Migración de las transcripciones embebidas en `users` a la colección `transcriptions`.
+
+La CLI recalcula los agregados de analíticas y el índice de búsqueda del usuario
+tras copiar sus transcripciones. Se puede ejecutar con el servicio en línea y reanudar en cualquier momento:
+
+    python -m app.core.migrations
+
+Después completa lo que les falte a las transcripciones escritas antes de estos
+campos: el índice de búsqueda (`search`, que también se reconstruye si se indexó
+con una versión anterior del análisis) y los campos de tiempo normalizados
+(`timestamp`, `hour`, `weekday`).
+
+Cada usuario se procesa copiando sus transcripciones con upserts (idempotentes)
+y retirando del arreglo embebido solo los `_id` copiados, así que un `$push`
+concurrente queda en el arreglo y se migra en la siguiente pasada. Los usuarios
+ya migrados tienen el arreglo vacío y no vuelven a aparecer en la consulta. Si el
+`_id` de una transcripción embebida ya pertenece a otro usuario, se copia con un
+`_id` derivado del usuario; un error con un usuario se registra y la pasada sigue.
+
+El servicio no espera a esta migración: las rutas de lectura migran al usuario que
+todavía tenga transcripciones embebidas (`migrate_pending`) antes de responder,
+incluidas las que el pipeline externo agrega con `$push` al arreglo embebido.
+Esa migración no recalcula la cuenta: solo las transcripciones que el upsert
+insertó pasan por la ruta incremental (`apply_transcription_changes`), como un
+alta normal, así que su costo depende de las notas nuevas y no del total.
+
+Para recalcular los agregados y las estadísticas de búsqueda de algunos usuarios
+(por ejemplo, tras perder un lote con WRITE_BEHIND_MODE=async):
+
+    python -m app.core.migrations rebuild-derived <user_id> [<user_id> ...]
+"""
+import asyncio
+import hashlib
+import sys
+
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.core.database import create_indexes, transcriptions_collection, users_collection
+from app.core.rollups import rebuild_rollups
+from app.core.search import ANALYZER_VERSION, rebuild_search_index, search_document
+from app.core.time_fields import time_fields
+from app.core.versioning import VERSION_BUMP
+from app.core.write_behind import apply_transcription_changes
+
+PENDING_FILTER = {"transcriptions.0": {"$exists": True}}
+DUPLICATE_KEY = 11000
+
+# Migraciones en curso por usuario, compartidas por las lecturas simultáneas
+_in_flight = {}
+
+
+def _legacy_id(user_id, transcription):
+    """Deterministic id for legacy transcriptions stored without `_id`, so reruns don't duplicate them."""
+    key = "|".join([user_id, transcription.get("date", ""), transcription.get("time", ""), transcription.get("text", "")])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+
+def _scoped_id(user_id, transcription_id):
+    """Deterministic id for an embedded transcription whose `_id` already belongs to another user."""
+    key = f"{user_id}|{transcription_id}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+
+def _copy(user_id, doc):
+    return ReplaceOne({"_id": doc["_id"], "user_id": user_id}, doc, upsert=True)
+
+
+async def _copy_transcriptions(user_id, docs: list) -> list:
+    """Upserts the docs into the collection. Returns the ones that were not there yet."""
+    try:
+        result = await transcriptions_collection.bulk_write([_copy(user_id, doc) for doc in docs], ordered=False)
+        return [docs[index] for index in result.upserted_ids]
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY for error in errors):
+            raise
+        inserted = [docs[upsert["index"]] for upsert in e.details.get("upserted", [])]
+    # El `_id` existe con otro `user_id` (ids repetidos entre usuarios): se copia con uno propio del usuario
+    rekeyed = [dict(docs[error["index"]], _id=_scoped_id(user_id, docs[error["index"]]["_id"])) for error in errors]
+    result = await transcriptions_collection.bulk_write([_copy(user_id, doc) for doc in rekeyed], ordered=False)
+    return inserted + [rekeyed[index] for index in result.upserted_ids]
+
+
+async def migrate_user(user_id, transcriptions, rebuild: bool = True):
+    """Copies one user's embedded transcriptions and pulls them from the user document.
+
+    With `rebuild` the user's rollups and search index are recomputed from the
+    collection (CLI); without it only the newly inserted transcriptions are added
+    to them incrementally (on-read migration).
+    """
+    docs = []
+    migrated_ids = []
+    for transcription in transcriptions:
+        doc = dict(transcription)
+        doc.setdefault("_id", _legacy_id(user_id, transcription))
+        doc["user_id"] = user_id
+        doc["search"] = search_document(doc.get("text", ""))
+        doc.update(time_fields(doc))
+        docs.append(doc)
+        migrated_ids.append(transcription.get("_id"))
+
+    inserted = []
+    if docs:
+        inserted = await _copy_transcriptions(user_id, docs)
+    if docs and rebuild:
+        # Recalcular desde la colección mantiene la migración idempotente
+        await rebuild_rollups(user_id)
+        await rebuild_search_index(user_id)
+
+    # Las transcripciones sin `_id` se retiran por igualdad exacta del documento
+    pulls = [{"_id": {"$in": [i for i in migrated_ids if i is not None]}}]
+    pulls += [t for t in transcriptions if t.get("_id") is None]
+    await users_collection.update_one(
+        {"_id": user_id},
+        {"$pull": {"transcriptions": {"$or": pulls}}, **VERSION_BUMP}
+    )
+    if not rebuild:
+        # Las ya copiadas en una pasada anterior no se vuelven a sumar
+        await apply_transcription_changes(user_id, inserted)
+    return len(docs)
+
+
+async def _migrate_pending(user_id):
+    # Importación diferida: deletion_jobs depende de versioning, que importa este módulo al leer
+    from app.core.deletion_jobs import deletion_in_progress
+
+    # El borrado en curso eliminaría lo que se copie ahora
+    if await deletion_in_progress(user_id):
+        return 0
+    user = await users_collection.find_one({"_id": user_id, **PENDING_FILTER}, {"transcriptions": 1})
+    if not user:
+        return 0
+    return await migrate_user(user_id, user["transcriptions"], rebuild=False)
+
+
+async def migrate_pending(user_id) -> int:
+    """Migrates the user's embedded transcriptions, if any are left. Returns the number copied.
+
+    Read routes call it when the user document still has embedded
+    transcriptions; concurrent calls for the same user share one migration.
+    """
+    task = _in_flight.get(user_id)
+    if task is None:
+        task = asyncio.ensure_future(_migrate_pending(user_id))
+        _in_flight[user_id] = task
+        task.add_done_callback(lambda _: _in_flight.pop(user_id, None))
+    # shield: si la petición se cancela, la migración del usuario termina igual
+    return await asyncio.shield(task)
+
+
+async def migrate_embedded_transcriptions(batch_size: int = 100):
+    """Migrates every user that still has embedded transcriptions. Returns the number copied."""
+    await create_indexes()
+
+    total = 0
+    last_id = None
+    while True:
+        # Paginado por `_id`: un usuario que falla no se vuelve a leer en esta pasada
+        query = PENDING_FILTER if last_id is None else {**PENDING_FILTER, "_id": {"$gt": last_id}}
+        cursor = users_collection.find(query, {"transcriptions": 1}).sort("_id", 1).limit(batch_size)
+        users = await cursor.to_list(length=batch_size)
+        if not users:
+            break
+        for user in users:
+            last_id = user["_id"]
+            try:
+                migrated = await migrate_user(user["_id"], user.get("transcriptions", []))
+            except PyMongoError as e:
+                print(f"Error al migrar al usuario {user['_id']}: {e}")
+                continue
+            total += migrated
+            print(f"Usuario {user['_id']}: {migrated} transcripciones migradas")
+    return total
+
+
+async def backfill_search_index():
+    """Rebuilds the search index of every user with transcriptions not indexed with the current analyzer.
+
+    Returns the number of users rebuilt.
+    """
+    # `$ne` también selecciona las transcripciones sin `search`
+    user_ids = await transcriptions_collection.distinct("user_id", {"search.v": {"$ne": ANALYZER_VERSION}})
+    for user_id in user_ids:
+        await rebuild_search_index(user_id)
+        print(f"Usuario {user_id}: índice de búsqueda reconstruido")
+    return len(user_ids)
+
+
+async def backfill_time_fields(batch_size: int = 1000):
+    """Adds timestamp/hour/weekday to transcriptions written before they existed. Returns the count."""
+    total = 0
+    while True:
+        cursor = transcriptions_collection.find({"weekday": {"$exists": False}}, {"date": 1, "time": 1}).limit(batch_size)
+        batch = await cursor.to_list(length=batch_size)
+        if not batch:
+            break
+        # Los valores mal formados quedan en None, así que cada documento sale del filtro tras una pasada
+        await transcriptions_collection.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": time_fields(doc)}) for doc in batch], ordered=False
+        )
+        total += len(batch)
+        print(f"{total} transcripciones con campos de tiempo")
+    return total
+
+
+async def rebuild_derived(user_ids: list):
+    """Recomputes the rollups and search statistics of the given users from their transcriptions."""
+    for user_id in user_ids:
+        await rebuild_rollups(user_id)
+        await rebuild_search_index(user_id)
+        await users_collection.update_one({"_id": user_id}, VERSION_BUMP)
+        print(f"Usuario {user_id}: agregados e índice de búsqueda recalculados")
+
+
+async def main():
+    if sys.argv[1:2] == ["rebuild-derived"]:
+        await rebuild_derived(sys.argv[2:])
+        return
+    count = await migrate_embedded_transcriptions()
+    print(f"Migración completada: {count} transcripciones")
+    users = await backfill_search_index()
+    print(f"Índice de búsqueda completado: {users} usuarios")
+    count = await backfill_time_fields()
+    print(f"Campos de tiempo completados: {count} transcripciones")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+import base64
+import json
+from typing import Literal, Optional
+
+from fastapi import HTTPException, Query
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Orden estable de los listados: (date, time, _id)
+KEYSET_FIELDS = ("date", "time", "_id")
+
+
+def _encode(value) -> str:
+    raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_cursor(doc: dict) -> str:
+    """Builds an opaque cursor from the keyset fields of the last returned document."""
+    return _encode([doc.get(field) for field in KEYSET_FIELDS])
+
+
+def decode_cursor(cursor: str) -> list:
+    """Returns the keyset values stored in a cursor, or raises 400 if it was tampered with."""
+    key = _decode(cursor)
+    if not isinstance(key, list) or len(key) != len(KEYSET_FIELDS):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Los valores van tal cual a `$match`: un objeto como {"$ne": null} sería un operador
+    if not all(value is None or isinstance(value, str) for value in key):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+class PageParams:
+    """Query parameters shared by every listing route: `limit`, `sort` and `cursor`."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        sort: Literal["asc", "desc"] = Query("asc"),
+        cursor: Optional[str] = None,
+    ):
+        self.limit = limit
+        self.direction = 1 if sort == "asc" else -1
+        self.after = decode_cursor(cursor) if cursor else None
+
+    @property
+    def sort(self):
+        return [(field, self.direction) for field in KEYSET_FIELDS]
+
+    def keyset_query(self) -> dict:
+        """Matches documents strictly after the cursor in the requested order."""
+        if self.after is None:
+            return {}
+        op = "$gt" if self.direction == 1 else "$lt"
+        date, time, _id = self.after
+        return {"$or": [
+            {"date": {op: date}},
+            {"date": date, "time": {op: time}},
+            {"date": date, "time": time, "_id": {op: _id}},
+        ]}
+
+    def page(self, docs: list) -> dict:
+        """Trims the extra look-ahead document and builds the response envelope."""
+        next_cursor = None
+        if len(docs) > self.limit:
+            docs = docs[:self.limit]
+            next_cursor = encode_cursor(docs[-1])
+        return {"transcriptions": docs, "next_cursor": next_cursor}
+
+
+class OffsetPageParams:
+    """`limit` and `cursor` for ranked listings (search), where the cursor holds an offset."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+    ):
+        self.limit = limit
+        self.offset = 0
+        if cursor:
+            value = _decode(cursor)
+            if not isinstance(value, dict) or not isinstance(value.get("offset"), int) or value["offset"] < 0:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            self.offset = value["offset"]
+
+    def page(self, docs: list, has_more: bool) -> dict:
+        next_cursor = _encode({"offset": self.offset + self.limit}) if has_more else None
+        return {"transcriptions": docs, "next_cursor": next_cursor}
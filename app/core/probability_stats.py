@@ -0,0 +1,134 @@
+"""Estadísticas vectorizadas sobre `emotionProbabilities` y `sentimentProbabilities`.
+
+Los diccionarios de probabilidades de un usuario se cargan en una matriz densa
+(filas = transcripciones en orden cronológico, columnas = etiquetas ordenadas
+alfabéticamente, de modo que el mapeo etiqueta→columna es estable) y todas las
+estadísticas se calculan con NumPy en una sola pasada sobre la matriz.
+
+La ruta lee el cursor en lotes de PROBABILITY_BATCH_SIZE documentos y convierte
+cada lote en una matriz al recibirlo (`stream_probability_stats`): nunca tiene en
+memoria la lista completa de diccionarios, y el armado de las matrices avanza
+mientras llegan los lotes siguientes.
+"""
+import numpy as np
+
+HISTOGRAM_BINS = 10
+MAX_SERIES_POINTS = 200
+PROBABILITY_BATCH_SIZE = 5000
+FIELDS = ("emotionProbabilities", "sentimentProbabilities")
+
+
+def probability_matrix(transcriptions: list, field: str):
+    """Returns (labels, matrix) for one probability field; missing labels count as 0."""
+    dicts = [t.get(field) or {} for t in transcriptions]
+    labels = sorted(set().union(*dicts))
+    if not labels:
+        return labels, np.zeros((len(dicts), 0), dtype=np.float64)
+
+    # Una columna por etiqueta; `fromiter` evita construir listas intermedias
+    columns = [np.fromiter((d.get(label, 0.0) for d in dicts), np.float64, len(dicts)) for label in labels]
+    return labels, np.column_stack(columns)
+
+
+class ProbabilityColumns:
+    """Builds the matrices of both probability fields batch by batch, keeping only the numbers."""
+
+    def __init__(self):
+        self._batches = {field: [] for field in FIELDS}
+        self.dates, self.times = [], []
+
+    def add(self, transcriptions: list):
+        for field in FIELDS:
+            self._batches[field].append(probability_matrix(transcriptions, field))
+        self.dates += [t.get("date") for t in transcriptions]
+        self.times += [t.get("time") for t in transcriptions]
+
+    def matrix(self, field: str):
+        """(labels, matrix) over every batch; a label missing from a batch is 0 in its rows."""
+        batches = self._batches[field]
+        labels = sorted(set().union(*(batch_labels for batch_labels, _ in batches)))
+        column = {label: i for i, label in enumerate(labels)}
+        matrix = np.zeros((len(self.dates), len(labels)), dtype=np.float64)
+        row = 0
+        for batch_labels, batch in batches:
+            matrix[row:row + len(batch), [column[label] for label in batch_labels]] = batch
+            row += len(batch)
+        return labels, matrix
+
+
+def rolling_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Rolling mean over the last `window` rows, computed with a cumulative sum."""
+    window = min(window, len(matrix))
+    cumsum = np.cumsum(np.vstack([np.zeros((1, matrix.shape[1])), matrix]), axis=0)
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def _histogram(values: np.ndarray) -> dict:
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS, range=(0.0, 1.0))
+    return {"edges": edges.round(4).tolist(), "counts": counts.tolist()}
+
+
+def field_stats(columns: ProbabilityColumns, field: str, window: int) -> dict:
+    """Mean/variance per label, rolling averages and entropy/confidence distributions."""
+    labels, matrix = columns.matrix(field)
+    if not labels or not len(matrix):
+        return {"labels": labels, "count": len(matrix)}
+
+    # Normalizar filas para la entropía; las filas vacías quedan en cero
+    totals = matrix.sum(axis=1, keepdims=True)
+    normalized = np.divide(matrix, totals, out=np.zeros_like(matrix), where=totals > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = -np.where(normalized > 0, normalized * np.log(normalized), 0.0).sum(axis=1)
+    if len(labels) > 1:
+        entropy /= np.log(len(labels))
+    confidence = matrix.max(axis=1)
+
+    rolling = rolling_mean(matrix, window)
+    # Se submuestrea la serie para que la respuesta no crezca con el historial
+    points = np.unique(np.linspace(0, len(rolling) - 1, num=min(MAX_SERIES_POINTS, len(rolling))).astype(int))
+    offset = min(window, len(matrix)) - 1
+
+    return {
+        "labels": labels,
+        "count": len(matrix),
+        "mean": dict(zip(labels, matrix.mean(axis=0).tolist())),
+        "variance": dict(zip(labels, matrix.var(axis=0).tolist())),
+        "rolling": {
+            "window": min(window, len(matrix)),
+            "points": [
+                {
+                    "date": columns.dates[i + offset],
+                    "time": columns.times[i + offset],
+                    "mean": dict(zip(labels, rolling[i].tolist())),
+                }
+                for i in points.tolist()
+            ],
+        },
+        "entropy": {"mean": float(entropy.mean()), "histogram": _histogram(entropy)},
+        "confidence": {"mean": float(confidence.mean()), "histogram": _histogram(confidence)},
+    }
+
+
+def _stats(columns: ProbabilityColumns, window: int) -> dict:
+    return {field: field_stats(columns, field, window) for field in FIELDS}
+
+
+def probability_stats(transcriptions: list, window: int = 7) -> dict:
+    """Stats for both probability fields of chronologically ordered transcriptions."""
+    columns = ProbabilityColumns()
+    columns.add(transcriptions)
+    return _stats(columns, window)
+
+
+async def stream_probability_stats(cursor, window: int = 7) -> dict:
+    """Same as `probability_stats`, reading a chronological cursor in batches of PROBABILITY_BATCH_SIZE."""
+    columns = ProbabilityColumns()
+    batch = []
+    async for transcription in cursor:
+        batch.append(transcription)
+        if len(batch) >= PROBABILITY_BATCH_SIZE:
+            columns.add(batch)
+            batch = []
+    if batch:
+        columns.add(batch)
+    return _stats(columns, window)
@@ -0,0 +1,120 @@
+"""Traduce los filtros de transcripciones a un pipeline de agregación de MongoDB.
+
+Todas las rutas de listado (`/filter` y los alias `/by-*`) compilan sus parámetros
+con `TranscriptionQuery`, de modo que el filtrado y la proyección ocurren en el
+servidor y el servicio solo decodifica los documentos de la página pedida.
+"""
+from datetime import date as Date
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from app.core.pagination import KEYSET_FIELDS, PageParams
+from app.core.time_fields import date_range_bounds
+
+# Campos internos que no se devuelven: el dueño, el índice de búsqueda y los campos de tiempo derivados
+TRANSCRIPTION_PROJECTION = {"user_id": 0, "search": 0, "timestamp": 0, "hour": 0, "weekday": 0}
+
+TRANSCRIPTION_FIELDS = {
+    "date", "time", "text", "emotion", "emotionProbabilities",
+    "sentiment", "sentimentProbabilities", "topic",
+}
+
+
+def date_prefix_query(date: str) -> dict:
+    """Prefix match on `date` as a string range (e.g. "2024-01" -> ["2024-01", "2024-02")), an index range scan."""
+    return {"date": {"$gte": date, "$lt": date[:-1] + chr(ord(date[-1]) + 1)}}
+
+
+def hour_range_query(start_hour: int, end_hour: int) -> dict:
+    """Matches the indexed `hour` within [start_hour, end_hour]; a range like 22-3 wraps past midnight."""
+    if start_hour <= end_hour:
+        return {"hour": {"$gte": start_hour, "$lte": end_hour}}
+    return {"$or": [{"hour": {"$gte": start_hour}}, {"hour": {"$lte": end_hour}}]}
+
+
+def parse_fields(fields: Optional[str] = Query(None, description="Comma-separated list of fields to return")):
+    """Parses the `fields` query parameter into a set of transcription fields."""
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - TRANSCRIPTION_FIELDS - {"_id"}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+class TranscriptionQuery:
+    """Filter predicates for a user's transcriptions, compiled into one `$match` stage."""
+
+    def __init__(
+        self,
+        emotion: Optional[str] = None,
+        sentiment: Optional[str] = None,
+        topic: Optional[str] = None,
+        date: Optional[str] = None,
+        start_hour: Optional[int] = None,
+        end_hour: Optional[int] = None,
+        fields: Optional[set] = None,
+        start_date: Optional[Date] = None,
+        end_date: Optional[Date] = None,
+        weekday: Optional[int] = None,
+    ):
+        self.emotion = emotion
+        self.sentiment = sentiment
+        self.topic = topic
+        self.date = date
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.fields = fields
+        self.start_date = start_date
+        self.end_date = end_date
+        self.weekday = weekday
+
+    def match(self, user_id: str) -> dict:
+        """Builds the user-scoped `$match` predicate."""
+        query = {"user_id": user_id}
+        if self.emotion:
+            query["emotion"] = self.emotion
+        if self.sentiment:
+            query["sentiment"] = self.sentiment
+        if self.topic:
+            query["topic"] = self.topic
+        if self.date:
+            query.update(date_prefix_query(self.date))
+        if self.start_date or self.end_date:
+            query["timestamp"] = date_range_bounds(self.start_date, self.end_date)
+        if self.weekday is not None:
+            query["weekday"] = self.weekday
+        if self.start_hour is not None and self.end_hour is not None:
+            query.update(hour_range_query(self.start_hour, self.end_hour))
+        return query
+
+    def projection(self) -> dict:
+        """Projects only the requested fields (plus the keyset fields needed by the cursor)."""
+        if not self.fields:
+            return dict(TRANSCRIPTION_PROJECTION)
+        return {field: 1 for field in self.fields | set(KEYSET_FIELDS)}
+
+    def scan_pipeline(self, user_id: str) -> list:
+        """Pipeline over every match in chronological order, without pagination."""
+        return [
+            {"$match": self.match(user_id)},
+            {"$sort": {field: 1 for field in KEYSET_FIELDS}},
+            {"$project": self.projection()},
+        ]
+
+    def pipeline(self, user_id: str, page: PageParams) -> list:
+        """Compiles the filters and the page into a single aggregation pipeline."""
+        match = self.match(user_id)
+        keyset = page.keyset_query()
+        if keyset:
+            match = {"$and": [match, keyset]}
+
+        # Se pide un documento extra para saber si hay una página siguiente
+        return [
+            {"$match": match},
+            {"$sort": dict(page.sort)},
+            {"$limit": page.limit + 1},
+            {"$project": self.projection()},
+        ]
@@ -0,0 +1,75 @@
+"""Serialización JSON con orjson para las respuestas del servicio.
+
+`FastJSONResponse` es la clase de respuesta por defecto de la app: convierte a
+bytes en C (incluyendo `datetime`, `ObjectId` y arreglos de NumPy) en lugar de
+`json.dumps`. FastAPI igual pasa el valor retornado por `jsonable_encoder`;
+las rutas que ya devuelven dicts planos de Mongo se decoran con `@raw_json`
+para saltarse ese recorrido en Python.
+"""
+import functools
+from decimal import Decimal
+from time import perf_counter
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse, Response
+
+from app.core.instrumentation import current_span
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def orjson_default(obj):
+    """Types orjson does not know natively (BSON types stored by Mongo)."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=orjson_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson."""
+
+    def render(self, content) -> bytes:
+        span = current_span()
+        if span is None:
+            return dumps(content)
+        start = perf_counter()
+        body = dumps(content)
+        span.add("serialization", perf_counter() - start)
+        return body
+
+
+class ResponseHeaders(dict):
+    """Dependency result whose items `raw_json` adds to the response headers."""
+
+
+def raw_json(endpoint):
+    """Returns the endpoint's result as a `FastJSONResponse`, skipping `jsonable_encoder`.
+
+    Only for routes without `response_model` whose results are already plain
+    dicts/lists (Mongo documents); `Response` objects pass through untouched.
+    Arguments that are `ResponseHeaders` (e.g. ETag validators) become headers.
+    """
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        headers = {}
+        for value in kwargs.values():
+            if isinstance(value, ResponseHeaders):
+                headers.update(value)
+        return FastJSONResponse(result, headers=headers or None)
+
+    return wrapper
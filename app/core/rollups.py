@@ -0,0 +1,154 @@
+"""Agregados incrementales de transcripciones por usuario (día, semana y mes).
+
+Cada documento de `transcription_rollups` guarda, para un usuario y un bucket,
+el número de transcripciones, los conteos por emoción, sentimiento, tema y hora,
+y la suma de `emotionProbabilities`/`sentimentProbabilities`. Las escrituras de
+transcripciones aplican `$inc` positivos o negativos, así que leer las analíticas
+cuesta O(buckets) y no O(transcripciones). La media se calcula al leer.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import InsertOne, UpdateOne
+
+from app.core.database import rollups_collection, rollups_read_collection, transcriptions_collection
+from app.core.time_fields import parse_time
+
+GRANULARITIES = ("day", "week", "month")
+
+COUNTER_FIELDS = {"emotion": "emotions", "sentiment": "sentiments", "topic": "topics"}
+SUM_FIELDS = ("emotionProbabilities", "sentimentProbabilities")
+
+
+def _key(label) -> str:
+    """Makes a label safe to use as a MongoDB field name."""
+    return str(label).replace(".", "_").lstrip("$") or "_"
+
+
+def bucket_keys(transcription: dict):
+    """Returns {granularity: bucket} for a transcription, or None if its date is malformed."""
+    try:
+        day = datetime.fromisoformat(transcription["date"]).date()
+    except (KeyError, TypeError, ValueError):
+        return None
+    year, week, _ = day.isocalendar()
+    return {
+        "day": day.isoformat(),
+        "week": f"{year}-W{week:02d}",
+        "month": day.strftime("%Y-%m"),
+    }
+
+
+def rollup_increments(transcription: dict, sign: int = 1) -> dict:
+    """Builds the `$inc` document that adds (sign=1) or removes (sign=-1) one transcription."""
+    inc = {"count": sign}
+    for field, counter in COUNTER_FIELDS.items():
+        if transcription.get(field):
+            inc[f"{counter}.{_key(transcription[field])}"] = sign
+    # La misma lectura de `time` que el campo indexado `hour`, para que analíticas y filtros coincidan
+    clock = parse_time(transcription.get("time"))
+    if clock is not None:
+        inc[f"hours.{clock.hour}"] = sign
+    for field in SUM_FIELDS:
+        for label, probability in (transcription.get(field) or {}).items():
+            # Dos etiquetas pueden dar la misma clave ("a.b" y "a_b"): se suman
+            path = f"{field}.{_key(label)}"
+            inc[path] = inc.get(path, 0) + sign * probability
+    return inc
+
+
+def rollup_updates(user_id: str, transcription: dict, sign: int = 1) -> list:
+    """(filter, `$inc`) pairs for every granularity bucket the transcription falls into."""
+    buckets = bucket_keys(transcription)
+    if buckets is None:
+        return []
+    inc = rollup_increments(transcription, sign)
+    return [
+        ({"user_id": user_id, "granularity": granularity, "bucket": bucket}, inc)
+        for granularity, bucket in buckets.items()
+    ]
+
+
+def rollup_operations(user_id: str, transcription: dict, sign: int = 1) -> list:
+    """Upserts for every granularity bucket the transcription falls into."""
+    return [
+        UpdateOne(key, {"$inc": inc}, upsert=True)
+        for key, inc in rollup_updates(user_id, transcription, sign)
+    ]
+
+
+async def apply_rollups(user_id: str, transcriptions: list, sign: int = 1):
+    """Adds (or removes) transcriptions from the user's rollups in one bulk write."""
+    operations = []
+    for transcription in transcriptions:
+        operations += rollup_operations(user_id, transcription, sign)
+    if operations:
+        await rollups_collection.bulk_write(operations, ordered=False)
+
+
+async def delete_rollups(user_id: str):
+    """Drops every rollup of the user."""
+    await rollups_collection.delete_many({"user_id": user_id})
+
+
+async def rebuild_rollups(user_id: str):
+    """Recomputes the user's rollups from the transcriptions collection (idempotent)."""
+    totals = defaultdict(lambda: defaultdict(float))
+    cursor = transcriptions_collection.find({"user_id": user_id}, {"text": 0})
+    async for transcription in cursor:
+        buckets = bucket_keys(transcription)
+        if buckets is None:
+            continue
+        inc = rollup_increments(transcription)
+        for bucket_key in buckets.items():
+            for path, value in inc.items():
+                totals[bucket_key][path] += value
+
+    operations = []
+    for (granularity, bucket), paths in totals.items():
+        doc = {"user_id": user_id, "granularity": granularity, "bucket": bucket}
+        for path, value in paths.items():
+            parent, _, child = path.partition(".")
+            if child:
+                doc.setdefault(parent, {})[child] = value
+            else:
+                doc[parent] = int(value)
+        for counter in list(COUNTER_FIELDS.values()) + ["hours"]:
+            if counter in doc:
+                doc[counter] = {k: int(v) for k, v in doc[counter].items()}
+        operations.append(InsertOne(doc))
+
+    await delete_rollups(user_id)
+    if operations:
+        await rollups_collection.bulk_write(operations, ordered=False)
+
+
+def _mean(sums: dict, count: int) -> dict:
+    return {label: total / count for label, total in (sums or {}).items()}
+
+
+async def get_rollups(user_id: str, granularity: str, start=None, end=None, session=None) -> list:
+    """Reads the user's non-empty buckets, with probability sums turned into means."""
+    query = {"user_id": user_id, "granularity": granularity, "count": {"$gt": 0}}
+    if start or end:
+        query["bucket"] = {}
+        if start:
+            query["bucket"]["$gte"] = start
+        if end:
+            query["bucket"]["$lte"] = end
+
+    buckets = []
+    cursor = rollups_read_collection.find(query, {"_id": 0, "user_id": 0, "granularity": 0}, session=session).sort("bucket", 1)
+    async for doc in cursor:
+        count = doc["count"]
+        buckets.append({
+            "bucket": doc["bucket"],
+            "count": count,
+            "emotions": {k: v for k, v in doc.get("emotions", {}).items() if v > 0},
+            "sentiments": {k: v for k, v in doc.get("sentiments", {}).items() if v > 0},
+            "topics": {k: v for k, v in doc.get("topics", {}).items() if v > 0},
+            "hours": {k: v for k, v in doc.get("hours", {}).items() if v > 0},
+            "emotionProbabilities": _mean(doc.get("emotionProbabilities"), count),
+            "sentimentProbabilities": _mean(doc.get("sentimentProbabilities"), count),
+        })
+    return buckets
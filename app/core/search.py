@@ -0,0 +1,233 @@
+"""Búsqueda de texto completo sobre las transcripciones, con ranking BM25.
+
+El índice invertido se mantiene en escritura, igual que los agregados:
+
+- cada transcripción guarda `search = {"terms", "tf", "len", "v"}`: sus raíces
+  (stems) únicas, la frecuencia de cada una, el número de términos y la versión
+  del análisis. El índice multikey (user_id, search.terms) da los candidatos
+  de una consulta;
+- `transcription_terms` guarda por usuario la frecuencia de documentos de cada
+  raíz (`df`) y un documento de totales (`term=""`) con el número de
+  transcripciones y la suma de longitudes, con `$inc` en cada alta o baja.
+
+Una consulta lee esas estadísticas (un documento por término) y calcula el
+puntaje BM25 dentro de MongoDB con un pipeline de agregación, así que solo la
+página pedida viaja al servicio.
+
+El texto se pasa a minúsculas, se quitan las palabras vacías y cada palabra se
+reduce con el stemmer Snowball para español (usa PyStemmer si está instalado),
+con la raíz sin tildes ni diéresis. El stemmer necesita las tildes para
+reconocer las terminaciones (`sentía`, `sentí` y `sentir` dan `sent`), pero la
+misma palabra escrita sin tildes da otra raíz (`sentia` da `senti`). Por eso cada
+palabra produce las dos formas: la raíz de la palabra con tildes y la de la
+palabra sin ellas (una sola si coinciden). Documentos y consultas se analizan
+igual, así que "sentia" encuentra "sentía" y "sentir" también. La longitud del
+documento cuenta palabras, no formas.
+
+Cambiar el análisis cambia las raíces guardadas: se sube ANALYZER_VERSION y
+`python -m app.core.migrations` reindexa las transcripciones de versiones
+anteriores.
+"""
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from math import log
+
+from pymongo import InsertOne, UpdateOne
+
+from app.core.database import (
+    search_terms_collection,
+    search_terms_read_collection,
+    transcriptions_collection,
+    transcriptions_read_collection,
+)
+
+# Parámetros estándar de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Documento de totales del usuario en `transcription_terms` (ninguna raíz es vacía)
+TOTALS_TERM = ""
+
+# Versión del análisis guardada en `search.v`; las transcripciones con otra se reindexan
+ANALYZER_VERSION = 3
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el
+ella ellas ellos en entre era eramos eran eres es esa esas ese eso esos esta estaba estado estais
+estamos estan estar estas este esto estos estoy fue fueron fui ha habia han has hasta hay he la las
+le les lo los me mi mis mucho muy nada ni no nos nosotros o os otra otro para pero poco por porque
+que quien se sea ser si sido sin sobre sois somos son soy su sus tambien te tengo ti tiene tienen
+todo todos tu tus un una uno unos vosotros y ya yo
+""".split())
+
+
+@lru_cache(maxsize=1)
+def _spanish_stemmer():
+    # Se carga con la primera transcripción o búsqueda, no al arrancar
+    import snowballstemmer
+
+    return snowballstemmer.stemmer("spanish")
+
+
+def fold(text: str) -> str:
+    """Lowercases and strips accents (á -> a, ü -> u, ñ -> n)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=100_000)
+def _stem(token: str) -> str:
+    return _spanish_stemmer().stemWord(token)
+
+
+def _forms(token: str) -> list:
+    """Folded stems of a word, with and without its accents (one if they agree)."""
+    folded = fold(token)
+    forms = [fold(_stem(token))]
+    if folded != token and _stem(folded) not in forms:
+        forms.append(_stem(folded))
+    return forms
+
+
+def _words(text: str) -> list:
+    # NFC: el stemmer reconoce "í" compuesta, no "i" + tilde combinante
+    tokens = TOKEN_RE.findall(unicodedata.normalize("NFC", (text or "").lower()))
+    return [_forms(token) for token in tokens if fold(token) not in STOPWORDS]
+
+
+def analyze(text: str) -> list:
+    """Splits text into stemmed, folded terms without stopwords."""
+    return [form for forms in _words(text) for form in forms]
+
+
+def search_document(text: str) -> dict:
+    """Builds the `search` field stored with a transcription."""
+    words = _words(text)
+    tf = Counter(form for forms in words for form in forms)
+    return {"terms": list(tf), "tf": dict(tf), "len": len(words), "v": ANALYZER_VERSION}
+
+
+def search_updates(user_id: str, transcription: dict, sign: int = 1) -> list:
+    """(filter, `$inc`) pairs that add (sign=1) or remove (sign=-1) one transcription from the stats."""
+    search = transcription.get("search")
+    if not search:
+        return []
+    updates = [({"user_id": user_id, "term": term}, {"df": sign}) for term in search["terms"]]
+    updates.append(({"user_id": user_id, "term": TOTALS_TERM}, {"docs": sign, "length": sign * search["len"]}))
+    return updates
+
+
+def search_operations(user_id: str, transcription: dict, sign: int = 1) -> list:
+    """`$inc` upserts that add (sign=1) or remove (sign=-1) one transcription from the stats."""
+    return [
+        UpdateOne(key, {"$inc": inc}, upsert=True)
+        for key, inc in search_updates(user_id, transcription, sign)
+    ]
+
+
+async def apply_search_stats(user_id: str, transcriptions: list, sign: int = 1):
+    """Adds (or removes) transcriptions from the user's term statistics in one bulk write."""
+    operations = []
+    for transcription in transcriptions:
+        operations += search_operations(user_id, transcription, sign)
+    if operations:
+        await search_terms_collection.bulk_write(operations, ordered=False)
+
+
+async def delete_search_stats(user_id: str):
+    """Drops every term statistic of the user."""
+    await search_terms_collection.delete_many({"user_id": user_id})
+
+
+async def rebuild_search_index(user_id: str):
+    """Recomputes the user's `search` fields and term statistics from the text (idempotent)."""
+    df = Counter()
+    docs = length = 0
+    updates = []
+    cursor = transcriptions_collection.find({"user_id": user_id}, {"text": 1})
+    async for transcription in cursor:
+        search = search_document(transcription.get("text", ""))
+        updates.append(UpdateOne({"_id": transcription["_id"]}, {"$set": {"search": search}}))
+        df.update(search["terms"])
+        docs += 1
+        length += search["len"]
+
+    if updates:
+        await transcriptions_collection.bulk_write(updates, ordered=False)
+    await delete_search_stats(user_id)
+    operations = [InsertOne({"user_id": user_id, "term": term, "df": count}) for term, count in df.items()]
+    operations.append(InsertOne({"user_id": user_id, "term": TOTALS_TERM, "docs": docs, "length": length}))
+    await search_terms_collection.bulk_write(operations, ordered=False)
+
+
+def bm25_expression(terms: list, df: dict, total_docs: int, avg_len: float) -> dict:
+    """Aggregation expression that computes a transcription's BM25 score in MongoDB.
+
+    The idf of each term comes from the user's statistics and is inlined as a
+    constant; `tf` and the document length are read from the `search` field.
+    """
+    avg_len = avg_len or 1.0
+    length = {"$ifNull": ["$search.len", 0]}
+    norm = {"$multiply": [BM25_K1, {"$add": [1 - BM25_B, {"$multiply": [BM25_B / avg_len, length]}]}]}
+    parts = []
+    for term in terms:
+        if not df.get(term):
+            continue
+        idf = log(1 + (total_docs - df[term] + 0.5) / (df[term] + 0.5))
+        tf = {"$ifNull": [f"$search.tf.{term}", 0]}
+        parts.append({"$divide": [{"$multiply": [idf * (BM25_K1 + 1), tf]}, {"$add": [tf, norm]}]})
+    return {"$add": parts}
+
+
+async def term_statistics(user_id: str, terms: list, session=None):
+    """Returns (df by term, number of transcriptions, average length) for the user."""
+    df, total_docs, avg_len = {}, 0, 0.0
+    cursor = search_terms_read_collection.find({"user_id": user_id, "term": {"$in": terms + [TOTALS_TERM]}}, session=session)
+    async for stat in cursor:
+        if stat["term"] == TOTALS_TERM:
+            total_docs = stat.get("docs", 0)
+            avg_len = stat.get("length", 0) / total_docs if total_docs else 0.0
+        else:
+            df[stat["term"]] = stat.get("df", 0)
+    return df, total_docs, avg_len
+
+
+async def search_transcriptions(user_id: str, text: str, query, page, session=None) -> dict:
+    """Ranks the user's transcriptions matching `query` by BM25 against `text` and returns one page."""
+    terms = list(dict.fromkeys(analyze(text)))
+    if not terms:
+        return page.page([], has_more=False)
+
+    df, total_docs, avg_len = await term_statistics(user_id, terms, session)
+    if not any(df.values()):
+        return page.page([], has_more=False)
+
+    # El ranking completo ocurre en el servidor; solo viajan los ids y puntajes de la página
+    match = {**query.match(user_id), "search.terms": {"$in": terms}}
+    ranked = await transcriptions_read_collection.aggregate([
+        {"$match": match},
+        {"$project": {"score": bm25_expression(terms, df, total_docs, avg_len)}},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$skip": page.offset},
+        {"$limit": page.limit + 1},
+    ], session=session).to_list(length=page.limit + 1)
+    has_more = len(ranked) > page.limit
+    scores = {doc["_id"]: doc["score"] for doc in ranked[:page.limit]}
+    page_ids = list(scores)
+    if not page_ids:
+        return page.page([], has_more=False)
+
+    cursor = transcriptions_read_collection.find(
+        {"_id": {"$in": page_ids}, "user_id": user_id}, query.projection(), session=session
+    )
+    docs = {doc["_id"]: doc async for doc in cursor}
+    results = []
+    for _id in page_ids:
+        if _id in docs:
+            docs[_id]["score"] = round(scores[_id], 4)
+            results.append(docs[_id])
+    return page.page(results, has_more=has_more)
@@ -0,0 +1,86 @@
+"""Configuración del servicio, leída una sola vez del entorno (y del `.env`) al importar.
+
+Los módulos toman sus valores de `settings` en lugar de llamar a `os.getenv`, así
+que el `.env` se carga una vez y el orden de importación no cambia la
+configuración. Solo se leen variables: crear clientes, abrir conexiones o
+resolver nombres queda para el lifespan (ver app/main.py).
+"""
+import os
+
+from dotenv import load_dotenv
+
+
+def _bool(env, name: str, default: str = "false") -> bool:
+    return env.get(name, default).lower() == "true"
+
+
+class Settings:
+    """Every environment variable the service reads, parsed once."""
+
+    def __init__(self, env=os.environ):
+        self.environment = env.get("ENVIRONMENT")
+        # Arranque diferido: las resoluciones externas y los índices van en segundo plano
+        self.lazy_startup = _bool(env, "LAZY_STARTUP")
+
+        self.mongo_uri = env.get("MONGO_URI")
+        self.mongo_db_name = env.get("MONGO_DB_NAME", "myMindDB-Users")
+        self.mongo_max_pool_size = int(env.get("MONGO_MAX_POOL_SIZE", "50"))
+        self.mongo_min_pool_size = int(env.get("MONGO_MIN_POOL_SIZE", "5"))
+        self.mongo_max_idle_time_ms = int(env.get("MONGO_MAX_IDLE_TIME_MS", "300000"))
+        self.mongo_wait_queue_timeout_ms = int(env.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+        self.mongo_connect_timeout_ms = int(env.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+        self.mongo_socket_timeout_ms = int(env.get("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+        self.mongo_server_selection_timeout_ms = int(env.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+        self.mongo_compressors = env.get("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+        self.mongo_read_preference = env.get("MONGO_READ_PREFERENCE", "primary")
+        self.mongo_warmup_connections = int(env.get("MONGO_WARMUP_CONNECTIONS", str(self.mongo_min_pool_size)))
+
+        self.allowlist_refresh_seconds = float(env.get("ALLOWLIST_REFRESH_SECONDS", "60"))
+        self.apisix_prod = env.get("APISIX_PROD")
+        self.apisix_sources = env.get("APISIX_SOURCES", "apisix")
+        self.prometheus_sources = env.get("PROMETHEUS_SOURCES", "prometheus")
+        self.prometheus_multiproc_dir = env.get("PROMETHEUS_MULTIPROC_DIR")
+
+        self.auth_verify_signature = _bool(env, "AUTH_VERIFY_SIGNATURE")
+        self.auth0_domain = env.get("AUTH0_DOMAIN", "")
+        self.auth0_audience = env.get("AUTH0_AUDIENCE")
+        self.auth0_issuer = env.get("AUTH0_ISSUER", f"https://{self.auth0_domain}/" if self.auth0_domain else None)
+        self.auth_jwks_url = env.get(
+            "AUTH_JWKS_URL", f"https://{self.auth0_domain}/.well-known/jwks.json" if self.auth0_domain else None
+        )
+        self.auth_jwks_file = env.get("AUTH_JWKS_FILE")
+        self.auth_jwks_refresh_seconds = float(env.get("AUTH_JWKS_REFRESH_SECONDS", "3600"))
+        self.auth_jwks_min_refresh_seconds = float(env.get("AUTH_JWKS_MIN_REFRESH_SECONDS", "60"))
+        self.auth_token_cache_size = int(env.get("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+        # gunicorn.conf.py lo apaga con varios workers sin PROFILE_CACHE_REDIS_URL
+        self.profile_cache_enabled = _bool(env, "PROFILE_CACHE_ENABLED", "true")
+        self.profile_cache_ttl = float(env.get("PROFILE_CACHE_TTL", "30"))
+        self.profile_cache_max_entries = int(env.get("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+        self.profile_cache_redis_url = env.get("PROFILE_CACHE_REDIS_URL")
+
+        self.transcriptions_timezone = env.get("TRANSCRIPTIONS_TIMEZONE", "UTC")
+        self.ingest_chunk_size = int(env.get("INGEST_CHUNK_SIZE", "500"))
+
+        self.deletion_batch_size = int(env.get("DELETION_BATCH_SIZE", "500"))
+        self.deletion_batch_delay_seconds = float(env.get("DELETION_BATCH_DELAY_SECONDS", "0.05"))
+        self.deletion_poll_seconds = float(env.get("DELETION_POLL_SECONDS", "5"))
+        self.deletion_lease_seconds = float(env.get("DELETION_LEASE_SECONDS", "60"))
+        self.deletion_max_attempts = int(env.get("DELETION_MAX_ATTEMPTS", "5"))
+        self.deletion_sweep_delay_seconds = float(env.get("DELETION_SWEEP_DELAY_SECONDS", "30"))
+        self.deletion_job_retention_seconds = int(env.get("DELETION_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+        self.write_behind_mode = env.get("WRITE_BEHIND_MODE", "ack")
+        self.write_behind_window_ms = float(env.get("WRITE_BEHIND_WINDOW_MS", "5"))
+        self.write_behind_max_pending = int(env.get("WRITE_BEHIND_MAX_PENDING", "5000"))
+
+        self.instrumentation_enabled = _bool(env, "INSTRUMENTATION_ENABLED")
+        self.slow_request_ms = float(env.get("SLOW_REQUEST_MS", "500"))
+        self.slow_command_ms = float(env.get("SLOW_COMMAND_MS", "100"))
+        self.profiling_token = env.get("PROFILING_TOKEN")
+        self.profiling_interval = float(env.get("PROFILING_INTERVAL", "0.001"))
+
+
+# Único lugar donde se carga el .env; las variables ya definidas en el entorno tienen prioridad
+load_dotenv()
+settings = Settings()
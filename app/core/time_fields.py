@@ -0,0 +1,63 @@
+"""Campos de tiempo normalizados de cada transcripción, calculados al escribirla.
+
+`date` y `time` llegan como texto en la hora local del usuario. A partir de ellos
+se guardan:
+
+- `timestamp`: el instante en UTC (la zona de origen es TRANSCRIPTIONS_TIMEZONE);
+- `hour`: la hora local (0-23), o `None` si `time` está mal formado;
+- `weekday`: el día de la semana local, ISO (1 = lunes ... 7 = domingo).
+
+Las consultas por rango de fechas, horas y día de la semana usan estos campos
+indexados en lugar de interpretar las cadenas en cada documento.
+"""
+import re
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app.core.settings import settings
+
+TRANSCRIPTIONS_TIMEZONE = ZoneInfo(settings.transcriptions_timezone)
+
+TIME_FIELDS = ("timestamp", "hour", "weekday")
+
+TIME_RE = re.compile(r"^(\d{1,2}):(\d{2})(?::(\d{2}))?")
+
+
+def parse_time(value):
+    """Parses "HH:MM" or "HH:MM:SS" into a `time`, or returns None if it is malformed."""
+    match = TIME_RE.match(str(value or ""))
+    if not match:
+        return None
+    hour, minute, second = int(match[1]), int(match[2]), int(match[3] or 0)
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return time(hour, minute, second)
+
+
+def to_utc(local: datetime) -> datetime:
+    """Converts a naive local datetime to naive UTC, as pymongo stores it."""
+    return local.replace(tzinfo=TRANSCRIPTIONS_TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def time_fields(transcription: dict) -> dict:
+    """Derives {timestamp, hour, weekday} from `date` and `time` (None where they are malformed)."""
+    try:
+        day = datetime.fromisoformat(transcription["date"]).date()
+    except (KeyError, TypeError, ValueError):
+        return {"timestamp": None, "hour": None, "weekday": None}
+    clock = parse_time(transcription.get("time"))
+    return {
+        "timestamp": to_utc(datetime.combine(day, clock or time())),
+        "hour": clock.hour if clock else None,
+        "weekday": day.isoweekday(),
+    }
+
+
+def date_range_bounds(start_date=None, end_date=None) -> dict:
+    """`timestamp` bounds for local dates [start_date, end_date], both inclusive."""
+    bounds = {}
+    if start_date:
+        bounds["$gte"] = to_utc(datetime.combine(start_date, time()))
+    if end_date:
+        bounds["$lt"] = to_utc(datetime.combine(end_date + timedelta(days=1), time()))
+    return bounds
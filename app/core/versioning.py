@@ -0,0 +1,134 @@
+"""Versión de los datos de cada usuario, para GET condicionales (ETag / If-None-Match).
+
+Cada usuario guarda en su documento `data_version` (un contador) y
+`data_modified` (fecha de la última escritura). Todas las rutas que modifican el
+perfil o las transcripciones incrementan el contador *después* de escribir (o en
+la misma operación), así que una respuesta nunca queda etiquetada con una
+versión más nueva que sus datos.
+
+Las rutas de lectura leen primero la versión con una proyección mínima por
+`_id`: si coincide con `If-None-Match` responden 304 sin cargar ni serializar
+nada; si no, la respuesta completa lleva `ETag`, `Last-Modified` y
+`Cache-Control: private, no-cache`. El ETag incluye un hash del usuario para que
+dos cuentas en el mismo dispositivo no compartan validadores.
+
+Con MONGO_READ_PREFERENCE distinto de `primary` el cuerpo se lee de réplicas que
+pueden ir atrasadas respecto de la versión. Por eso la versión y las lecturas del
+cuerpo van en la misma sesión con consistencia causal (`read_session`): cada
+lectura en una réplica espera a que esta haya aplicado al menos hasta la lectura
+de la versión, y la respuesta nunca lleva un ETag más nuevo que sus datos.
+
+La misma lectura trae el primer elemento del arreglo embebido `transcriptions`:
+si el usuario aún tiene transcripciones sin migrar, se migran antes de responder
+(ver app/core/migrations.py), así que ninguna ruta de lectura las pierde.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from fastapi import Depends, HTTPException, Request
+
+from app.core.auth import get_current_user
+from app.core.database import MONGO_READ_PREFERENCE, client, users_collection
+from app.core.responses import ResponseHeaders
+
+VERSION_FIELDS = ("data_version", "data_modified")
+VERSION_PROJECTION = {"_id": 0, "data_version": 1, "data_modified": 1}
+# Basta un elemento para saber si quedan transcripciones embebidas por migrar
+LEGACY_PROJECTION = {**VERSION_PROJECTION, "transcriptions": {"$slice": 1}}
+
+# Las lecturas en réplicas comparten una sesión causal con la lectura de la versión
+CAUSAL_READS = MONGO_READ_PREFERENCE != "primary"
+
+# Fragmento para updates clásicos: {"$set": {...}, **VERSION_BUMP}
+VERSION_BUMP = {"$inc": {"data_version": 1}, "$currentDate": {"data_modified": True}}
+
+# Etapa equivalente para updates con pipeline
+VERSION_BUMP_STAGE = {
+    "$set": {
+        "data_version": {"$add": [{"$ifNull": ["$data_version", 0]}, 1]},
+        "data_modified": "$$NOW",
+    }
+}
+
+
+def initial_version() -> dict:
+    """Version fields of a newly registered user."""
+    return {"data_version": 1, "data_modified": datetime.now(timezone.utc).replace(tzinfo=None)}
+
+
+async def bump_version(user_id: str):
+    """Marks the user's data as changed. Call it after the write it covers."""
+    await users_collection.update_one({"_id": user_id}, VERSION_BUMP)
+
+
+def strip_version(document: dict) -> dict:
+    """Copy of a user document without the version fields."""
+    return {key: value for key, value in document.items() if key not in VERSION_FIELDS}
+
+
+def make_etag(user_id: str, version: int) -> str:
+    user_hash = hashlib.blake2b(user_id.encode("utf-8"), digest_size=6).hexdigest()
+    return f'W/"{user_hash}-{version}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110)."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class Validators(ResponseHeaders):
+    """ETag / Last-Modified headers for a user's current data version."""
+
+    def __init__(self, user_id: str, version_doc: dict, session=None):
+        self.version = version_doc.get("data_version", 0)
+        self.session = session
+        super().__init__({
+            "ETag": make_etag(user_id, self.version),
+            "Cache-Control": "private, no-cache",
+            "Vary": "Authorization",
+        })
+        modified = version_doc.get("data_modified")
+        if modified:
+            self["Last-Modified"] = format_datetime(modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+async def _validators(request: Request, user_id: str, session):
+    version_doc = await users_collection.find_one({"_id": user_id}, LEGACY_PROJECTION, session=session)
+    if version_doc is None:
+        return None
+    if version_doc.get("transcriptions"):
+        # Importación diferida: migrations depende de este módulo
+        from app.core.migrations import migrate_pending
+
+        await migrate_pending(user_id)
+        # La migración incrementa la versión
+        version_doc = await users_collection.find_one({"_id": user_id}, VERSION_PROJECTION, session=session) or version_doc
+
+    validators = Validators(user_id, version_doc, session)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, validators["ETag"]):
+        raise HTTPException(status_code=304, headers=dict(validators))
+    return validators
+
+
+async def conditional_get(request: Request, user_id: str = Depends(get_current_user)):
+    """Read-route dependency: answers 304 if If-None-Match matches, otherwise yields the validators.
+
+    Yields None when the user does not exist, so the route answers its usual 404.
+    With replica reads the validators carry the causal session the body must be
+    read in (see `read_session`); it ends when the route returns.
+    """
+    if not CAUSAL_READS:
+        yield await _validators(request, user_id, None)
+        return
+    async with await client.start_session(causal_consistency=True) as session:
+        yield await _validators(request, user_id, session)
+
+
+def read_session(validators):
+    """Session for the route's reads from `*_read_collection`; None when they go to the primary."""
+    return validators.session if validators is not None else None
@@ -0,0 +1,253 @@
+"""Buffer de escritura diferida (write-behind) para los contadores derivados de las transcripciones.
+
+Cada alta o baja de una transcripción aplica `$inc` sobre documentos muy
+concurridos del mismo usuario: sus agregados por día, semana y mes (conteos y
+sumas de probabilidades), sus estadísticas de búsqueda y la versión de su
+documento. En lugar de escribirlos en cada petición, el buffer los junta durante
+WRITE_BEHIND_WINDOW_MS, suma los `$inc` que caen en el mismo documento y los
+escribe con un `bulk_write` por colección (la versión del usuario va al final,
+para no etiquetar datos con una versión más nueva que ellos).
+
+La durabilidad se elige con WRITE_BEHIND_MODE:
+
+- `ack` (por defecto): la petición espera a que se escriba el lote que contiene
+  sus cambios y falla si la escritura falla. Se agrupan las escrituras de las
+  peticiones simultáneas sin cambiar lo que garantiza una respuesta 2xx, a costa
+  de hasta una ventana de latencia.
+- `async`: la petición responde sin esperar. Si el proceso muere antes del
+  siguiente lote (a lo sumo una ventana) o el lote falla, esos contadores se
+  pierden. Se registra en el log y en `write_behind_flush_failures_total`, y se
+  recuperan con la migración `rebuild-derived` (ver app/core/migrations.py).
+  Otros dispositivos pueden ver la versión anterior durante una ventana.
+- `off`: se escribe en la misma petición, una operación por documento, como antes.
+
+El buffer guarda a lo sumo WRITE_BEHIND_MAX_PENDING documentos distintos. Al
+llenarse adelanta la escritura y las peticiones nuevas esperan a que se vacíe
+(contrapresión), en lugar de crecer sin límite. Al apagar el servicio se escribe
+lo pendiente. Sin `start()` (scripts, siembras) cada cambio se escribe al momento.
+"""
+import asyncio
+from time import perf_counter
+
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import UpdateOne
+
+from app.core.database import rollups_collection, search_terms_collection, users_collection
+from app.core.rollups import apply_rollups, rollup_updates
+from app.core.search import apply_search_stats, search_updates
+from app.core.settings import settings
+from app.core.versioning import bump_version
+
+WRITE_BEHIND_MODE = settings.write_behind_mode
+WRITE_BEHIND_WINDOW_MS = settings.write_behind_window_ms
+WRITE_BEHIND_MAX_PENDING = settings.write_behind_max_pending
+
+MODES = ("ack", "async", "off")
+if WRITE_BEHIND_MODE not in MODES:
+    raise ValueError(f"WRITE_BEHIND_MODE must be one of {', '.join(MODES)}")
+
+APP_NAME = "mymind-users"
+
+BATCH_SIZE = Histogram(
+    "write_behind_batch_size",
+    "Operations written per write-behind flush, after merging",
+    ["collection", "app_name"],
+    buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000],
+)
+MERGED_UPDATES = Counter(
+    "write_behind_merged_updates_total", "Updates folded into an operation already pending", ["app_name"]
+)
+FLUSH_DURATION = Histogram(
+    "write_behind_flush_duration_seconds",
+    "Time to write one write-behind batch",
+    ["app_name"],
+    buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+FLUSH_FAILURES = Counter("write_behind_flush_failures_total", "Write-behind batches that failed", ["app_name"])
+BACKPRESSURE_WAITS = Counter(
+    "write_behind_backpressure_waits_total", "Writes that waited because the buffer was full", ["app_name"]
+)
+PENDING = Gauge("write_behind_pending_operations", "Operations waiting in the write-behind buffer", ["app_name"], multiprocess_mode="livesum")
+
+
+def _fail(batch: asyncio.Future, error: Exception):
+    if batch.done():
+        return
+    batch.set_exception(error)
+    # En modo async nadie espera el lote; se marca como recuperada para no avisar de más
+    batch.exception()
+
+
+class WriteBehindBuffer:
+    """Merges `$inc` updates per document and writes them in periodic `bulk_write` batches."""
+
+    def __init__(self, collections: list, window: float, max_pending: int):
+        # Orden de escritura de cada lote
+        self.collections = {collection.name: collection for collection in collections}
+        self.window = window
+        self.max_pending = max_pending
+        self._pending = {}
+        self._batch = None
+        self._task = None
+        self._stopping = False
+        self._dirty = asyncio.Event()
+        self._full = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._pending_gauge = PENDING.labels(app_name=APP_NAME)
+        self._merged = MERGED_UPDATES.labels(app_name=APP_NAME)
+        self._backpressure = BACKPRESSURE_WAITS.labels(app_name=APP_NAME)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def _merge(self, collection: str, updates: list):
+        for key, inc in updates:
+            # Los filtros son planos y de valores simples: sus items ordenados identifican el documento
+            pending_key = (collection, tuple(sorted(key.items())))
+            entry = self._pending.get(pending_key)
+            if entry is None:
+                self._pending[pending_key] = (key, dict(inc))
+                continue
+            self._merged.inc()
+            merged = entry[1]
+            for path, value in inc.items():
+                merged[path] = merged.get(path, 0) + value
+
+    async def add(self, updates: dict, wait: bool):
+        """Queues {collection name: [(filter, $inc)]}; with `wait`, returns once they are written."""
+        while len(self._pending) >= self.max_pending:
+            # Contrapresión: adelantar el lote y esperar a que libere espacio
+            self._backpressure.inc()
+            self._drained.clear()
+            self._full.set()
+            self._dirty.set()
+            if not self.running:
+                await self.flush()
+            else:
+                await self._drained.wait()
+
+        for collection, collection_updates in updates.items():
+            self._merge(collection, collection_updates)
+        self._pending_gauge.set(len(self._pending))
+        if self._batch is None:
+            self._batch = asyncio.get_running_loop().create_future()
+        batch = self._batch
+
+        if not self.running:
+            await self.flush()
+        else:
+            self._dirty.set()
+            if len(self._pending) >= self.max_pending:
+                self._full.set()
+        if wait:
+            # shield: si la petición se cancela, el lote se escribe igual para las demás
+            await asyncio.shield(batch)
+
+    def _operations(self, pending: dict) -> dict:
+        operations = {name: [] for name in self.collections}
+        for (collection, _), (key, inc) in pending.items():
+            inc = {path: value for path, value in inc.items() if value}
+            # Un alta y una baja que se anulan no necesitan escritura
+            if not inc:
+                continue
+            if collection == users_collection.name:
+                # La versión solo existe en usuarios registrados: sin upsert, y con su fecha de cambio
+                operations[collection].append(UpdateOne(key, {"$inc": inc, "$currentDate": {"data_modified": True}}))
+            else:
+                operations[collection].append(UpdateOne(key, {"$inc": inc}, upsert=True))
+        return operations
+
+    async def flush(self):
+        """Writes everything pending now. Safe to call concurrently; batches are written one at a time."""
+        async with self._lock:
+            pending, batch = self._pending, self._batch
+            self._pending, self._batch = {}, None
+            self._dirty.clear()
+            self._full.clear()
+            self._drained.set()
+            self._pending_gauge.set(0)
+            if not pending:
+                return
+
+            start = perf_counter()
+            try:
+                for name, operations in self._operations(pending).items():
+                    if operations:
+                        BATCH_SIZE.labels(collection=name, app_name=APP_NAME).observe(len(operations))
+                        await self.collections[name].bulk_write(operations, ordered=False)
+            except Exception as e:
+                # Cualquier error (no solo de PyMongo) tiene que despertar a quien espera el lote
+                FLUSH_FAILURES.labels(app_name=APP_NAME).inc()
+                print(f"Error al escribir el lote diferido ({len(pending)} documentos): {e}")
+                _fail(batch, e)
+            else:
+                batch.set_result(len(pending))
+            finally:
+                # Cancelación (p. ej. al apagar): el lote tampoco puede quedar sin resolver
+                _fail(batch, RuntimeError("write-behind flush was interrupted"))
+                FLUSH_DURATION.labels(app_name=APP_NAME).observe(perf_counter() - start)
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            if not self._stopping and not self._full.is_set():
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.window)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error en el buffer de escritura diferida: {e}")
+            if self._stopping and not self._pending:
+                return
+
+    async def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Writes what is still pending and stops the flush loop."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._dirty.set()
+        await self._task
+        self._task = None
+
+
+write_behind = WriteBehindBuffer(
+    [rollups_collection, search_terms_collection, users_collection],
+    window=WRITE_BEHIND_WINDOW_MS / 1000,
+    max_pending=WRITE_BEHIND_MAX_PENDING,
+)
+
+
+async def apply_transcription_changes(user_id: str, transcriptions: list, sign: int = 1):
+    """Adds (or removes) transcriptions from the user's rollups and search stats and bumps the version.
+
+    Call it after the transcriptions themselves are written; WRITE_BEHIND_MODE
+    decides whether the derived writes are buffered and whether this waits for them.
+    """
+    if not transcriptions:
+        return
+    if WRITE_BEHIND_MODE == "off":
+        await apply_rollups(user_id, transcriptions, sign)
+        await apply_search_stats(user_id, transcriptions, sign)
+        await bump_version(user_id)
+        return
+
+    rollups, terms = [], []
+    for transcription in transcriptions:
+        rollups += rollup_updates(user_id, transcription, sign)
+        terms += search_updates(user_id, transcription, sign)
+    await write_behind.add(
+        {
+            rollups_collection.name: rollups,
+            search_terms_collection.name: terms,
+            users_collection.name: [({"_id": user_id}, {"data_version": 1})],
+        },
+        wait=WRITE_BEHIND_MODE == "ack",
+    )
@@ -1,92 +1,80 @@
 from fastapi import FastAPI,Request, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
-import socket
-from prometheus_fastapi_instrumentator import Instrumentator
-from prometheus_client import Counter, Gauge, Histogram
-import time
-# Cargar variables de entorno
-load_dotenv()
+from contextlib import asynccontextmanager
+from app.core.settings import settings
+from app.core.database import close as close_database, connect as connect_database, create_indexes, start_warm_up
+from app.core.cache import profile_cache
+from app.core.deletion_jobs import deletion_worker
+from app.core.write_behind import write_behind
+from app.core.auth import start_auth, stop_auth
+from app.core.responses import FastJSONResponse
+from app.core.metrics import METRICS_PATH, MetricsMiddleware, metrics_endpoint
+from app.core.instrumentation import InstrumentationMiddleware
+from app.core.allowlist import (
+    GATEWAY_CHECK_DISABLED, gateway_allowlist, scraper_allowlist, start_allowlists, stop_allowlists,
+)
 
 # Middleware para verificar la fuente de la solicitud
 async def verify_request_from_apisix(request: Request):
-    if request.url.path == "/metrics":
-        try:
-            prometheus_ip = socket.gethostbyname("prometheus")
-            client_ip = request.client.host
-
-            if client_ip == prometheus_ip:
-                return
-        except Exception as e:
-            print(f"Error resolviendo Prometheus: {e}")
-    
-    entorno = os.getenv("ENVIRONMENT")
+    # Modo de pruebas (ENVIRONMENT=test): sin gateway delante
+    if GATEWAY_CHECK_DISABLED:
+        return
+    client_ip = request.client.host if request.client else None
 
-    if entorno == "production":
-        expected_url = os.getenv("APISIX_PROD")  # (Tendrás que definirlo para producción también)
-        client_ip = request.client.host
-        print(f"Client IP (Production): {client_ip}, Expected URL: {expected_url}")
-
-        if not client_ip.startswith("http"):
-            if client_ip != expected_url:
-                raise HTTPException(status_code=403, detail="Forbidden: Not allowed source")
+    # Prometheus puede leer /metrics; el gateway puede acceder a todo
+    # (con LAZY_STARTUP, las primeras peticiones esperan la primera resolución de cada lista)
+    if request.url.path == "/metrics":
+        await scraper_allowlist.ready()
+        if scraper_allowlist.is_allowed(client_ip):
+            return
+    await gateway_allowlist.ready()
+    if not gateway_allowlist.is_allowed(client_ip):
+        raise HTTPException(status_code=403, detail="Forbidden: Not allowed source")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # LAZY_STARTUP=true: se empieza a atender sin esperar a MongoDB, al DNS ni a Auth0
+    lazy = settings.lazy_startup
+    if lazy:
+        # Conexión e índices en segundo plano; la primera petición abre el pool si aún no está listo
+        start_warm_up()
     else:
-        # En local, resolver IP del contenedor 'apisix'
-        expected_container_name = "apisix"
-        expected_ip = socket.gethostbyname(expected_container_name)
-        client_ip = request.client.host
-
-        if client_ip != expected_ip:
-            raise HTTPException(status_code=403, detail="Forbidden: Not allowed source")
+        # Pool de MongoDB: verificar conexión y abrir conexiones de calentamiento
+        await connect_database()
+        # Índices de la colección de transcripciones (idempotente)
+        await create_indexes()
+    # IPs del gateway y de Prometheus, resueltas una vez y refrescadas en segundo plano
+    await start_allowlists(lazy=lazy)
+    # Llaves públicas de Auth0 (solo si se verifica la firma de los tokens; en modo diferido, con el primer token)
+    await start_auth(lazy=lazy)
+    # Canal de invalidaciones de la caché de perfiles entre workers
+    await profile_cache.start()
+    # Worker de borrados en segundo plano (retoma los trabajos que hayan quedado a medias)
+    await deletion_worker.start()
+    # Escrituras diferidas de agregados, estadísticas de búsqueda y versiones
+    await write_behind.start()
+    yield
+    # Lo pendiente se escribe antes de cerrar el cliente de MongoDB
+    await write_behind.stop()
+    await deletion_worker.stop()
+    await profile_cache.stop()
+    await stop_allowlists()
+    await stop_auth()
+    close_database()
 
 # Crear la aplicación FastAPI
-app = FastAPI(title="MyMind - User Service", dependencies=[Depends(verify_request_from_apisix)])
-
-# Contadores personalizados
-REQUEST_COUNT = Counter(
-    'fastapi_requests_total', 
-    'Total number of requests', 
-    ['method', 'endpoint', 'app_name']
-)
-
-RESPONSE_COUNT = Counter(
-    'fastapi_responses_total', 
-    'Total number of responses', 
-    ['method', 'endpoint', 'status_code', 'app_name']
+# Respuestas serializadas con orjson por defecto
+app = FastAPI(
+    title="MyMind - User Service",
+    dependencies=[Depends(verify_request_from_apisix)],
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
-RESPONSE_COUNT.labels(method="GET", endpoint="/", status_code="500", app_name="mymind-users").inc(0)
-
-EXCEPTION_COUNT = Counter(
-    'fastapi_exceptions_total', 
-    'Total number of exceptions', 
-    ['method', 'endpoint', 'exception', 'app_name']
-)
-
-EXCEPTION_COUNT.labels(method="GET", endpoint="/", exception="None", app_name="mymind-users").inc(0)
 
-
-IN_PROGRESS = Gauge(
-    'fastapi_requests_in_progress', 
-    'Number of requests in progress',
-    ['method', 'endpoint', 'app_name'] 
-)
-
-REQUEST_LATENCY = Histogram(
-    'fastapi_request_duration_seconds', 
-    'Request latency', 
-    ['method', 'endpoint', 'app_name'],
-    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
-)
-# Instrumentación y exposición en "/metrics"
-Instrumentator() \
-    .instrument(app) \
-    .expose(app, endpoint="/metrics")
-
-# Conexión a MongoDB
-MONGO_URI = os.getenv("MONGO_URI")
-client = AsyncIOMotorClient(MONGO_URI)
-db = client.get_database("mymind_users")  # Nombre de la BD
+# Tiempos por fase, peticiones lentas y perfilado bajo demanda (opcional, ver app/core/instrumentation.py)
+app.add_middleware(InstrumentationMiddleware)
+# Métricas HTTP por plantilla de ruta y exposición en "/metrics"
+app.add_middleware(MetricsMiddleware)
+app.add_api_route(METRICS_PATH, metrics_endpoint, methods=["GET"], include_in_schema=False)
 
 # Importar y registrar las rutas
 from app.routes import users, audio, transcriptions
@@ -100,92 +88,3 @@ app.include_router(transcriptions.router, prefix="/users/transcriptions", tags=[
 async def root():
     return {"message": "Bienvenido al servicio de usuarios de MyMind 🚀"}
 
-
-@app.middleware("http")
-async def metrics_middleware(request: Request, call_next):
-    method = request.method
-    endpoint = request.url.path
-    app_name = "mymind-users"
-
-    # Ignorar las métricas de monitoreo
-    if endpoint == "/metrics":
-        response = await call_next(request)
-        return response
-
-    # 🔥 Incrementar el contador de peticiones
-    REQUEST_COUNT.labels(method=method, endpoint=endpoint, app_name=app_name).inc()
-    
-    # 🔥 Iniciar el contador de requests en progreso
-    IN_PROGRESS.labels(method=method, endpoint=endpoint, app_name=app_name).inc()
-    
-    # Medir el tiempo de la solicitud
-    start_time = time.time()
-    try:
-        response = await call_next(request)
-        duration = time.time() - start_time
-        
-        # 🔥 Observar la latencia de la solicitud
-        REQUEST_LATENCY.labels(method=method, endpoint=endpoint, app_name=app_name).observe(duration)
-        
-        # 🔥 Incrementar el contador de respuestas con el código de estado
-        RESPONSE_COUNT.labels(
-            method=method, 
-            endpoint=endpoint,
-            status_code=str(response.status_code),
-            app_name=app_name
-        ).inc()
-        
-        # 🚨 Si el código de estado es un 5xx, también lo registramos en excepciones
-        if response.status_code >= 500:
-            EXCEPTION_COUNT.labels(
-                method=method,
-                endpoint=endpoint,
-                exception="HTTPException",
-                app_name=app_name
-            ).inc()
-
-    except HTTPException as he:
-        # 🔥 Incrementar el contador de excepciones controladas por FastAPI
-        EXCEPTION_COUNT.labels(
-            method=method,
-            endpoint=endpoint,
-            exception=str(type(he).__name__),
-            app_name=app_name
-        ).inc()
-        raise he
-    
-    except RequestValidationError as ve:
-        # 🔥 Incrementar el contador de excepciones por validación
-        EXCEPTION_COUNT.labels(
-            method=method,
-            endpoint=endpoint,
-            exception="RequestValidationError",
-            app_name=app_name
-        ).inc()
-        raise ve
-
-    except Exception as e:
-        # 🔥 Incrementar el contador de excepciones inesperadas
-        EXCEPTION_COUNT.labels(
-            method=method,
-            endpoint=endpoint,
-            exception=str(type(e).__name__),
-            app_name=app_name
-        ).inc()
-        
-        # Además, registrarlo como un 500 en el contador de respuestas
-        RESPONSE_COUNT.labels(
-            method=method,
-            endpoint=endpoint,
-            status_code="500",
-            app_name=app_name
-        ).inc()
-        
-        # Relanzar el error para FastAPI
-        raise e
-    
-    finally:
-        # 🔥 Decrementar el contador de "in progress"
-        IN_PROGRESS.labels(method=method, endpoint=endpoint, app_name=app_name).dec()
-
-    return response
\ No newline at end of file
@@ -1,83 +1,129 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from app.core.database import users_collection
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Request
+from app.core.database import users_collection, transcriptions_collection, transcriptions_read_collection
 from app.core.auth import get_current_user
+from app.core.deletion_jobs import TRANSCRIPTIONS, enqueue_deletion, ensure_no_active_deletion
+from app.core.ingest import INGEST_CHUNK_SIZE, MAX_INGEST_CHUNK_SIZE, DuplexStreamingResponse, ingest_stream, iter_json_array, iter_ndjson
+from app.core.migrations import migrate_pending
+from app.core.pagination import OffsetPageParams, PageParams
+from app.core.query_builder import TRANSCRIPTION_PROJECTION, TranscriptionQuery, parse_fields
+from app.core.responses import raw_json
+from app.core.rollups import GRANULARITIES, get_rollups
+from app.core.search import search_transcriptions
+from app.core.versioning import Validators, conditional_get, read_session
+from app.core.write_behind import apply_transcription_changes
 from app.schemas.transcription_schema import Transcription
-from typing import Optional
+from typing import Literal, Optional
+from datetime import date as Date
 from bson import ObjectId
 
 router = APIRouter()
 
-# 🔹 Obtener todas las transcripciones
-@router.get("/")
-async def get_all_transcriptions(user_id: str = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": user_id}, {"transcriptions": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user.get("transcriptions", [])
 
-# 🔹 Obtener transcripción específica por ID
-@router.get("/{transcription_id}")
-async def get_transcription_by_id(transcription_id: str, user_id: str = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": user_id}, {"transcriptions": 1, "_id": 0})
+async def ensure_user_exists(user_id: str):
+    """Raises 404 if the user is not registered."""
+    user = await users_collection.find_one({"_id": user_id}, {"_id": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    transcription = next((t for t in user.get("transcriptions", []) if t["_id"] == transcription_id), None)
-    if not transcription:
-        raise HTTPException(status_code=404, detail="Transcription not found")
 
-    return transcription
+
+async def find_transcriptions(user_id: str, query: TranscriptionQuery, page: PageParams, session=None):
+    """Runs a compiled transcription query server-side and returns one page."""
+    cursor = transcriptions_read_collection.aggregate(query.pipeline(user_id, page), session=session)
+    transcriptions = await cursor.to_list(length=page.limit + 1)
+    # Solo se consulta el usuario cuando la primera página viene vacía, para distinguir el 404
+    if not transcriptions and page.after is None:
+        await ensure_user_exists(user_id)
+    return page.page(transcriptions)
+
+
+# 🔹 Obtener todas las transcripciones
+@router.get("/")
+@raw_json
+async def get_all_transcriptions(
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    return await find_transcriptions(user_id, TranscriptionQuery(fields=fields), page, read_session(validators))
 
 # 🔹 Obtener transcripciones por emoción
 @router.get("/by-emotion/{emotion}")
-async def get_transcriptions_by_emotion(emotion: str, user_id: str = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": user_id}, {"transcriptions": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return [t for t in user.get("transcriptions", []) if t.get("emotion") == emotion]
+@raw_json
+async def get_transcriptions_by_emotion(
+    emotion: str,
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    return await find_transcriptions(user_id, TranscriptionQuery(emotion=emotion, fields=fields), page, read_session(validators))
 
 # 🔹 Obtener transcripciones por sentimiento
 @router.get("/by-sentiment/{sentiment}")
-async def get_transcriptions_by_sentiment(sentiment: str, user_id: str = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": user_id}, {"transcriptions": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return [t for t in user.get("transcriptions", []) if t.get("sentiment") == sentiment]
+@raw_json
+async def get_transcriptions_by_sentiment(
+    sentiment: str,
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    return await find_transcriptions(user_id, TranscriptionQuery(sentiment=sentiment, fields=fields), page, read_session(validators))
 
 # 🔹 Obtener transcripciones por tema
 @router.get("/by-topic/{topic}")
-async def get_transcriptions_by_topic(topic: str, user_id: str = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": user_id}, {"transcriptions": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return [t for t in user.get("transcriptions", []) if t.get("topic") == topic]
+@raw_json
+async def get_transcriptions_by_topic(
+    topic: str,
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    return await find_transcriptions(user_id, TranscriptionQuery(topic=topic, fields=fields), page, read_session(validators))
 
 # 🔹 Obtener transcripciones por fecha
 @router.get("/by-date/{date}")
-async def get_transcriptions_by_date(date: str, user_id: str = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": user_id}, {"transcriptions": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return [t for t in user.get("transcriptions", []) if t.get("date", "").startswith(date)]
+@raw_json
+async def get_transcriptions_by_date(
+    date: str,
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    return await find_transcriptions(user_id, TranscriptionQuery(date=date, fields=fields), page, read_session(validators))
 
-# 🔹 Obtener transcripciones por hora o rango de horas
+# 🔹 Obtener transcripciones por hora o rango de horas (22-3 cruza la medianoche)
 @router.get("/by-hour/{start_hour}-{end_hour}")
+@raw_json
 async def get_transcriptions_by_hour(
-    start_hour: int,
-    end_hour: int,
-    user_id: str = Depends(get_current_user)
+    start_hour: int = Path(..., ge=0, le=23),
+    end_hour: int = Path(..., ge=0, le=23),
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
 ):
-    user = await users_collection.find_one({"_id": user_id}, {"transcriptions": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    query = TranscriptionQuery(start_hour=start_hour, end_hour=end_hour, fields=fields)
+    return await find_transcriptions(user_id, query, page, read_session(validators))
+
+# 🔹 Obtener transcripciones por día de la semana (1 = lunes ... 7 = domingo)
+@router.get("/by-weekday/{weekday}")
+@raw_json
+async def get_transcriptions_by_weekday(
+    weekday: int = Path(..., ge=1, le=7),
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    return await find_transcriptions(user_id, TranscriptionQuery(weekday=weekday, fields=fields), page, read_session(validators))
 
-    transcriptions = user.get("transcriptions", [])
-    return [
-        t for t in transcriptions 
-        if start_hour <= int(t.get("time", "00:00").split(":")[0]) <= end_hour
-    ]
 # 🔹 Obtener transcripciones con múltiples filtros
 @router.get("/filter")
+@raw_json
 async def get_transcriptions_with_filters(
     emotion: Optional[str] = None,
     sentiment: Optional[str] = None,
@@ -85,57 +131,167 @@ async def get_transcriptions_with_filters(
     date: Optional[str] = None,
     start_hour: Optional[int] = Query(None, ge=0, le=23),
     end_hour: Optional[int] = Query(None, ge=0, le=23),
+    start_date: Optional[Date] = Query(None, description="First local date (inclusive)"),
+    end_date: Optional[Date] = Query(None, description="Last local date (inclusive)"),
+    weekday: Optional[int] = Query(None, ge=1, le=7, description="1 = Monday ... 7 = Sunday"),
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
     user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
 ):
-    user = await users_collection.find_one({"_id": user_id}, {"transcriptions": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    query = TranscriptionQuery(emotion, sentiment, topic, date, start_hour, end_hour, fields, start_date, end_date, weekday)
+    return await find_transcriptions(user_id, query, page, read_session(validators))
 
-    transcriptions = user.get("transcriptions", [])
 
-    if emotion:
-        transcriptions = [t for t in transcriptions if t.get("emotion") == emotion]
-    if sentiment:
-        transcriptions = [t for t in transcriptions if t.get("sentiment") == sentiment]
-    if topic:
-        transcriptions = [t for t in transcriptions if t.get("topic") == topic]
-    if date:
-        transcriptions = [t for t in transcriptions if t.get("date", "").startswith(date)]
-    if start_hour is not None and end_hour is not None:
-        transcriptions = [
-            t for t in transcriptions if start_hour <= int(t.get("time", "00:00").split(":")[0]) <= end_hour
-        ]
-    return transcriptions
+# 🔹 Búsqueda de texto completo (BM25), combinable con los filtros de /filter
+@router.get("/search")
+@raw_json
+async def search_transcriptions_text(
+    q: str = Query(..., min_length=1, max_length=500, description="Words to search for in the text"),
+    emotion: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    topic: Optional[str] = None,
+    date: Optional[str] = None,
+    start_hour: Optional[int] = Query(None, ge=0, le=23),
+    end_hour: Optional[int] = Query(None, ge=0, le=23),
+    start_date: Optional[Date] = Query(None, description="First local date (inclusive)"),
+    end_date: Optional[Date] = Query(None, description="Last local date (inclusive)"),
+    weekday: Optional[int] = Query(None, ge=1, le=7, description="1 = Monday ... 7 = Sunday"),
+    page: OffsetPageParams = Depends(),
+    fields: Optional[set] = Depends(parse_fields),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    """Returns the best-matching transcriptions first, each with its BM25 `score`."""
+    query = TranscriptionQuery(emotion, sentiment, topic, date, start_hour, end_hour, fields, start_date, end_date, weekday)
+    result = await search_transcriptions(user_id, q, query, page, read_session(validators))
+    if not result["transcriptions"] and page.offset == 0:
+        await ensure_user_exists(user_id)
+    return result
+
+
+# 🔹 Analíticas por día, semana o mes a partir de los agregados incrementales
+@router.get("/analytics")
+@raw_json
+async def get_transcription_analytics(
+    granularity: Literal[GRANULARITIES] = "day",
+    start: Optional[str] = Query(None, description="First bucket, e.g. 2024-01-15, 2024-W03 or 2024-01"),
+    end: Optional[str] = Query(None, description="Last bucket (inclusive)"),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    buckets = await get_rollups(user_id, granularity, start, end, read_session(validators))
+    if not buckets:
+        await ensure_user_exists(user_id)
+    return {"granularity": granularity, "buckets": buckets}
+
+
+# 🔹 Estadísticas de probabilidades (media, varianza, promedios móviles, entropía)
+@router.get("/probability-stats")
+@raw_json
+async def get_probability_stats(
+    emotion: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    topic: Optional[str] = None,
+    date: Optional[str] = None,
+    start_hour: Optional[int] = Query(None, ge=0, le=23),
+    end_hour: Optional[int] = Query(None, ge=0, le=23),
+    start_date: Optional[Date] = Query(None, description="First local date (inclusive)"),
+    end_date: Optional[Date] = Query(None, description="Last local date (inclusive)"),
+    weekday: Optional[int] = Query(None, ge=1, le=7, description="1 = Monday ... 7 = Sunday"),
+    window: int = Query(7, ge=1, le=365, description="Rolling window, in transcriptions"),
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    # NumPy se importa con la primera petición a esta ruta, no al arrancar
+    from app.core.probability_stats import PROBABILITY_BATCH_SIZE, stream_probability_stats
+
+    fields = {"emotionProbabilities", "sentimentProbabilities"}
+    query = TranscriptionQuery(emotion, sentiment, topic, date, start_hour, end_hour, fields, start_date, end_date, weekday)
+    cursor = transcriptions_read_collection.aggregate(
+        query.scan_pipeline(user_id), session=read_session(validators), batchSize=PROBABILITY_BATCH_SIZE
+    )
+    stats = await stream_probability_stats(cursor, window)
+    # Los dos campos cuentan las mismas filas
+    if not stats["emotionProbabilities"]["count"]:
+        await ensure_user_exists(user_id)
+    return stats
+
+
+# 🔹 Ingesta masiva de transcripciones (NDJSON o arreglo JSON)
+@router.post("/ingest")
+async def ingest_transcriptions(
+    request: Request,
+    ordered: bool = Query(False, description="Stop at the first invalid item or write error"),
+    chunk_size: int = Query(INGEST_CHUNK_SIZE, ge=1, le=MAX_INGEST_CHUNK_SIZE),
+    user_id: str = Depends(get_current_user),
+):
+    """Validates the body as it streams in and returns one NDJSON result line per item."""
+    await ensure_user_exists(user_id)
+    # El borrado en curso eliminaría lo que se ingiera ahora
+    await ensure_no_active_deletion(user_id)
+
+    content_type = request.headers.get("content-type", "")
+    parser = iter_ndjson if "ndjson" in content_type or "jsonlines" in content_type else iter_json_array
+    return DuplexStreamingResponse(
+        ingest_stream(user_id, parser(request.stream()), ordered, chunk_size),
+        media_type="application/x-ndjson",
+    )
+
+
+# 🔹 Obtener transcripción específica por ID (después de /filter para no ocultar esa ruta)
+@router.get("/{transcription_id}")
+@raw_json
+async def get_transcription_by_id(
+    transcription_id: str,
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
+    transcription = await transcriptions_collection.find_one(
+        {"_id": transcription_id, "user_id": user_id}, TRANSCRIPTION_PROJECTION
+    )
+    if not transcription:
+        await ensure_user_exists(user_id)
+        raise HTTPException(status_code=404, detail="Transcription not found")
+
+    return transcription
 
 
 # 🔹 Eliminar transcripción específica
 @router.delete("/delete-transcription/{transcription_id}")
 async def delete_transcription_by_id(transcription_id: str, user_id: str = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    result = await users_collection.update_one(
-        {"_id": user_id},
-        {"$pull": {"transcriptions": {"_id": transcription_id}}}
+    deleted = await transcriptions_collection.find_one_and_delete(
+        {"_id": transcription_id, "user_id": user_id}, {"text": 0}
     )
-    if result.modified_count == 0:
+    # Puede seguir embebida en el documento del usuario: se migra y se reintenta
+    if not deleted and await migrate_pending(user_id):
+        deleted = await transcriptions_collection.find_one_and_delete(
+            {"_id": transcription_id, "user_id": user_id}, {"text": 0}
+        )
+    if not deleted:
+        await ensure_user_exists(user_id)
         raise HTTPException(status_code=404, detail="Transcription not found")
 
+    # Agregados, estadísticas de búsqueda y versión, agrupados con los de otras peticiones
+    await apply_transcription_changes(user_id, [deleted], sign=-1)
+
     return {"message": "Transcription deleted"}
 
 # 🔹 Eliminar todas las transcripciones
-@router.delete("/delete-all-transcriptions")
+@router.delete("/delete-all-transcriptions", status_code=202)
 async def delete_all_transcriptions(user_id: str = Depends(get_current_user)):
-    user = await users_collection.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    result = await users_collection.update_one(
-        {"_id": user_id},
-        {"$set": {"transcriptions": []}}
-    )
-    if result.modified_count == 0:
+    """Enqueues the deletion of every transcription; the worker deletes them in batches."""
+    # Transcripciones en la colección o embebidas que aún no se hayan migrado
+    pending = await transcriptions_collection.find_one({"user_id": user_id}, {"_id": 1})
+    if not pending:
+        pending = await users_collection.find_one({"_id": user_id, "transcriptions.0": {"$exists": True}}, {"_id": 1})
+    if not pending:
+        await ensure_user_exists(user_id)
         raise HTTPException(status_code=404, detail="No changes made")
 
-    return {"message": "All transcriptions deleted"}
+    job = await enqueue_deletion(user_id, TRANSCRIPTIONS)
+    return {
+        "message": "Transcription deletion in progress",
+        "job_id": job["_id"],
+        "status_url": f"/users/deletion-jobs/{job['_id']}",
+    }
@@ -1,11 +1,35 @@
 from fastapi import APIRouter, HTTPException, Depends
-from app.core.database import users_collection
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
+from app.core.database import users_collection, transcriptions_collection
 from app.core.auth import get_current_user
+from app.core.cache import PROFILE_PROJECTION, profile_cache
+from app.core.deletion_jobs import ACCOUNT, enqueue_deletion, ensure_no_active_deletion, get_job, job_status
+from app.core.export import export_stream
+from app.core.migrations import migrate_pending
+from app.core.query_builder import TRANSCRIPTION_PROJECTION
+from app.core.responses import raw_json
+from app.core.versioning import (
+    VERSION_BUMP, VERSION_BUMP_STAGE, VERSION_FIELDS, Validators, conditional_get, initial_version, strip_version,
+)
 from app.schemas.user_schema import UserSchema, UpdateNotificationsRequest, UpdateProfilePicRequest
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter()
 
+# Campos de configuración que la app pide al abrir (`/users/settings` los devuelve juntos)
+SETTINGS_FIELDS = ("name", "email", "notifications", "profilePic", "privacy")
+
+
+async def get_profile_field(user_id: str, field: str):
+    """Returns {field: value} from the cached profile, like a single-field projection."""
+    user = await profile_cache.get_profile(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {field: user[field]} if field in user else {}
+
+
 # 🔹 Register a new user
 @router.post("/register")
 async def register_user(user: UserSchema, user_id: str = Depends(get_current_user)):
@@ -14,48 +38,79 @@ async def register_user(user: UserSchema, user_id: str = Depends(get_current_use
 
     if existing_user:
         raise HTTPException(status_code=409, detail="User is already registered")
+    # Una cuenta recién borrada no se puede recrear hasta que termine el borrado de sus datos
+    await ensure_no_active_deletion(user_id)
 
-    user_data = user.dict()
+    user_data = user.model_dump()
     user_data["_id"] = user_id  
-    user_data["transcriptions"] = []  
+    user_data.update(initial_version())
 
     await users_collection.insert_one(user_data)
+    await profile_cache.invalidate(user_id)
     return {"message": "User successfully registered", "id": user_id}
 
 # 🔹 Get all user
 @router.get("/profile")
-async def get_user_profile(user_id: str = Depends(get_current_user)):
+@raw_json
+async def get_user_profile(
+    user_id: str = Depends(get_current_user),
+    validators: Optional[Validators] = Depends(conditional_get),
+):
     """Retrieves all user information."""
-    user = await users_collection.find_one({"_id": user_id})
-    if not user:
+    profile = await profile_cache.get_profile(user_id)
+    if profile and validators and profile.get("data_version", 0) < validators.version:
+        # La copia en caché de este worker es anterior a la versión del ETag
+        profile_cache.discard(user_id)
+        profile = await profile_cache.get_profile(user_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
+
+    # Copia superficial sin los campos de versión: el documento cacheado no se modifica
+    user = strip_version(profile)
+    cursor = transcriptions_collection.find({"user_id": user_id}, TRANSCRIPTION_PROJECTION).sort([("date", 1), ("time", 1)])
+    user["transcriptions"] = await cursor.to_list(length=None)
     return user
 
+# 🔹 Export profile and full transcription history
+@router.get("/export")
+async def export_user_data(gzip: bool = False, user_id: str = Depends(get_current_user)):
+    """Streams the profile and every transcription as NDJSON (optionally gzip-compressed)."""
+    # La exportación lee solo la colección: antes se migra lo que siga embebido
+    await migrate_pending(user_id)
+    projection = {**PROFILE_PROJECTION, **{field: 0 for field in VERSION_FIELDS}}
+    profile = await users_collection.find_one({"_id": user_id}, projection)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    filename = "mymind-export.ndjson.gz" if gzip else "mymind-export.ndjson"
+    return StreamingResponse(
+        export_stream(profile, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 # 🔹 Get user's name
 @router.get("/name")
 async def get_user_name(user_id: str = Depends(get_current_user)):
     """Retrieves only the user's name."""
-    user = await users_collection.find_one({"_id": user_id}, {"name": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return await get_profile_field(user_id, "name")
 
 # 🔹 Update user name
 @router.patch("/update-name")
 async def update_name(new_name: str, user_id: str = Depends(get_current_user)):
     """Updates the user's name."""
-    user = await users_collection.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+    # El filtro excluye "sin cambios" para que la versión solo suba si el valor cambia
     result = await users_collection.update_one(
-        {"_id": user_id},
-        {"$set": {"name": new_name}}  # Actualiza el nombre del usuario
+        {"_id": user_id, "name": {"$ne": new_name}},
+        {"$set": {"name": new_name}, **VERSION_BUMP},  # Actualiza el nombre del usuario
     )
-
-    if result.modified_count == 0:
+    if result.matched_count == 0:
+        # Una sola lectura más, solo en el caso raro, para elegir el 404
+        if await users_collection.find_one({"_id": user_id}, {"_id": 1}) is None:
+            raise HTTPException(status_code=404, detail="User not found")
         raise HTTPException(status_code=404, detail="No changes made to name")
 
+    await profile_cache.invalidate(user_id)
     return {"message": "Name updated"}
 
 
@@ -63,119 +118,124 @@ async def update_name(new_name: str, user_id: str = Depends(get_current_user)):
 @router.get("/email")
 async def get_user_email(user_id: str = Depends(get_current_user)):
     """Retrieves only the user's email."""
-    user = await users_collection.find_one({"_id": user_id}, {"email": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return await get_profile_field(user_id, "email")
 
 # 🔹 Actualizar el email del usuario
 @router.patch("/update-email")
 async def update_email(new_email: str, user_id: str = Depends(get_current_user)):
     """Updates the user's email."""
-    user = await users_collection.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+    # El filtro excluye "sin cambios" para que la versión solo suba si el valor cambia
     result = await users_collection.update_one(
-        {"_id": user_id},
-        {"$set": {"email": new_email}}  # Actualiza el email del usuario
+        {"_id": user_id, "email": {"$ne": new_email}},
+        {"$set": {"email": new_email}, **VERSION_BUMP},  # Actualiza el email del usuario
     )
-
-    if result.modified_count == 0:
+    if result.matched_count == 0:
+        # Una sola lectura más, solo en el caso raro, para elegir el 404
+        if await users_collection.find_one({"_id": user_id}, {"_id": 1}) is None:
+            raise HTTPException(status_code=404, detail="User not found")
         raise HTTPException(status_code=404, detail="No changes made to email")
 
+    await profile_cache.invalidate(user_id)
     return {"message": "Email updated"}
 
 # 🔹 Get notification settings
 @router.get("/notifications")
 async def get_notifications(user_id: str = Depends(get_current_user)):
     """Retrieves the user's notification settings."""
-    user = await users_collection.find_one({"_id": user_id}, {"notifications": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return await get_profile_field(user_id, "notifications")
 
 # 🔹 Toggle user's notification settings
 @router.patch("/update-notifications")
 async def toggle_notifications(user_id: str = Depends(get_current_user)):
     """Updates the user's notification preference (true <-> false)."""
-    user = await users_collection.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    current_notifications = user.get("notifications", True)  # Default to True if not set
-    new_notifications_value = not current_notifications
-
-    result = await users_collection.update_one(
+    # Pipeline de actualización: la negación ocurre en el servidor, así que dos toggles concurrentes no se pisan
+    user = await users_collection.find_one_and_update(
         {"_id": user_id},
-        {"$set": {"notifications": new_notifications_value}}
+        [{"$set": {"notifications": {"$not": [{"$ifNull": ["$notifications", True]}]}}}, VERSION_BUMP_STAGE],  # Default to True if not set
+        projection={"notifications": 1, "_id": 0},
+        return_document=ReturnDocument.AFTER,
     )
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail="No changes made to notifications settings")
-
-    return {"message": "Notification settings updated", "notifications": new_notifications_value}
+    await profile_cache.invalidate(user_id)
+    return {"message": "Notification settings updated", "notifications": user["notifications"]}
 
 # 🔹 Get profile picture
 @router.get("/profile-pic")
 async def get_profile_pic(user_id: str = Depends(get_current_user)):
     """Retrieves the user's profile picture URL."""
-    user = await users_collection.find_one({"_id": user_id}, {"profilePic": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return await get_profile_field(user_id, "profilePic")
 
 @router.patch("/update-profile-pic")
 async def update_profile_pic(update: UpdateProfilePicRequest, user_id: str = Depends(get_current_user)):
     """Updates the user's profile picture URL."""
+    # El filtro excluye "sin cambios" para que la versión solo suba si la foto cambia
     result = await users_collection.update_one(
-        {"_id": user_id},
-        {"$set": {"profilePic": update.profilePic}}
+        {"_id": user_id, "profilePic": {"$ne": update.profilePic}},
+        {"$set": {"profilePic": update.profilePic}, **VERSION_BUMP}
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found or no changes made")
+    await profile_cache.invalidate(user_id)
     return {"message": "Profile picture updated"}
 
 # 🔹 Get privacy settings
 @router.get("/privacy")
 async def get_privacy_settings(user_id: str = Depends(get_current_user)):
     """Retrieves the user's privacy settings."""
-    user = await users_collection.find_one({"_id": user_id}, {"privacy": 1, "_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return await get_profile_field(user_id, "privacy")
 
 # 🔹 Update privacy settings
 @router.patch("/privacy")
 async def update_privacy_settings(user_id: str = Depends(get_current_user)):
     """Toggles the user's privacy setting for anonymized usage."""
-    # Buscar al usuario en la base de datos
-    user = await users_collection.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Obtener el valor actual de la preferencia 'allow_anonimized_usage'
-    current_privacy = user.get("privacy", {}).get("allow_anonimized_usage", False)
-
-    # Cambiar el valor: si es True, lo cambia a False, y si es False, lo cambia a True
-    new_privacy_value = not current_privacy
-
-    # Actualizar la base de datos con el nuevo valor
-    result = await users_collection.update_one(
+    # Cambiar el valor en el servidor: si es True, lo cambia a False, y si es False (o no existe), lo cambia a True
+    current_privacy = {"$ifNull": ["$privacy.allow_anonimized_usage", False]}
+    user = await users_collection.find_one_and_update(
         {"_id": user_id},
-        {"$set": {"privacy.allow_anonimized_usage": new_privacy_value}}
+        [{"$set": {"privacy.allow_anonimized_usage": {"$not": [current_privacy]}}}, VERSION_BUMP_STAGE],
+        projection={"privacy": 1, "_id": 0},
+        return_document=ReturnDocument.AFTER,
     )
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail="No changes made to privacy settings")
+    await profile_cache.invalidate(user_id)
+    return {"message": "Privacy settings updated", "allow_anonimized_usage": user["privacy"]["allow_anonimized_usage"]}
 
-    return {"message": "Privacy settings updated", "allow_anonimized_usage": new_privacy_value}
+# 🔹 Get all settings in one request
+@router.get("/settings")
+async def get_settings(user_id: str = Depends(get_current_user)):
+    """Retrieves name, email, notifications, profile picture and privacy settings together."""
+    user = await profile_cache.get_profile(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {field: user.get(field) for field in SETTINGS_FIELDS}
 
 # 🔹 Delete user account
-@router.delete("/delete")
+@router.delete("/delete", status_code=202)
 async def delete_user(user_id: str = Depends(get_current_user)):
-    """Deletes the user's account and all data."""
-    result = await users_collection.delete_one({"_id": user_id})
-    if result.deleted_count == 0:
+    """Deletes the account now and enqueues the deletion of all its data."""
+    user = await users_collection.find_one({"_id": user_id}, {"_id": 1})
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return {"message": "User successfully deleted"}
+
+    # El trabajo se encola antes de borrar el perfil: si el proceso cae entre ambos pasos, el worker lo borra igual
+    job = await enqueue_deletion(user_id, ACCOUNT)
+    await users_collection.delete_one({"_id": user_id})
+    await profile_cache.invalidate(user_id)
+    return {
+        "message": "User deleted; data deletion in progress",
+        "job_id": job["_id"],
+        "status_url": f"/users/deletion-jobs/{job['_id']}",
+    }
+
+# 🔹 Estado de un borrado en segundo plano
+@router.get("/deletion-jobs/{job_id}")
+async def get_deletion_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Returns the status and progress of one of the user's deletion jobs."""
+    job = await get_job(user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return job_status(job)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, validator
-from typing import Dict, Optional
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class IdRequest(BaseModel):
@@ -31,7 +31,8 @@ class Transcription(BaseModel):
     sentimentProbabilities: Dict[str, float]  
     topic: Optional[str] = None 
 
-    @validator("date")
+    @field_validator("date")
+    @classmethod
     def validate_date_format(cls, v):
         """Validate that the date is in the correct format (e.g., ISO format)."""
         try:
@@ -39,3 +40,18 @@ class Transcription(BaseModel):
         except ValueError:
             raise ValueError("Invalid date format, expected ISO format")
         return v
+
+
+
+# Validador compilado una sola vez para lotes: una llamada al núcleo de pydantic por lista
+TranscriptionList = TypeAdapter(List[Transcription])
+
+
+def validate_transcriptions(items, strict: bool = False) -> List[Transcription]:
+    """Validates a list of transcriptions in one pass.
+
+    `strict=True` disables type coercion, for internal callers that already send
+    exact types. Items that are already `Transcription` instances are returned as
+    they are, without being validated again.
+    """
+    return TranscriptionList.validate_python(items, strict=strict)
@@ -1,7 +1,11 @@
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import List, Optional, Literal
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Optional, Literal
 from datetime import datetime, date
-from .transcription_schema import Transcription
+import re
+
+
+# Compilado una vez al importar el módulo, no en cada validación
+IP_PATTERN = re.compile(r"^(\d{1,3}\.){3}\d{1,3}$")
 
 
 class UpdateNotificationsRequest(BaseModel):
@@ -20,12 +24,11 @@ class DataTreatment(BaseModel):
     acceptance_ip: str
     privacy_preferences: PrivacyPreferences
 
-    @validator("acceptance_ip")
+    @field_validator("acceptance_ip")
+    @classmethod
     def validate_ip(cls, v):
         """Validate that the IP address follows a correct format."""
-        import re
-        ip_pattern = r"^(\d{1,3}\.){3}\d{1,3}$" 
-        if not re.match(ip_pattern, v):
+        if not IP_PATTERN.match(v):
             raise ValueError("Invalid IP address format")
         return v
 
@@ -42,28 +45,23 @@ class UserSchema(BaseModel):
     gender: Optional[Literal["Masculino", "Femenino", "Omitido"]] = None  
     notifications: bool
     data_treatment: DataTreatment
-    transcriptions: List[Transcription] = []  
+    # Las transcripciones ya no se aceptan en el registro (se cargan con /users/transcriptions/ingest);
+    # si llegan en el payload se ignoran sin validarlas
 
-    @validator("name")
+    @field_validator("name")
+    @classmethod
     def validate_name(cls, v):
-        """Validates that the name is not too short or too long."""
-        if len(v.strip()) < 1:
+        """Validates that the name is not only whitespace (the length is checked by `Field`)."""
+        if not v.strip():
             raise ValueError("Name cannot be empty")
-        if len(v) > 100:
-            raise ValueError("Name cannot be longer than 100 characters")
         return v
 
-    @validator("notifications")
-    def validate_notifications(cls, v):
-        """Ensure that notifications is a boolean value."""
-        if not isinstance(v, bool):
-            raise ValueError("Notifications must be a boolean value")
-        return v
-    @validator("birthdate")
+    @field_validator("birthdate")
+    @classmethod
     def validate_date_format(cls, v):
         """Validate that the date is in the correct format (e.g., ISO format)."""
         try:
             datetime.fromisoformat(v)  
         except ValueError:
             raise ValueError("Invalid date format, expected ISO format")
-        return v
\ No newline at end of file
+        return v
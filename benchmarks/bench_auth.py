@@ -0,0 +1,66 @@
+"""Costo por petición de la autenticación con verificación de firma (RS256).
+
+Compara decodificar sin verificar (modo APISIX), verificar la firma en cada
+petición y verificar con la caché de tokens ya verificados. Usa un par de llaves
+RSA generado al vuelo y un JWKS en memoria, sin red.
+
+    python -m benchmarks.bench_auth [--iterations 5000]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.core import auth
+
+
+def build_token():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk["kid"] = "bench"
+    auth.jwks_cache.keys = {"bench": jwt.PyJWK(jwk).key}
+    claims = {"sub": "auth0|bench", "exp": int(time.time()) + 3600, "iss": auth.AUTH0_ISSUER, "aud": auth.AUTH0_AUDIENCE}
+    return jwt.encode({k: v for k, v in claims.items() if v is not None}, private_key, algorithm="RS256", headers={"kid": "bench"})
+
+
+async def per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    return (time.perf_counter() - start) / iterations
+
+
+async def run(iterations: int):
+    token = build_token()
+
+    async def unverified():
+        jwt.decode(token, options={"verify_signature": False})
+
+    async def verified_uncached():
+        auth.verified_tokens._entries.clear()
+        await auth.verify_token(token)
+
+    async def verified_cached():
+        await auth.verify_token(token)
+
+    results = {
+        "decode without verification": await per_call(unverified, iterations),
+        "RS256 verification per request": await per_call(verified_uncached, iterations),
+        "verified-token cache hit": await per_call(verified_cached, iterations),
+    }
+    for name, seconds in results.items():
+        print(f"{name:32} {seconds * 1e6:9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
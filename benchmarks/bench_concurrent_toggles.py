@@ -0,0 +1,111 @@
+"""Dispara cientos de toggles simultáneos y verifica que el estado final sea consistente.
+
+Con la lectura + escritura anterior, dos toggles concurrentes podían leer el mismo
+valor y escribir el mismo resultado. Con `find_one_and_update` y un pipeline de
+actualización, N toggles sobre un valor inicial `True` deben dejarlo en
+`True if N es par else False`, y las respuestas deben alternar exactamente.
+
+Como control negativo corre también la implementación anterior (`find_one` +
+`update_one`) y exige que pierda actualizaciones: si no las pierde, la prueba no
+es capaz de ver la carrera y el resultado no vale.
+
+Por defecto corre contra el sustituto en memoria (`--mongo mock`), que cede el
+event loop antes de cada operación para que las lecturas y escrituras de
+peticiones distintas se intercalen. Con un mongod (`--mongo uri`, con MONGO_URI)
+la carrera es la real. Sale con código 1 si los toggles actuales pierden
+actualizaciones o si el control negativo no las pierde.
+
+    python -m benchmarks.bench_concurrent_toggles [--toggles 500] [--mongo mock]
+    MONGO_URI=mongodb://localhost:27017 python -m benchmarks.bench_concurrent_toggles --mongo uri
+"""
+import argparse
+import asyncio
+import os
+import time
+
+BENCH_USER = "bench|concurrent-toggles"
+
+
+async def legacy_toggle_notifications(user_id: str):
+    """The pre-fix toggle: reads the value, then writes its negation in a second round trip."""
+    from app.core.database import users_collection
+
+    user = await users_collection.find_one({"_id": user_id})
+    new_value = not user.get("notifications", True)
+    await users_collection.update_one({"_id": user_id}, {"$set": {"notifications": new_value}})
+    return {"notifications": new_value}
+
+
+async def legacy_update_privacy_settings(user_id: str):
+    from app.core.database import users_collection
+
+    user = await users_collection.find_one({"_id": user_id})
+    new_value = not user.get("privacy", {}).get("allow_anonimized_usage", False)
+    await users_collection.update_one({"_id": user_id}, {"$set": {"privacy.allow_anonimized_usage": new_value}})
+    return {"allow_anonimized_usage": new_value}
+
+
+async def check(label: str, toggle_notifications, update_privacy_settings, toggles: int) -> bool:
+    """Runs both toggles `toggles` times concurrently. Returns True if no update was lost."""
+    from app.core.database import users_collection
+
+    await users_collection.delete_one({"_id": BENCH_USER})
+    await users_collection.insert_one({
+        "_id": BENCH_USER,
+        "notifications": True,
+        "privacy": {"allow_anonimized_usage": False},
+    })
+    try:
+        start = time.perf_counter()
+        notifications = await asyncio.gather(*(toggle_notifications(user_id=BENCH_USER) for _ in range(toggles)))
+        privacy = await asyncio.gather(*(update_privacy_settings(user_id=BENCH_USER) for _ in range(toggles)))
+        elapsed = time.perf_counter() - start
+
+        user = await users_collection.find_one({"_id": BENCH_USER})
+        expected_notifications = toggles % 2 == 0
+        expected_privacy = toggles % 2 == 1
+        # Cada post-imagen es única: la mitad de las respuestas ve False y la otra mitad True
+        seen_false = sum(1 for r in notifications if r["notifications"] is False)
+        seen_true = sum(1 for r in privacy if r["allow_anonimized_usage"] is True)
+
+        print(f"[{label}] {2 * toggles} toggles in {elapsed:.2f}s ({2 * toggles / elapsed:.0f} ops/s)")
+        print(f"[{label}] notifications: final={user['notifications']} expected={expected_notifications} false-responses={seen_false}/{toggles}")
+        print(f"[{label}] privacy: final={user['privacy']['allow_anonimized_usage']} expected={expected_privacy} true-responses={seen_true}/{toggles}")
+
+        return (
+            user["notifications"] == expected_notifications
+            and user["privacy"]["allow_anonimized_usage"] == expected_privacy
+            and seen_false == (toggles + 1) // 2
+            and seen_true == (toggles + 1) // 2
+        )
+    finally:
+        await users_collection.delete_one({"_id": BENCH_USER})
+
+
+async def run(toggles: int):
+    from app.routes.users import toggle_notifications, update_privacy_settings
+
+    legacy_ok = await check("legacy", legacy_toggle_notifications, legacy_update_privacy_settings, toggles)
+    print("legacy: lost updates detected (expected)" if not legacy_ok else "legacy: NO LOST UPDATES, the check cannot see the race")
+    ok = await check("current", toggle_notifications, update_privacy_settings, toggles)
+    print("current: OK" if ok else "current: LOST UPDATES DETECTED")
+    return ok and not legacy_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--toggles", type=int, default=500)
+    parser.add_argument("--mongo", choices=["mock", "uri"], default="mock")
+    args = parser.parse_args()
+    if args.mongo == "mock":
+        from benchmarks.mongo_standin import install
+
+        # El sustituto se instala antes de importar `app`
+        os.environ["ENVIRONMENT"] = "test"
+        install()
+    ok = asyncio.run(run(args.toggles))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
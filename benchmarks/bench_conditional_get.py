@@ -0,0 +1,76 @@
+"""GET completo vs. revalidación con If-None-Match (304) en las lecturas que repite la app móvil.
+
+Siembra un usuario con `--count` transcripciones y, dentro del proceso (ASGI, sin
+red), pide `/users/profile` y la primera página de `/users/transcriptions/`:
+primero sin validadores y luego con el ETag recibido. Reporta latencia media,
+bytes de cuerpo y CPU por petición de cada variante. Requiere un MongoDB local.
+
+    MONGO_URI=mongodb://localhost:27017 python -m benchmarks.bench_conditional_get [--count 2000] [--requests 300]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.core.auth import get_current_user
+from app.core.database import transcriptions_collection, users_collection
+from app.core.versioning import initial_version
+from app.main import app, verify_request_from_apisix
+from benchmarks.bench_filter_query import synthetic_transcriptions
+
+BENCH_USER = "bench|conditional-get"
+PATHS = ["/users/profile", "/users/transcriptions/?limit=200"]
+
+
+async def seed(count: int):
+    await users_collection.delete_one({"_id": BENCH_USER})
+    await transcriptions_collection.delete_many({"user_id": BENCH_USER})
+    await users_collection.insert_one({"_id": BENCH_USER, "name": "Bench", "notifications": True, **initial_version()})
+    batch = synthetic_transcriptions(count)
+    for offset, doc in enumerate(batch):
+        doc["_id"] = f"t{offset}"
+        doc["user_id"] = BENCH_USER
+    await transcriptions_collection.insert_many(batch)
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int, headers=None):
+    status, size = None, 0
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path, headers=headers)
+        status, size = response.status_code, len(response.content)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return {"status": status, "bytes": size, "ms": wall / requests * 1000, "cpu_ms": cpu / requests * 1000}
+
+
+async def run(count: int, requests: int):
+    await seed(count)
+    app.dependency_overrides[get_current_user] = lambda: BENCH_USER
+    app.dependency_overrides[verify_request_from_apisix] = lambda: None
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"{'path':<36} {'variant':<10} {'status':>6} {'bytes':>9} {'ms/req':>8} {'cpu ms':>8}")
+            for path in PATHS:
+                etag = (await client.get(path)).headers["ETag"]
+                for variant, headers in (("full", None), ("304", {"If-None-Match": etag})):
+                    result = await measure(client, path, requests, headers)
+                    print(f"{path:<36} {variant:<10} {result['status']:>6} {result['bytes']:>9} "
+                          f"{result['ms']:>8.2f} {result['cpu_ms']:>8.2f}")
+    finally:
+        app.dependency_overrides.clear()
+        await users_collection.delete_one({"_id": BENCH_USER})
+        await transcriptions_collection.delete_many({"user_id": BENCH_USER})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000, help="transcriptions for the test user")
+    parser.add_argument("--requests", type=int, default=300, help="requests per variant")
+    args = parser.parse_args()
+    asyncio.run(run(args.count, args.requests))
+
+
+if __name__ == "__main__":
+    main()
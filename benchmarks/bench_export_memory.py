@@ -0,0 +1,115 @@
+"""Exporta un historial sintético grande y verifica que el RSS del proceso quede acotado.
+
+Siembra N transcripciones (200k por defecto) para un usuario de prueba, consume
+`export_stream` completo y mide el crecimiento del RSS durante la exportación: la
+muestra más alta (leída de /proc tras cada bloque) menos el RSS antes de empezar.
+Termina con código 1 si supera `--max-mb`.
+
+Con `--mongo uri` (MONGO_URI) los documentos viven en mongod, que ordena con el
+índice (user_id, date, time). Con el sustituto en memoria (`--mongo mock`, por
+defecto) mongomock ordena todas las referencias en el proceso antes del primer
+documento, un costo proporcional al historial que no existe en producción. Por
+eso antes de medir se abre una vez la misma consulta: el asignador ya tiene esa
+memoria y la medición solo ve lo que la exportación retiene.
+
+    python -m benchmarks.bench_export_memory [--count 200000] [--gzip] [--mongo mock] [--max-mb 32]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import time
+
+BENCH_USER = "bench|export-memory"
+SEED_BATCH = 5000
+
+
+async def seed(count: int):
+    from app.core.database import transcriptions_collection, users_collection
+    from benchmarks.bench_filter_query import synthetic_transcriptions
+
+    await users_collection.delete_one({"_id": BENCH_USER})
+    await transcriptions_collection.delete_many({"user_id": BENCH_USER})
+    await users_collection.insert_one({"_id": BENCH_USER, "name": "Bench", "notifications": True})
+    for start in range(0, count, SEED_BATCH):
+        batch = synthetic_transcriptions(min(SEED_BATCH, count - start))
+        for offset, doc in enumerate(batch):
+            doc["_id"] = f"t{start + offset}"
+            doc["user_id"] = BENCH_USER
+        await transcriptions_collection.insert_many(batch)
+
+
+def rss_mb():
+    """Current resident set size of the process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        # Sin /proc (macOS): el máximo histórico, en bytes en macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+
+async def export(compress: bool):
+    """Consumes the export; returns (bytes exported, highest RSS sample in MB)."""
+    from app.core.database import users_collection
+    from app.core.export import export_stream
+
+    profile = await users_collection.find_one({"_id": BENCH_USER}, {"transcriptions": 0})
+    total, peak_rss = 0, rss_mb()
+    async for chunk in export_stream(profile, compress=compress):
+        total += len(chunk)
+        peak_rss = max(peak_rss, rss_mb())
+    return total, peak_rss
+
+
+async def warm_up_sort():
+    """Runs the export query up to its first document, so the stand-in's in-memory sort is allocated once."""
+    from app.core.database import transcriptions_read_collection
+    from app.core.query_builder import TRANSCRIPTION_PROJECTION
+
+    cursor = transcriptions_read_collection.find({"user_id": BENCH_USER}, TRANSCRIPTION_PROJECTION)
+    await cursor.sort([("date", 1), ("time", 1), ("_id", 1)]).next()
+
+
+async def run(count: int, compress: bool, max_mb: float, mongo: str):
+    from app.core.database import transcriptions_collection, users_collection
+
+    await seed(count)
+    try:
+        if mongo == "mock":
+            await warm_up_sort()
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        size, peak_rss = await export(compress)
+        elapsed = time.perf_counter() - start
+        growth = peak_rss - rss_before
+
+        print(f"exported {count} transcriptions ({size / 1e6:.1f} MB{' gzip' if compress else ''}) in {elapsed:.1f}s")
+        print(f"RSS before: {rss_before:.1f} MB, max RSS growth: {growth:.1f} MB")
+        ok = growth <= max_mb
+        print("OK" if ok else f"RSS growth above {max_mb} MB")
+        return ok
+    finally:
+        await users_collection.delete_one({"_id": BENCH_USER})
+        await transcriptions_collection.delete_many({"user_id": BENCH_USER})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--mongo", choices=["mock", "uri"], default="mock")
+    parser.add_argument("--max-mb", type=float, default=32.0, help="allowed RSS growth during the export")
+    args = parser.parse_args()
+    if args.mongo == "mock":
+        from benchmarks.mongo_standin import install
+
+        # El sustituto se instala antes de importar `app`
+        os.environ["ENVIRONMENT"] = "test"
+        install()
+    ok = asyncio.run(run(args.count, args.gzip, args.max_mb, args.mongo))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""CPU del proceso del servicio por petición a `/filter`: filtrado en Python vs. pipeline en MongoDB.
+
+El camino anterior decodificaba el arreglo completo de transcripciones del usuario
+y aplicaba hasta cinco list comprehensions (con `split(":")` por elemento). El
+nuevo compila los filtros con `TranscriptionQuery` y solo decodifica la página
+que devuelve el servidor. La decodificación BSON se simula con `bson.encode/decode`
+para contar el costo de red/decodificación que paga el proceso.
+
+    python -m benchmarks.bench_filter_query [--sizes 100 1000 10000] [--repeat 20]
+"""
+import argparse
+import random
+import time
+
+import bson
+
+from app.core.pagination import PageParams
+from app.core.query_builder import TranscriptionQuery
+
+EMOTIONS = ["alegria", "tristeza", "ansiedad", "enojo", "calma"]
+SENTIMENTS = ["positivo", "negativo", "neutral"]
+TOPICS = ["estudios", "familia", "salud", "amigos"]
+
+
+def synthetic_transcriptions(count: int):
+    rng = random.Random(count)
+    return [
+        {
+            "_id": f"t{i}",
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "text": "nota de voz " * 20,
+            "emotion": rng.choice(EMOTIONS),
+            "emotionProbabilities": {e: rng.random() for e in EMOTIONS},
+            "sentiment": rng.choice(SENTIMENTS),
+            "sentimentProbabilities": {s: rng.random() for s in SENTIMENTS},
+            "topic": rng.choice(TOPICS),
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_filter(raw_user, emotion, sentiment, topic, date, start_hour, end_hour):
+    transcriptions = bson.decode(raw_user).get("transcriptions", [])
+    if emotion:
+        transcriptions = [t for t in transcriptions if t.get("emotion") == emotion]
+    if sentiment:
+        transcriptions = [t for t in transcriptions if t.get("sentiment") == sentiment]
+    if topic:
+        transcriptions = [t for t in transcriptions if t.get("topic") == topic]
+    if date:
+        transcriptions = [t for t in transcriptions if t.get("date", "").startswith(date)]
+    if start_hour is not None and end_hour is not None:
+        transcriptions = [
+            t for t in transcriptions if start_hour <= int(t.get("time", "00:00").split(":")[0]) <= end_hour
+        ]
+    return transcriptions
+
+
+def pushdown_filter(raw_page, emotion, sentiment, topic, date, start_hour, end_hour):
+    query = TranscriptionQuery(emotion, sentiment, topic, date, start_hour, end_hour)
+    page = PageParams(limit=50, sort="asc", cursor=None)
+    query.pipeline("auth0|bench", page)
+    return page.page([bson.decode(doc) for doc in raw_page])
+
+
+def cpu_per_call(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    params = ("ansiedad", "negativo", None, "2024-0", 20, 23)
+    print(f"{'transcriptions':>14} {'legacy ms':>10} {'pushdown ms':>12} {'speedup':>8}")
+    for size in args.sizes:
+        transcriptions = synthetic_transcriptions(size)
+        raw_user = bson.encode({"_id": "auth0|bench", "transcriptions": transcriptions})
+        matches = legacy_filter(raw_user, *params)
+        # El servidor devuelve solo la primera página (51 documentos con el look-ahead)
+        raw_page = [bson.encode(t) for t in matches[:51]]
+
+        legacy = cpu_per_call(lambda: legacy_filter(raw_user, *params), args.repeat)
+        pushdown = cpu_per_call(lambda: pushdown_filter(raw_page, *params), args.repeat)
+        print(f"{size:>14} {legacy * 1000:>10.3f} {pushdown * 1000:>12.3f} {legacy / pushdown:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Serialización de respuestas de transcripciones: ruta por defecto vs. orjson.
+
+Compara, para varios tamaños de página, el tiempo y la memoria asignada (pico de
+tracemalloc) de:
+
+- `jsonable_encoder` + `JSONResponse` de Starlette (`json.dumps`), la ruta anterior;
+- `jsonable_encoder` + `FastJSONResponse` (clase por defecto de la app);
+- `FastJSONResponse` directo, como en las rutas decoradas con `@raw_json`.
+
+    python -m benchmarks.bench_json_serialization [--sizes 10 100 1000 10000]
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.responses import FastJSONResponse
+from benchmarks.bench_filter_query import synthetic_transcriptions
+
+
+def build_payload(count: int):
+    transcriptions = synthetic_transcriptions(count)
+    for t in transcriptions:
+        t["created_at"] = datetime(2024, 1, 1, 12, 30)
+    return {"transcriptions": transcriptions, "next_cursor": None}
+
+
+STRATEGIES = {
+    "jsonable_encoder + json": lambda payload: JSONResponse(jsonable_encoder(payload)),
+    "jsonable_encoder + orjson": lambda payload: FastJSONResponse(jsonable_encoder(payload)),
+    "orjson (raw_json)": lambda payload: FastJSONResponse(payload),
+}
+
+
+def measure(fn, payload, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(payload)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'size':>7}  {'strategy':<26} {'ms/response':>12} {'peak alloc KB':>14} {'speedup':>8}")
+    for size in args.sizes:
+        payload = build_payload(size)
+        repeat = max(3, 20000 // size)
+        baseline = None
+        for name, fn in STRATEGIES.items():
+            elapsed, peak = measure(fn, payload, repeat)
+            baseline = baseline or elapsed
+            print(f"{size:>7}  {name:<26} {elapsed * 1000:>12.3f} {peak / 1024:>14.1f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Benchmark de carga: throughput, latencias, CPU y RSS por endpoint, en JSON para comparar commits.
+
+Levanta `benchmarks.load_server` en un subproceso (sustituto de MongoDB en memoria
+por defecto, o el MongoDB de MONGO_URI con `--mongo uri`), que siembra `--users`
+usuarios con `--transcriptions` transcripciones cada uno. Luego, con
+`--concurrency` clientes concurrentes:
+
+1. una fase aislada de `--duration` segundos por endpoint de la mezcla, para
+   atribuir CPU y memoria del servicio a cada uno;
+2. una fase mixta con los pesos de `--mix`, como tráfico realista.
+
+El CPU y el RSS se leen de /proc del proceso del servicio (solo Linux). El
+resultado se imprime (o se guarda con `--output`) como JSON; `--compare` muestra
+la diferencia contra un resultado anterior.
+
+    python -m benchmarks.bench_load [--transcriptions 1000] [--mix profile=2,list=4,filter=3,delete=1] \\
+        [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import jwt
+
+from benchmarks.load_server import bench_transcription, bench_user
+
+EMOTIONS = ["alegria", "tristeza", "ansiedad", "enojo", "calma"]
+DEFAULT_MIX = "profile=2,list=4,filter=3,delete=1"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+class Traffic:
+    """Builds the request for each endpoint of the mix; deletes walk each user's ids downwards."""
+
+    def __init__(self, users: int, transcriptions: int):
+        self.users = users
+        self.tokens = [
+            jwt.encode({"sub": bench_user(i)}, "bench-load-signing-key-0000000000", algorithm="HS256")
+            for i in range(users)
+        ]
+        self.next_delete = [transcriptions - 1] * users
+
+    def request(self, endpoint: str, rng: random.Random):
+        user = rng.randrange(self.users)
+        headers = {"Authorization": f"Bearer {self.tokens[user]}"}
+        if endpoint == "profile":
+            return "GET", "/users/profile", headers
+        if endpoint == "list":
+            return "GET", "/users/transcriptions/?limit=50", headers
+        if endpoint == "filter":
+            return "GET", f"/users/transcriptions/filter?emotion={rng.choice(EMOTIONS)}&limit=50", headers
+        if endpoint == "delete":
+            transcription = self.next_delete[user]
+            self.next_delete[user] -= 1
+            return "DELETE", f"/users/transcriptions/delete-transcription/{bench_transcription(user, transcription)}", headers
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def cpu_seconds(pid: int):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    # utime y stime son los campos 14 y 15 de /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(ordered: list, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def latency_stats(latencies: list, errors: int, duration: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / duration, 1),
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+            "p50": round(percentile(ordered, 50) * 1000, 3),
+            "p90": round(percentile(ordered, 90) * 1000, 3),
+            "p99": round(percentile(ordered, 99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        },
+    }
+
+
+async def run_phase(client, traffic: Traffic, mix: dict, args, pid: int, duration: float) -> dict:
+    """Drives `mix` traffic for `duration` seconds; returns per-endpoint and overall stats."""
+    names, weights = list(mix), list(mix.values())
+    latencies = {name: [] for name in names}
+    errors = dict.fromkeys(names, 0)
+    rss_samples = [rss_mb(pid)]
+    cpu_start = cpu_seconds(pid)
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int):
+        rng = random.Random(args.seed * 1000 + n)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, headers = traffic.request(name, rng)
+            start = time.perf_counter()
+            response = await client.request(method, path, headers=headers)
+            latencies[name].append(time.perf_counter() - start)
+            errors[name] += response.status_code >= 400
+
+    async def sample_rss():
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0.25)
+            rss_samples.append(rss_mb(pid))
+
+    started = time.perf_counter()
+    await asyncio.gather(sample_rss(), *(worker(n) for n in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    cpu_end = cpu_seconds(pid)
+    total = sum(len(values) for values in latencies.values())
+    overall = latency_stats([v for values in latencies.values() for v in values], sum(errors.values()), elapsed)
+    if cpu_start is not None and cpu_end is not None:
+        cpu = cpu_end - cpu_start
+        overall["server_cpu_percent"] = round(cpu / elapsed * 100, 1)
+        overall["server_cpu_ms_per_request"] = round(cpu / total * 1000, 3) if total else None
+    samples = [sample for sample in rss_samples if sample is not None]
+    if samples:
+        overall["server_rss_mb"] = {"start": round(samples[0], 1), "peak": round(max(samples), 1), "end": round(samples[-1], 1)}
+    return {
+        "overall": overall,
+        "endpoints": {name: latency_stats(latencies[name], errors[name], elapsed) for name in names},
+    }
+
+
+async def wait_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The load server exited before becoming ready")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("The load server did not become ready")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    command = [
+        sys.executable, "-m", "benchmarks.load_server", "--port", str(args.port), "--mongo", args.mongo,
+        "--users", str(args.users), "--transcriptions", str(args.transcriptions),
+    ]
+    # Tokens sin firma verificada; la salida del servicio va a stderr para no mezclarse con el JSON
+    env = {**os.environ, "AUTH_VERIFY_SIGNATURE": "false"}
+    process = subprocess.Popen(command, env=env, stdout=sys.stderr)
+    traffic = Traffic(args.users, args.transcriptions)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "endpoints": {},
+    }
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            await wait_ready(client, process, args.startup_timeout)
+            # Calentamiento sin borrados, para no consumir las transcripciones de la medición
+            await run_phase(client, traffic, {name: 1 for name in mix if name != "delete"}, args, process.pid, args.warmup)
+            for name in mix:
+                phase = await run_phase(client, traffic, {name: 1}, args, process.pid, args.duration)
+                results["endpoints"][name] = phase["overall"]
+            results["mixed"] = await run_phase(client, traffic, mix, args, process.pid, args.duration)
+    finally:
+        process.terminate()
+        process.wait()
+    return results
+
+
+def compare(baseline: dict, current: dict):
+    """Prints throughput and latency changes against a previous result."""
+
+    def rows(result):
+        yield from result.get("endpoints", {}).items()
+        if "mixed" in result:
+            yield "mixed", result["mixed"]["overall"]
+
+    previous = dict(rows(baseline))
+    print(f"{'endpoint':<10} {'req/s':>16} {'p50 ms':>20} {'p99 ms':>20}", file=sys.stderr)
+    for name, stats in rows(current):
+        old = previous.get(name)
+        if old is None:
+            continue
+        cells = []
+        for new_value, old_value in (
+            (stats["rps"], old["rps"]),
+            (stats["latency_ms"]["p50"], old["latency_ms"]["p50"]),
+            (stats["latency_ms"]["p99"], old["latency_ms"]["p99"]),
+        ):
+            change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+            cells.append(f"{new_value:>9.1f} ({change:+5.1f}%)")
+        print(f"{name:<10} {cells[0]:>16} {cells[1]:>20} {cells[2]:>20}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--transcriptions", type=int, default=1000, help="per user (10 to 100000)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights: profile, list, filter, delete")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per phase")
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--mongo", choices=["mock", "uri"], default="mock")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--startup-timeout", type=float, default=600, help="seconds to wait for seeding")
+    parser.add_argument("--output", help="write the JSON result to this file instead of stdout")
+    parser.add_argument("--compare", help="previous JSON result to compare against")
+    args = parser.parse_args()
+    if not 10 <= args.transcriptions <= 100_000:
+        parser.error("--transcriptions must be between 10 and 100000")
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Prueba de carga del middleware de métricas: memoria estable con millones de IDs distintos.
+
+Envía peticiones con un ID distinto en cada ruta a una app mínima con las mismas
+plantillas de ruta que el servicio, envuelta en `MetricsMiddleware`, y reporta el
+RSS y el número de series de Prometheus en cada punto de control. Con etiquetas
+por ruta cruda las series crecían con cada ID; con plantillas se mantienen fijas.
+
+    python -m benchmarks.bench_metrics_cardinality [--requests 1000000] [--checkpoints 10]
+"""
+import argparse
+import asyncio
+import resource
+import time
+
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+
+from app.core.metrics import MetricsMiddleware
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/users/transcriptions/{transcription_id}")
+    async def get_transcription(transcription_id: str):
+        return {"_id": transcription_id}
+
+    @app.get("/users/transcriptions/by-emotion/{emotion}")
+    async def by_emotion(emotion: str):
+        return []
+
+    app.add_middleware(MetricsMiddleware)
+    return app
+
+
+def series_count() -> int:
+    return sum(len(metric.samples) for metric in REGISTRY.collect() if metric.name.startswith("fastapi_"))
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(total: int, checkpoints: int):
+    app = build_app()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(path):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1234), "server": ("test", 80),
+        }
+
+    # Calentamiento: crea las series de ambas rutas antes de medir
+    await app(scope("/users/transcriptions/warmup"), receive, send)
+    await app(scope("/users/transcriptions/by-emotion/warmup"), receive, send)
+
+    step = max(1, total // checkpoints)
+    start = time.perf_counter()
+    print(f"{'requests':>10} {'series':>7} {'max RSS MB':>11} {'us/request':>11}")
+    for i in range(total):
+        path = f"/users/transcriptions/t{i}" if i % 2 else f"/users/transcriptions/by-emotion/e{i}"
+        await app(scope(path), receive, send)
+        if (i + 1) % step == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{i + 1:>10} {series_count():>7} {rss_mb():>11.1f} {elapsed / (i + 1) * 1e6:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000000)
+    parser.add_argument("--checkpoints", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.checkpoints))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""`probability_stats` (NumPy) frente a un bucle de diccionarios en Python puro, con presupuesto de latencia.
+
+La columna numpy mide `stream_probability_stats`, lo que ejecuta la ruta: lee los
+documentos en lotes de PROBABILITY_BATCH_SIZE y arma las matrices por lote.
+Termina con código 1 si el tamaño más grande (100k por defecto) supera
+`--max-ms`.
+
+Con `--mongo uri` (MONGO_URI) además siembra ese número de transcripciones para
+un usuario de prueba y mide la ruta completa contra mongod: el pipeline de la
+consulta, la lectura del cursor en lotes y el cálculo. Falla si supera
+`--max-e2e-ms`. No hay modo con el sustituto en memoria: mongomock evalúa el
+pipeline en Python y su latencia no dice nada de la de producción.
+
+    python -m benchmarks.bench_probability_stats [--sizes 1000 10000 100000] [--window 7] [--max-ms 500]
+    MONGO_URI=mongodb://localhost:27017 python -m benchmarks.bench_probability_stats --mongo uri [--max-e2e-ms 1500]
+"""
+import argparse
+import asyncio
+import math
+import time
+
+from app.core.probability_stats import PROBABILITY_BATCH_SIZE, stream_probability_stats
+from benchmarks.bench_filter_query import synthetic_transcriptions
+
+BENCH_USER = "bench|probability-stats"
+SEED_BATCH = 5000
+
+
+def python_field_stats(transcriptions, field, window):
+    labels = sorted({label for t in transcriptions for label in t[field]})
+    n = len(transcriptions)
+    sums = {label: 0.0 for label in labels}
+    squares = {label: 0.0 for label in labels}
+    entropies, confidences, rolling = [], [], []
+    for i, t in enumerate(transcriptions):
+        probabilities = t[field]
+        total = sum(probabilities.values())
+        entropy = 0.0
+        for label in labels:
+            p = probabilities.get(label, 0.0)
+            sums[label] += p
+            squares[label] += p * p
+            if total > 0 and p > 0:
+                entropy -= (p / total) * math.log(p / total)
+        entropies.append(entropy / math.log(len(labels)))
+        confidences.append(max(probabilities.values()))
+        if i + 1 >= window:
+            chunk = transcriptions[i + 1 - window:i + 1]
+            rolling.append({label: sum(c[field].get(label, 0.0) for c in chunk) / window for label in labels})
+    mean = {label: sums[label] / n for label in labels}
+    variance = {label: squares[label] / n - mean[label] ** 2 for label in labels}
+    return mean, variance, rolling, entropies, confidences
+
+
+def python_stats(transcriptions, window):
+    return {
+        field: python_field_stats(transcriptions, field, window)
+        for field in ("emotionProbabilities", "sentimentProbabilities")
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+async def _documents(transcriptions):
+    for transcription in transcriptions:
+        yield transcription
+
+
+def streamed(transcriptions, window):
+    return asyncio.run(stream_probability_stats(_documents(transcriptions), window))
+
+
+async def end_to_end(count: int, window: int, repeat: int = 3) -> float:
+    """Seeds `count` transcriptions and returns the best time of the route's read + compute, in ms."""
+    from app.core.database import create_indexes, transcriptions_collection
+    from app.core.query_builder import TranscriptionQuery
+
+    await create_indexes()
+    await transcriptions_collection.delete_many({"user_id": BENCH_USER})
+    try:
+        for start in range(0, count, SEED_BATCH):
+            batch = synthetic_transcriptions(min(SEED_BATCH, count - start))
+            for offset, doc in enumerate(batch):
+                doc["_id"] = f"{BENCH_USER}-{start + offset}"
+                doc["user_id"] = BENCH_USER
+            await transcriptions_collection.insert_many(batch)
+
+        query = TranscriptionQuery(fields={"emotionProbabilities", "sentimentProbabilities"})
+        best = math.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cursor = transcriptions_collection.aggregate(query.scan_pipeline(BENCH_USER), batchSize=PROBABILITY_BATCH_SIZE)
+            stats = await stream_probability_stats(cursor, window)
+            best = min(best, time.perf_counter() - start)
+        assert stats["emotionProbabilities"]["count"] == count
+        return best * 1000
+    finally:
+        await transcriptions_collection.delete_many({"user_id": BENCH_USER})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--window", type=int, default=7)
+    parser.add_argument("--max-ms", type=float, default=500.0, help="budget for the NumPy path at the largest size")
+    parser.add_argument("--mongo", choices=["none", "uri"], default="none")
+    parser.add_argument("--max-e2e-ms", type=float, default=1500.0, help="budget for read + compute against mongod")
+    args = parser.parse_args()
+
+    print(f"{'transcriptions':>14} {'python ms':>10} {'numpy ms':>9} {'speedup':>8}")
+    for size in args.sizes:
+        transcriptions = synthetic_transcriptions(size)
+        python = timed(lambda: python_stats(transcriptions, args.window))
+        vectorized = min(timed(lambda: streamed(transcriptions, args.window)) for _ in range(3))
+        print(f"{size:>14} {python * 1000:>10.1f} {vectorized * 1000:>9.1f} {python / vectorized:>7.1f}x")
+
+    largest = max(args.sizes)
+    ok = vectorized * 1000 <= args.max_ms
+    print(f"numpy at {largest}: {vectorized * 1000:.1f} ms (budget {args.max_ms:.0f} ms) {'OK' if ok else 'OVER BUDGET'}")
+    if args.mongo == "uri":
+        elapsed = asyncio.run(end_to_end(largest, args.window))
+        e2e_ok = elapsed <= args.max_e2e_ms
+        print(f"end to end at {largest}: {elapsed:.1f} ms (budget {args.max_e2e_ms:.0f} ms) {'OK' if e2e_ok else 'OVER BUDGET'}")
+        ok = ok and e2e_ok
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
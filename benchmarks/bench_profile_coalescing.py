@@ -0,0 +1,82 @@
+"""Consultas a MongoDB por apertura de la app: cinco rutas de configuración en paralelo vs. `/users/settings`.
+
+Simula `--launches` aperturas con la caché de perfiles fría (cada una de un
+usuario distinto) contra el sustituto en memoria, con `--rtt-ms` de latencia
+agregada a cada `find_one` de perfil para que las peticiones se solapen como en
+producción. Reporta `find_one` por apertura y la latencia p50 de cada variante.
+Sin single-flight, las cinco rutas en paralelo hacían cinco consultas.
+
+    python -m benchmarks.bench_profile_coalescing [--launches 200] [--rtt-ms 2]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.mongo_standin import install
+
+SETTINGS_ROUTES = ["/users/name", "/users/email", "/users/notifications", "/users/profile-pic", "/users/privacy"]
+
+
+class CountingCollection:
+    """Wraps a collection, counting `find_one` calls and adding a simulated round trip."""
+
+    def __init__(self, collection, rtt: float):
+        self.collection = collection
+        self.rtt = rtt
+        self.find_one_calls = 0
+
+    async def find_one(self, *args, **kwargs):
+        self.find_one_calls += 1
+        await asyncio.sleep(self.rtt)
+        return await self.collection.find_one(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+async def run(launches: int, rtt: float):
+    import httpx
+
+    from app.core import cache
+    from app.core.auth import get_current_user
+    from app.core.database import users_collection
+    from app.main import app, verify_request_from_apisix
+
+    users = [f"bench|coalescing-{i}" for i in range(launches)]
+    await users_collection.insert_many([
+        {"_id": user, "name": "Bench", "email": "bench@example.com", "notifications": True} for user in users
+    ])
+    counting = cache.users_collection = CountingCollection(users_collection, rtt)
+    current = {"user": users[0]}
+    app.dependency_overrides[get_current_user] = lambda: current["user"]
+    app.dependency_overrides[verify_request_from_apisix] = lambda: None
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        print(f"{'variant':<28} {'find_one/launch':>16} {'p50 ms':>8}")
+        for name, paths in (("5 routes in parallel", SETTINGS_ROUTES), ("/users/settings", ["/users/settings"])):
+            counting.find_one_calls = 0
+            latencies = []
+            for user in users:
+                current["user"] = user
+                cache.profile_cache.discard(user)
+                start = time.perf_counter()
+                await asyncio.gather(*(client.get(path) for path in paths))
+                latencies.append(time.perf_counter() - start)
+            print(f"{name:<28} {counting.find_one_calls / launches:>16.2f} {statistics.median(latencies) * 1000:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--launches", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=2, help="simulated MongoDB round trip")
+    args = parser.parse_args()
+    # El sustituto se instala antes de importar `app`
+    os.environ["ENVIRONMENT"] = "test"
+    install()
+    asyncio.run(run(args.launches, args.rtt_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Validaciones por segundo de `UserSchema` y `Transcription` (pydantic v2).
+
+Compara los esquemas anteriores (validadores estilo v1, `import re` por llamada,
+historial embebido en el registro) con los actuales, para un payload individual y
+para lotes de transcripciones: uno a uno, con el `TypeAdapter` en modo normal
+(como valida cada bloque la ingesta), en modo estricto y con instancias ya
+construidas (que no se revalidan).
+
+    python -m benchmarks.bench_schema_validation [--batch 1000] [--seconds 1]
+"""
+import argparse
+import time
+import warnings
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, EmailStr, Field
+
+from app.schemas.transcription_schema import Transcription, validate_transcriptions
+from app.schemas.user_schema import UserSchema
+from benchmarks.bench_filter_query import synthetic_transcriptions
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from pydantic import validator
+
+    class LegacyTranscription(BaseModel):
+        date: str
+        time: str
+        text: str = Field(..., min_length=1)
+        emotion: str = Field(..., min_length=1)
+        emotionProbabilities: Dict[str, float]
+        sentiment: str = Field(..., min_length=1)
+        sentimentProbabilities: Dict[str, float]
+        topic: Optional[str] = None
+
+        @validator("date")
+        def validate_date_format(cls, v):
+            datetime.fromisoformat(v)
+            return v
+
+    class LegacyDataTreatment(BaseModel):
+        accept_policies: bool
+        acceptance_date: datetime
+        acceptance_ip: str
+        privacy_preferences: Dict[str, bool]
+
+        @validator("acceptance_ip")
+        def validate_ip(cls, v):
+            import re
+            if not re.match(r"^(\d{1,3}\.){3}\d{1,3}$", v):
+                raise ValueError("Invalid IP address format")
+            return v
+
+    class LegacyUserSchema(BaseModel):
+        name: str = Field(..., min_length=1, max_length=100)
+        email: EmailStr
+        profilePic: Optional[str] = None
+        birthdate: str
+        city: str
+        personality: Optional[Literal["Introvertido", "Extrovertido"]] = None
+        university: str
+        degree: str
+        gender: Optional[Literal["Masculino", "Femenino", "Omitido"]] = None
+        notifications: bool
+        data_treatment: LegacyDataTreatment
+        transcriptions: List[LegacyTranscription] = []
+
+        @validator("name")
+        def validate_name(cls, v):
+            if len(v.strip()) < 1:
+                raise ValueError("Name cannot be empty")
+            return v
+
+        @validator("notifications")
+        def validate_notifications(cls, v):
+            if not isinstance(v, bool):
+                raise ValueError("Notifications must be a boolean value")
+            return v
+
+        @validator("birthdate")
+        def validate_date_format(cls, v):
+            datetime.fromisoformat(v)
+            return v
+
+
+def user_payload(history: int):
+    return {
+        "name": "Ana", "email": "ana@example.com", "birthdate": "2000-01-01", "city": "Bogotá",
+        "university": "U", "degree": "D", "notifications": True,
+        "data_treatment": {
+            "accept_policies": True, "acceptance_date": "2024-01-01T10:00:00",
+            "acceptance_ip": "10.0.0.1", "privacy_preferences": {"allow_anonimized_usage": False},
+        },
+        "transcriptions": [{k: v for k, v in t.items() if k != "_id"} for t in synthetic_transcriptions(history)],
+    }
+
+
+def rate(fn, seconds: float) -> float:
+    calls = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        calls += 1
+    return calls / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=1000, help="Transcriptions per bulk payload")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time spent on each case")
+    args = parser.parse_args()
+
+    user = user_payload(0)
+    user_with_history = user_payload(50)
+    batch = user_payload(args.batch)["transcriptions"]
+    single = batch[0]
+    instances = validate_transcriptions(batch)
+
+    cases = [
+        ("UserSchema (legacy)", 1, lambda: LegacyUserSchema(**user)),
+        ("UserSchema", 1, lambda: UserSchema.model_validate(user)),
+        ("UserSchema + 50 history (legacy)", 1, lambda: LegacyUserSchema(**user_with_history)),
+        ("UserSchema + 50 history", 1, lambda: UserSchema.model_validate(user_with_history)),
+        ("Transcription (legacy)", 1, lambda: LegacyTranscription(**single)),
+        ("Transcription", 1, lambda: Transcription.model_validate(single)),
+        ("bulk per-item (legacy)", len(batch), lambda: [LegacyTranscription(**t) for t in batch]),
+        ("bulk per-item", len(batch), lambda: [Transcription.model_validate(t) for t in batch]),
+        ("bulk TypeAdapter", len(batch), lambda: validate_transcriptions(batch)),
+        ("bulk TypeAdapter strict", len(batch), lambda: validate_transcriptions(batch, strict=True)),
+        ("bulk of built instances", len(batch), lambda: validate_transcriptions(instances)),
+    ]
+    print(f"{'case':<34} {'validations/s':>14}")
+    for name, items, fn in cases:
+        print(f"{name:<34} {rate(fn, args.seconds) * items:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Latencia de la búsqueda de texto para un usuario con decenas de miles de notas.
+
+Siembra N transcripciones (30k por defecto) con texto sintético en español para un
+usuario de prueba, reconstruye su índice de búsqueda y mide p50/p95 de
+`search_transcriptions` por consulta, sola y combinada con un filtro de emoción.
+Antes comprueba que una consulta escrita sin tildes encuentra el texto con tildes
+y al revés ("sentia" encuentra "sentía"), en el análisis y en una búsqueda sobre
+las notas sembradas. Termina con código 1 si eso falla o si algún p95 supera
+`--max-ms`. Requiere un MongoDB local:
+con mongomock el pipeline se evalúa en Python y la medición no aplica.
+
+    MONGO_URI=mongodb://localhost:27017 python -m benchmarks.bench_search [--notes 30000] [--queries 50]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.core.database import create_indexes, transcriptions_collection, users_collection
+from app.core.pagination import OffsetPageParams
+from app.core.query_builder import TranscriptionQuery
+from app.core.search import analyze, delete_search_stats, rebuild_search_index, search_document, search_transcriptions
+from benchmarks.bench_filter_query import synthetic_transcriptions
+
+BENCH_USER = "bench|search"
+SEED_BATCH = 5000
+
+WORDS = (
+    "hoy estudié para el examen de cálculo y me sentí cansado después de clase con mis amigos "
+    "la canción me recordó a mi familia salí a caminar por el parque estaba nervioso antes del parcial "
+    "dormí poco trabajo proyecto universidad profesora biblioteca café lluvia música tranquilo feliz "
+    "triste ansiedad entrenamiento fútbol viaje casa mamá papá hermano novia cumpleaños película"
+).split()
+QUERIES = ["examen cálculo", "canción familia", "nervioso parcial", "biblioteca", "amigos fútbol película"]
+
+# (consulta, texto que debe encontrar)
+ACCENT_PAIRS = [
+    ("sentia", "me sentía cansado"),
+    ("sentir", "me sentía cansado"),
+    ("sentía", "me sentia cansado"),
+    ("dormi", "dormí poco"),
+    ("estudie", "estudié para el examen"),
+    ("CANCION", "la canción"),
+]
+
+
+def check_accent_folding() -> bool:
+    ok = True
+    for q, text in ACCENT_PAIRS:
+        if not set(analyze(q)) & set(search_document(text)["terms"]):
+            print(f"{q!r} does not match {text!r}")
+            ok = False
+    return ok
+
+
+async def seed(count: int):
+    await cleanup()
+    await users_collection.insert_one({"_id": BENCH_USER, "name": "Bench", "notifications": True})
+    rng = random.Random(count)
+    for start in range(0, count, SEED_BATCH):
+        batch = synthetic_transcriptions(min(SEED_BATCH, count - start))
+        for offset, doc in enumerate(batch):
+            doc["_id"] = f"t{start + offset}"
+            doc["user_id"] = BENCH_USER
+            doc["text"] = " ".join(rng.choices(WORDS, k=rng.randint(20, 80)))
+        await transcriptions_collection.insert_many(batch)
+    await rebuild_search_index(BENCH_USER)
+
+
+async def cleanup():
+    await users_collection.delete_one({"_id": BENCH_USER})
+    await transcriptions_collection.delete_many({"user_id": BENCH_USER})
+    await delete_search_stats(BENCH_USER)
+
+
+async def latencies(q: str, query: TranscriptionQuery, repeat: int):
+    page = OffsetPageParams(limit=50, cursor=None)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await search_transcriptions(BENCH_USER, q, query, page)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+async def run(notes: int, repeat: int, max_ms: float):
+    if not check_accent_folding():
+        return False
+    await create_indexes()
+    await seed(notes)
+    worst = 0.0
+    try:
+        # Las notas sembradas dicen "sentí"; la consulta va sin tilde
+        found = await search_transcriptions(BENCH_USER, "senti", TranscriptionQuery(), OffsetPageParams(limit=1, cursor=None))
+        if not found["transcriptions"]:
+            print("'senti' found no notes with 'sentí'")
+            return False
+        print(f"{'query':<24} {'filter':<10} {'p50 ms':>8} {'p95 ms':>8}")
+        for q in QUERIES:
+            for label, query in (("-", TranscriptionQuery()), ("emotion", TranscriptionQuery(emotion="alegria"))):
+                p50, p95 = await latencies(q, query, repeat)
+                worst = max(worst, p95)
+                print(f"{q:<24} {label:<10} {p50:>8.1f} {p95:>8.1f}")
+    finally:
+        await cleanup()
+    ok = worst <= max_ms
+    print("OK" if ok else f"p95 above {max_ms} ms")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=50, help="Repetitions per query")
+    parser.add_argument("--max-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.notes, args.queries, args.max_ms))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
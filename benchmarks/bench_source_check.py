@@ -0,0 +1,53 @@
+"""Costo por petición de la verificación de origen: DNS en cada petición vs. allowlist en caché.
+
+El chequeo anterior llamaba `socket.gethostbyname` (bloqueante) en cada petición.
+Aquí se resuelve `localhost` para que el benchmark no dependa de la red; con un
+resolvedor real (Docker DNS, /etc/resolv.conf) la diferencia es mayor.
+
+    python -m benchmarks.bench_source_check [--iterations 20000]
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+from app.core.allowlist import SourceAllowlist
+
+
+def legacy_check(client_ip: str, hostname: str) -> bool:
+    return client_ip == socket.gethostbyname(hostname)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--hostname", default="localhost")
+    args = parser.parse_args()
+
+    allowlist = SourceAllowlist("bench", [args.hostname, "10.0.0.0/8", "192.168.1.10"])
+    asyncio.run(allowlist.refresh())
+    client_ip = socket.gethostbyname(args.hostname)
+    assert allowlist.is_allowed(client_ip)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        legacy_check(client_ip, args.hostname)
+    legacy = (time.perf_counter() - start) / args.iterations
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        allowlist.is_allowed(client_ip)
+    cached = (time.perf_counter() - start) / args.iterations
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        allowlist.is_allowed("10.1.2.3")
+    cidr = (time.perf_counter() - start) / args.iterations
+
+    print(f"gethostbyname per request: {legacy * 1e6:8.2f} us")
+    print(f"cached set lookup:         {cached * 1e6:8.2f} us ({legacy / cached:.0f}x faster)")
+    print(f"cached CIDR match:         {cidr * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
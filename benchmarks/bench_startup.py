@@ -0,0 +1,180 @@
+"""Tiempo de arranque en frío: `python -X importtime` de `app.main` y tiempo hasta el primer 200.
+
+1. Importa `app.main` `--runs` veces en procesos nuevos con `-X importtime` y
+   reporta la mediana del total y los paquetes que más tiempo propio suman.
+2. Arranca el servicio con uvicorn `--runs` veces por modo (LAZY_STARTUP=false y
+   true) y mide, desde que se lanza el proceso, el primer `200` de `/` y la
+   primera respuesta de `/users/profile` (la que abre MongoDB).
+
+El servicio corre con el sustituto de MongoDB en memoria (`--mongo mock`, por
+defecto) o con el de MONGO_URI (`--mongo uri`), con la verificación de origen
+activa (`APISIX_SOURCES=127.0.0.1`) y los nombres de Prometheus sin resolver, como
+un contenedor recién escalado. El JSON de `--output` se puede guardar por commit y
+comparar con `--compare`.
+
+    python -m benchmarks.bench_startup [--runs 5] [--mongo mock] [--output startup.json] [--compare antes.json]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+import jwt
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def service_env(lazy: bool) -> dict:
+    return {
+        **os.environ,
+        "MONGO_URI": os.environ.get("MONGO_URI", "mongodb://localhost:27017"),
+        "LAZY_STARTUP": "true" if lazy else "false",
+        "APISIX_SOURCES": "127.0.0.1",
+        "AUTH_VERIFY_SIGNATURE": "false",
+        "ENVIRONMENT": "",
+    }
+
+
+def import_profile() -> tuple:
+    """Imports `app.main` in a fresh interpreter; returns (total seconds, self seconds per top-level package)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=service_env(lazy=True), capture_output=True, text=True, check=True,
+    )
+    total, packages = 0.0, defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, module = match.groups()
+        packages[module.split(".")[0]] += int(own) / 1e6
+        if module == "app.main":
+            total = int(cumulative) / 1e6
+    return total, packages
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_200(lazy: bool, mongo: str, timeout: float) -> dict:
+    """Launches the service and polls `/` until it answers 200; then times the first `/users/profile`."""
+    port = free_port()
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--serve", "--port", str(port), "--mongo", mongo]
+    token = jwt.encode({"sub": "bench|startup"}, "bench-startup-signing-key-000000000", algorithm="HS256")
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=service_env(lazy), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            while True:
+                if time.perf_counter() - start > timeout or process.poll() is not None:
+                    raise RuntimeError("The service did not answer 200 on /")
+                try:
+                    if client.get("/").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.005)
+            first_200 = time.perf_counter() - start
+            request_start = time.perf_counter()
+            client.get("/users/profile", headers={"Authorization": f"Bearer {token}"})
+            first_profile = time.perf_counter() - request_start
+    finally:
+        process.terminate()
+        process.wait()
+    return {"first_200": first_200, "first_profile": first_profile}
+
+
+def serve(port: int, mongo: str):
+    import uvicorn
+
+    if mongo == "mock":
+        from benchmarks.mongo_standin import install
+
+        install()
+    from app.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def compare(baseline: dict, current: dict):
+    """Prints the change of every timing against a previous result."""
+    previous = {key: value for key, value in _timings(baseline)}
+    for key, value in _timings(current):
+        old = previous.get(key)
+        if old:
+            print(f"{key:<32} {value:>9.1f} ms ({(value - old) / old * 100:+5.1f}%)", file=sys.stderr)
+
+
+def _timings(result: dict):
+    yield "import app.main", result["import_ms"]["median"]
+    for mode, timings in result["startup"].items():
+        for name, stats in timings.items():
+            yield f"{mode} {name}", stats["median"]
+
+
+def summary(values: list) -> dict:
+    return {"median": round(statistics.median(values) * 1000, 1), "min": round(min(values) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="packages to list by own import time")
+    parser.add_argument("--mongo", choices=["mock", "uri"], default="mock")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--compare", help="previous JSON result to compare against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8767, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.port, args.mongo)
+        return
+
+    # La primera importación compila los .pyc; no se cuenta
+    import_profile()
+    totals, packages = [], defaultdict(list)
+    for _ in range(args.runs):
+        total, own = import_profile()
+        totals.append(total)
+        for package, seconds in own.items():
+            packages[package].append(seconds)
+    ranked = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:args.top]
+
+    print(f"import app.main: {statistics.median(totals) * 1000:.1f} ms (median of {args.runs})")
+    print(f"{'package':<24} {'own ms':>8}")
+    for package, values in ranked:
+        print(f"{package:<24} {statistics.median(values) * 1000:>8.1f}")
+
+    startup = {}
+    print(f"\n{'mode':<8} {'first 200 ms':>13} {'first /users/profile ms':>24}")
+    for mode, lazy in (("eager", False), ("lazy", True)):
+        runs = [time_to_first_200(lazy, args.mongo, args.timeout) for _ in range(args.runs)]
+        startup[mode] = {name: summary([run[name] for run in runs]) for name in ("first_200", "first_profile")}
+        print(f"{mode:<8} {startup[mode]['first_200']['median']:>13.1f} {startup[mode]['first_profile']['median']:>24.1f}")
+
+    result = {
+        "meta": {"python": sys.version.split()[0], "runs": args.runs, "mongo": args.mongo},
+        "import_ms": summary(totals),
+        "import_packages_ms": {package: round(statistics.median(values) * 1000, 1) for package, values in ranked},
+        "startup": startup,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
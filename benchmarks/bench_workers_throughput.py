@@ -0,0 +1,115 @@
+"""Throughput de los endpoints de perfil: un proceso de uvicorn vs. gunicorn con N workers.
+
+Levanta el servicio en un subproceso por configuración, registra un usuario de
+prueba y envía peticiones concurrentes a `/users/profile` y `/users/name` durante
+`--duration` segundos. Reporta peticiones por segundo y latencias p50/p99.
+
+Requiere un MongoDB en MONGO_URI. El generador de carga corre en la misma máquina,
+así que conviene dejarle núcleos libres (p. ej. `taskset`) al comparar.
+
+    python -m benchmarks.bench_workers_throughput [--workers 1 2 4] [--duration 10] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import jwt
+
+USER = {
+    "name": "Bench", "email": "bench@example.com", "birthdate": "2000-01-01", "city": "Bogotá",
+    "university": "U", "degree": "D", "notifications": True,
+    "data_treatment": {
+        "accept_policies": True, "acceptance_date": "2024-01-01T10:00:00",
+        "acceptance_ip": "10.0.0.1", "privacy_preferences": {"allow_anonimized_usage": False},
+    },
+}
+
+
+def server_command(app: str, workers: int, port: int):
+    if workers == 0:
+        return [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"]
+    return [sys.executable, "-m", "gunicorn", app, "--workers", str(workers), "--bind", f"127.0.0.1:{port}"]
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+async def load(client: httpx.AsyncClient, paths, duration: float, concurrency: int):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def user(n):
+        nonlocal errors
+        i = n
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(paths[i % len(paths)])
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+            i += 1
+
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    return latencies, errors
+
+
+async def run_config(args, workers: int):
+    env = dict(os.environ)
+    # Las peticiones llegan desde localhost y no desde APISIX
+    env.setdefault("APISIX_SOURCES", "127.0.0.1")
+    process = subprocess.Popen(server_command(args.app, workers, args.port), env=env)
+    token = jwt.encode({"sub": "auth0|bench-throughput"}, "bench-throughput-signing-key-0000", algorithm="HS256")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}", headers={"Authorization": f"Bearer {token}"}, limits=limits
+        ) as client:
+            await wait_ready(client)
+            await client.post("/users/register", json=USER)
+            await load(client, args.paths, 1, args.concurrency)  # calentamiento
+            latencies, errors = await load(client, args.paths, args.duration, args.concurrency)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / args.duration,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="gunicorn worker counts")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--paths", nargs="+", default=["/users/profile", "/users/name"])
+    args = parser.parse_args()
+
+    print(f"{'server':<22} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers in [0, *args.workers]:
+        result = await run_config(args, workers)
+        name = "uvicorn (1 process)" if workers == 0 else f"gunicorn -w {workers}"
+        print(f"{name:<22} {result['rps']:>9.0f} {result['p50']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""Borrados concurrentes de un mismo usuario: escrituras derivadas por petición con WRITE_BEHIND_MODE off, ack y async.
+
+Siembra un usuario con `--transcriptions` transcripciones en el sustituto en
+memoria y las borra con `--concurrency` peticiones simultáneas a
+`/delete-transcription/{id}`, como en una noche de campaña. Cada escritura
+sobre agregados, estadísticas de búsqueda y usuarios suma `--rtt-ms` de latencia
+simulada, para que las peticiones se solapen como contra un MongoDB real.
+Reporta las escrituras sobre esos documentos por borrado, el throughput y la
+latencia p50/p99 de cada modo, y comprueba que los agregados terminen en cero.
+
+    python -m benchmarks.bench_write_behind [--transcriptions 2000] [--concurrency 32] [--rtt-ms 2]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.mongo_standin import install
+
+USER = "bench|write-behind"
+
+
+class CountingWrites:
+    """Counts writes to the derived collections and adds a simulated round trip to each."""
+
+    def __init__(self, collections, rtt: float):
+        self.calls = 0
+        for collection in collections:
+            for name in ("bulk_write", "update_one"):
+                setattr(collection, name, self._wrap(getattr(collection, name), rtt))
+
+    def _wrap(self, write, rtt):
+        async def counted(*args, **kwargs):
+            self.calls += 1
+            await asyncio.sleep(rtt)
+            return await write(*args, **kwargs)
+
+        return counted
+
+
+async def run(transcriptions: int, concurrency: int, rtt: float):
+    import httpx
+
+    from app.core import write_behind as module
+    from app.core.auth import get_current_user
+    from app.core.database import rollups_collection, search_terms_collection, users_collection
+    from app.core.ingest import build_document, write_chunk
+    from app.core.versioning import initial_version
+    from app.core.write_behind import write_behind
+    from app.main import app, verify_request_from_apisix
+    from benchmarks.bench_filter_query import synthetic_transcriptions
+
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[verify_request_from_apisix] = lambda: None
+    counter = CountingWrites([rollups_collection, search_terms_collection, users_collection], rtt)
+    items = synthetic_transcriptions(transcriptions)
+
+    print(f"{'mode':<6} {'writes/delete':>14} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'rollups left':>13}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for mode in module.MODES[::-1]:
+            module.WRITE_BEHIND_MODE = mode
+            await users_collection.replace_one({"_id": USER}, {"name": "Bench", **initial_version()}, upsert=True)
+            for collection in (rollups_collection, search_terms_collection):
+                await collection.delete_many({"user_id": USER})
+            # Siembra por el camino de /ingest, con el buffer detenido (se escribe al momento)
+            docs = [build_document(USER, dict(item, _id=f"wb-{i}"))[0] for i, item in enumerate(items)]
+            for start in range(0, len(docs), 1000):
+                await write_chunk(USER, list(enumerate(docs[start:start + 1000])), ordered=False)
+
+            await write_behind.start()
+            counter.calls = 0
+            queue = [doc["_id"] for doc in docs]
+            latencies = []
+
+            async def worker():
+                while queue:
+                    transcription_id = queue.pop()
+                    start = time.perf_counter()
+                    response = await client.delete(f"/users/transcriptions/delete-transcription/{transcription_id}")
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.text
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            await write_behind.stop()
+
+            left = await rollups_collection.count_documents({"user_id": USER, "count": {"$ne": 0}})
+            latencies.sort()
+            print(
+                f"{mode:<6} {counter.calls / transcriptions:>14.3f} {transcriptions / elapsed:>8.0f} "
+                f"{statistics.median(latencies) * 1000:>8.2f} {latencies[int(len(latencies) * 0.99)] * 1000:>8.2f} {left:>13}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcriptions", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rtt-ms", type=float, default=2, help="simulated MongoDB round trip per write")
+    args = parser.parse_args()
+    # El sustituto se instala antes de importar `app`
+    os.environ["ENVIRONMENT"] = "test"
+    install()
+    asyncio.run(run(args.transcriptions, args.concurrency, args.rtt_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Servicio para `bench_load`: siembra usuarios sintéticos y sirve la app con uvicorn.
+
+Corre en su propio proceso para que el CPU y la memoria medidos sean solo los del
+servicio. Con `--mongo mock` usa el sustituto en memoria de `mongo_standin` (los
+datos viven en este proceso); con `--mongo uri` usa el MongoDB de MONGO_URI y
+reemplaza los datos de los usuarios `bench|load-*`. Arranca con ENVIRONMENT=test,
+así que no verifica el origen de las peticiones.
+
+    python -m benchmarks.load_server --port 8766 --users 10 --transcriptions 1000 [--mongo mock]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+USER_PREFIX = "bench|load-"
+SEED_CHUNK = 1000
+
+
+def bench_user(index: int) -> str:
+    return f"{USER_PREFIX}{index}"
+
+
+def bench_transcription(user_index: int, index: int) -> str:
+    # `_id` es único en toda la colección, no por usuario
+    return f"bench-{user_index}-{index}"
+
+
+async def seed(users: int, transcriptions: int):
+    """Creates `users` profiles with `transcriptions` each, through the ingest write path."""
+    from app.core.database import rollups_collection, search_terms_collection, transcriptions_collection, users_collection
+    from app.core.ingest import build_document, write_chunk
+    from app.core.versioning import initial_version
+    from benchmarks.bench_filter_query import synthetic_transcriptions
+
+    items = synthetic_transcriptions(transcriptions)
+    for index in range(users):
+        user_id = bench_user(index)
+        for collection in (transcriptions_collection, rollups_collection, search_terms_collection):
+            await collection.delete_many({"user_id": user_id})
+        await users_collection.replace_one(
+            {"_id": user_id},
+            {"name": f"Bench {index}", "email": f"bench{index}@example.com", "notifications": True, **initial_version()},
+            upsert=True,
+        )
+        # Mismo camino que /ingest: validación, campos derivados, agregados e índice de búsqueda
+        for start in range(0, transcriptions, SEED_CHUNK):
+            docs = [
+                build_document(user_id, dict(item, _id=bench_transcription(index, position)))[0]
+                for position, item in enumerate(items[start:start + SEED_CHUNK], start)
+            ]
+            await write_chunk(user_id, list(enumerate(docs)), ordered=False)
+
+
+async def serve(args):
+    import uvicorn
+
+    from app.main import app
+
+    start = time.perf_counter()
+    await seed(args.users, args.transcriptions)
+    print(f"Sembrados {args.users} usuarios x {args.transcriptions} transcripciones en {time.perf_counter() - start:.1f}s")
+    config = uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+    await uvicorn.Server(config).serve()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--transcriptions", type=int, default=1000, help="per user")
+    parser.add_argument("--mongo", choices=["mock", "uri"], default="mock")
+    args = parser.parse_args()
+
+    # Antes de importar `app`: el entorno y el cliente de MongoDB se leen al importar
+    os.environ["ENVIRONMENT"] = "test"
+    if args.mongo == "mock":
+        from benchmarks.mongo_standin import install
+
+        install()
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Sustituto de MongoDB en memoria (mongomock-motor) para correr el servicio sin un mongod.
+
+`install()` reemplaza el cliente de Motor antes de importar `app`, y corrige las
+diferencias de mongomock que el servicio toca:
+
+- `bulk_write` recibe argumentos de pymongo reciente (`sort`, `hint`, ...) que
+  mongomock no acepta;
+- `with_options` (preferencia de lectura) no existe en mongomock-motor;
+- mongomock modifica el dict de proyección que recibe, y el servicio reutiliza
+  proyecciones constantes;
+- los índices únicos con `partialFilterExpression` se aplican a todos los
+  documentos, así que se crean sin `unique`;
+- en los pipelines de actualización, `{"$not": [expr]}` niega la lista (siempre
+  verdadera) en lugar de `expr`, y `$$NOW` no existe (el campo no se escribe);
+- un cursor de `find` copia todos los documentos al pedir el primero; sin
+  `skip`/`limit` ahora los copia uno a uno, como los lotes de un cursor real, para
+  que la memoria de las lecturas en streaming (exportación) sea comparable;
+- los métodos asíncronos de las colecciones ejecutan la operación sin ceder el
+  event loop, así que una lectura y la escritura que depende de ella nunca se
+  intercalan con otra petición. Ahora ceden (`asyncio.sleep(0)`) antes de cada
+  operación, como la ida y vuelta por la red, y un read-modify-write concurrente
+  puede perder actualizaciones igual que contra un mongod.
+
+Las latencias contra el sustituto sirven para comparar commits entre sí, no
+para estimar las de producción: no hay red ni índices reales.
+
+    pip install mongomock-motor
+"""
+import asyncio
+import inspect
+import os
+from datetime import datetime, timezone
+
+
+def install():
+    """Points `motor.motor_asyncio.AsyncIOMotorClient` at mongomock-motor. Call before importing `app`."""
+    try:
+        import mongomock.aggregate as mongomock_aggregate
+        import mongomock.collection as mongomock_collection
+        import mongomock_motor
+    except ImportError as e:
+        raise SystemExit("The in-memory MongoDB stand-in needs `pip install mongomock-motor`") from e
+    import motor.motor_asyncio
+    from pymongo import IndexModel
+
+    builder = mongomock_collection.BulkOperationBuilder
+    for name in ("add_insert", "add_update", "add_replace", "add_delete"):
+        method = getattr(builder, name, None)
+        if method is None:
+            continue
+        accepted = inspect.signature(method).parameters
+
+        def compatible(self, *args, _method=method, _accepted=accepted, **kwargs):
+            return _method(self, *args, **{key: value for key, value in kwargs.items() if key in _accepted})
+
+        setattr(builder, name, compatible)
+
+    find = mongomock_collection.Collection.find
+
+    def find_copying_projection(self, filter=None, projection=None, *args, **kwargs):
+        if isinstance(projection, dict):
+            projection = dict(projection)
+        return find(self, filter, projection, *args, **kwargs)
+
+    mongomock_collection.Collection.find = find_copying_projection
+
+    create_indexes = mongomock_collection.Collection.create_indexes
+
+    def create_indexes_without_partial_unique(self, indexes, *args, **kwargs):
+        compatible = []
+        for index in indexes:
+            document = index.document
+            if "partialFilterExpression" in document:
+                options = {k: v for k, v in document.items() if k not in ("key", "unique", "partialFilterExpression")}
+                index = IndexModel(list(document["key"].items()), **options)
+            compatible.append(index)
+        return create_indexes(self, compatible, *args, **kwargs)
+
+    mongomock_collection.Collection.create_indexes = create_indexes_without_partial_unique
+
+    parser = mongomock_aggregate._Parser
+    handle_boolean = parser._handle_boolean_operator
+
+    def boolean_with_array_not(self, operator, values):
+        # MongoDB acepta `$not` con la expresión sola o dentro de una lista de un elemento
+        if operator == "$not" and isinstance(values, list) and len(values) == 1:
+            values = values[0]
+        return handle_boolean(self, operator, values)
+
+    parser._handle_boolean_operator = boolean_with_array_not
+    parse_basic = parser._parse_basic_expression
+
+    def basic_with_now(self, expression):
+        if expression == "$$NOW":
+            return datetime.now(timezone.utc).replace(tzinfo=None)
+        return parse_basic(self, expression)
+
+    parser._parse_basic_expression = basic_with_now
+
+    cursor = mongomock_collection.Cursor
+    next_document, rewind = cursor.__next__, cursor.rewind
+
+    def streaming_next(self):
+        if self._skip or self._limit or self.collection.codec_options.tz_aware:
+            return next_document(self)
+        # `_factory` toma una foto de las referencias y proyecta cada documento al pedirlo
+        if getattr(self, "_stream", None) is None:
+            self._stream = self._factory()
+        doc = next(self._stream)
+        self._emitted += 1
+        return doc
+
+    def rewind_stream(self):
+        self._stream = None
+        return rewind(self)
+
+    cursor.__next__ = cursor.next = streaming_next
+    cursor.rewind = rewind_stream
+
+    collection = mongomock_motor.AsyncMongoMockCollection
+    for name in dir(collection):
+        method = getattr(collection, name)
+        if name.startswith("_") or not inspect.iscoroutinefunction(method):
+            continue
+
+        async def yielding(self, *args, _method=method, **kwargs):
+            await asyncio.sleep(0)
+            return await _method(self, *args, **kwargs)
+
+        setattr(collection, name, yielding)
+
+    collection.with_options = lambda self, **kwargs: self
+    motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
@@ -0,0 +1,65 @@
+"""Configuración de gunicorn para el modo multi-proceso (un worker de uvicorn por núcleo).
+
+    gunicorn app.main:app            # lee este archivo automáticamente
+    kill -HUP <pid del master>       # recarga elegante: workers nuevos, los viejos terminan sus peticiones
+
+Cada worker es un proceso independiente; las métricas de Prometheus se escriben en
+PROMETHEUS_MULTIPROC_DIR y `/metrics` las agrega entre todos los workers.
+"""
+import os
+import shutil
+
+# Debe existir antes de importar prometheus_client (en el master y en los workers)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+# Con GUNICORN_PRELOAD la app (y sus métricas) se importa antes de `on_starting`
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import multiprocess  # noqa: E402
+
+
+def default_workers() -> int:
+    # Núcleos disponibles para el proceso (respeta la afinidad de CPU del contenedor)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(default_workers())))
+# uvloop y httptools cuando están instalados (uvicorn[standard])
+worker_class = "uvicorn_worker.UvicornWorker"
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Reciclar workers cada N peticiones (0 = nunca); el jitter evita que reinicien todos a la vez
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")
+
+# La caché de perfiles es por proceso: sin Redis, una escritura en un worker no invalida a los
+# demás y servirían el valor anterior hasta PROFILE_CACHE_TTL. Se apaga (los workers heredan el
+# entorno), o no se arranca si se pidió explícitamente
+if workers > 1 and not os.getenv("PROFILE_CACHE_REDIS_URL"):
+    if os.getenv("PROFILE_CACHE_ENABLED", "").lower() == "true":
+        raise RuntimeError(
+            "PROFILE_CACHE_ENABLED=true with several workers requires PROFILE_CACHE_REDIS_URL"
+        )
+    os.environ["PROFILE_CACHE_ENABLED"] = "false"
+    print(f"Caché de perfiles desactivada: {workers} workers sin PROFILE_CACHE_REDIS_URL")
+# Importar la app una vez en el master y heredarla en cada worker (fork), en lugar de importarla
+# en cada uno. Es seguro porque al importar no se abren conexiones ni hilos: MongoDB, DNS y Auth0
+# se preparan en el lifespan de cada worker
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+
+def on_starting(server):
+    # Empezar con el directorio vacío para no mezclar métricas de ejecuciones anteriores
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Los gauges "live" del worker que terminó dejan de sumarse
+    multiprocess.mark_process_dead(worker.pid)